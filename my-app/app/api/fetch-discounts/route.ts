@@ -4,12 +4,264 @@ import { spawn } from 'child_process';
 import OpenAI from 'openai';
 import path from 'path';
 import fs from 'fs';
+import net from 'net';
 
 const openai = new OpenAI({
   apiKey: process.env.OPENAI_API_KEY
 });
 
-async function runScraper(location: string): Promise<any[]> {
+// Seconds a request waits for live scrapes before returning what the
+// stores have found so far (overridable per request with ?deadline=)
+const DEFAULT_DEADLINE_SECONDS = parseFloat(process.env.SCRAPE_DEADLINE_SECONDS || '25');
+// Extra time the scraper gets to report back before we stop waiting for it
+const DEADLINE_GRACE_MS = 5000;
+
+interface ScrapeFilters {
+  stores: string[];
+  categories: string[];
+  minPrice?: number;
+  maxPrice?: number;
+}
+
+interface ScrapeResult {
+  discounts: any[];
+  // Per-store cache status and age in seconds, as reported by the scraper
+  cache?: { store: string; status: string; age: number | null; partial?: boolean }[];
+  // True when a store ran out of time and only part of its offers came back
+  partial?: boolean;
+  // Listings of the same product across stores (scripts/product_matching.py)
+  matches?: { size: string | null; stores: string[]; members: any[]; cheapest: number | null }[];
+}
+
+// Prefix of the per-store metrics lines the scraper writes to stderr
+// (see scripts/scrape_metrics.py)
+const METRICS_PREFIX = 'Scrape metrics: ';
+
+function logScrapeMetrics(metrics: any) {
+  const phases = Object.entries(metrics.phases || {})
+    .map(([name, phase]: [string, any]) => `${name}=${phase.seconds}s`)
+    .join(' ');
+  console.log(`Scrape metrics [${metrics.store}/${metrics.mode}] ${metrics.elapsed}s:`, phases, metrics.counters);
+}
+
+function scraperDataDir(): string {
+  return process.env.SCRAPER_DATA_DIR || path.join(process.cwd(), '.scraper');
+}
+
+function daemonSocketPath(): string {
+  return process.env.SCRAPER_SOCKET || path.join(scraperDataDir(), 'scraper.sock');
+}
+
+// Splits a byte stream into NDJSON scraper records (see
+// scripts/ndjson_stream.py) and hands each parsed record to onRecord.
+function createRecordParser(onRecord: (record: any) => void) {
+  let pending = '';
+  return (chunk: Buffer | string) => {
+    pending += chunk.toString();
+    let newline = pending.indexOf('\n');
+    while (newline >= 0) {
+      const line = pending.substring(0, newline).trim();
+      pending = pending.substring(newline + 1);
+      if (line) {
+        try {
+          onRecord(JSON.parse(line));
+        } catch (e) {
+          console.log('Skipping malformed scraper record:', line.substring(0, 200));
+        }
+      }
+      newline = pending.indexOf('\n');
+    }
+  };
+}
+
+// Ask the long-lived scraper daemon (scripts/scraper_daemon.py) to scrape.
+// Resolves to null when no daemon is reachable so the caller can fall back
+// to spawning a one-off scraper process.
+function queryDaemon(location: string, filters: ScrapeFilters, deadline: number): Promise<ScrapeResult | null> {
+  const socketPath = daemonSocketPath();
+  if (!fs.existsSync(socketPath)) {
+    return Promise.resolve(null);
+  }
+
+  return new Promise((resolve, reject) => {
+    const socket = net.createConnection(socketPath);
+    const discounts: any[] = [];
+    let connected = false;
+
+    const parse = createRecordParser((record) => {
+      if (record.type === 'discount') {
+        discounts.push(record.discount);
+      } else if (record.type === 'summary') {
+        socket.end();
+        if (record.ok) {
+          resolve({ discounts, cache: record.cache, partial: record.partial, matches: record.matches });
+        } else {
+          reject(new Error(`Scraper daemon failed: ${record.error}`));
+        }
+      }
+    });
+
+    socket.setTimeout(deadline * 1000 + DEADLINE_GRACE_MS);
+    socket.on('connect', () => {
+      connected = true;
+      socket.write(JSON.stringify({
+        id: Date.now(),
+        op: 'scrape',
+        location,
+        stores: filters.stores,
+        categories: filters.categories,
+        min_price: filters.minPrice ?? null,
+        max_price: filters.maxPrice ?? null,
+        deadline
+      }) + '\n');
+    });
+    socket.on('data', parse);
+    socket.on('timeout', () => {
+      // Out of time: return whatever has streamed in so far
+      console.log('Scraper daemon missed the deadline, returning', discounts.length, 'discounts');
+      socket.destroy();
+      resolve({ discounts, partial: true });
+    });
+    socket.on('error', (error) => {
+      console.log('Scraper daemon unavailable, spawning scraper:', error.message);
+      if (connected) {
+        reject(error);
+      } else {
+        resolve(null);
+      }
+    });
+  });
+}
+
+function filterArgs(filters: ScrapeFilters): string[] {
+  const args: string[] = [];
+  if (filters.stores.length > 0) args.push('--stores', filters.stores.join(','));
+  if (filters.categories.length > 0) args.push('--categories', filters.categories.join(','));
+  if (filters.minPrice !== undefined) args.push('--min-price', String(filters.minPrice));
+  if (filters.maxPrice !== undefined) args.push('--max-price', String(filters.maxPrice));
+  return args;
+}
+
+function scraperArgs(location: string, filters: ScrapeFilters, deadline: number, outputPath: string): string[] {
+  return [
+    location, '--format', 'ndjson', '--deadline', String(deadline), '--output', outputPath,
+    ...filterArgs(filters)
+  ];
+}
+
+// Rows and summary streamed back by a store query (scripts/query_discounts.py)
+interface StoreQueryReply {
+  discounts: any[];
+  summary: any;
+}
+
+// How long the daemon gets to answer a store query before we spawn one
+const DAEMON_QUERY_TIMEOUT_MS = 5000;
+
+// Ask the scraper daemon to answer a store query in-process. Resolves to
+// null when no daemon is reachable so the caller can spawn the query script.
+function queryStoreDaemon(location: string, filters: ScrapeFilters): Promise<StoreQueryReply | null> {
+  const socketPath = daemonSocketPath();
+  if (!fs.existsSync(socketPath)) {
+    return Promise.resolve(null);
+  }
+
+  return new Promise((resolve) => {
+    const socket = net.createConnection(socketPath);
+    const discounts: any[] = [];
+
+    const parse = createRecordParser((record) => {
+      if (record.type === 'discount') {
+        discounts.push(record.discount);
+      } else if (record.type === 'summary') {
+        socket.end();
+        if (record.ok) {
+          resolve({ discounts, summary: record });
+        } else {
+          // e.g. an older daemon without the query op
+          console.log('Scraper daemon could not answer the store query:', record.error);
+          resolve(null);
+        }
+      }
+    });
+
+    socket.setTimeout(DAEMON_QUERY_TIMEOUT_MS);
+    socket.on('connect', () => {
+      socket.write(JSON.stringify({
+        id: Date.now(),
+        op: 'query',
+        location,
+        stores: filters.stores,
+        categories: filters.categories,
+        min_price: filters.minPrice ?? null,
+        max_price: filters.maxPrice ?? null
+      }) + '\n');
+    });
+    socket.on('data', parse);
+    socket.on('timeout', () => {
+      console.log('Scraper daemon did not answer the store query in time');
+      socket.destroy();
+      resolve(null);
+    });
+    socket.on('error', (error) => {
+      console.log('Scraper daemon unavailable for the store query:', error.message);
+      resolve(null);
+    });
+  });
+}
+
+// Fallback when no daemon is running: run the query script once.
+function queryStoreProcess(location: string, filters: ScrapeFilters): Promise<StoreQueryReply | null> {
+  return new Promise((resolve) => {
+    const scriptPath = path.join(process.cwd(), 'scripts', 'query_discounts.py');
+    const python = spawn('python3', [scriptPath, location, ...filterArgs(filters)]);
+    const discounts: any[] = [];
+    let summary: any = null;
+
+    python.stdout.on('data', createRecordParser((record) => {
+      if (record.type === 'discount') {
+        discounts.push(record.discount);
+      } else if (record.type === 'summary') {
+        summary = record;
+      }
+    }));
+    python.stderr.on('data', (data) => {
+      console.log('Store query log:', data.toString());
+    });
+    python.on('error', (error) => {
+      console.log('Store query failed:', error.message);
+      resolve(null);
+    });
+    python.on('close', () => {
+      resolve(summary ? { discounts, summary } : null);
+    });
+  });
+}
+
+// Look the filters up in the scraper's SQLite store, through the warm
+// daemon when it is running. Resolves to the matching rows when every
+// requested store was scraped recently enough, and to null when the
+// scraper needs to run.
+async function queryStore(location: string, filters: ScrapeFilters): Promise<ScrapeResult | null> {
+  const reply = (await queryStoreDaemon(location, filters)) ?? (await queryStoreProcess(location, filters));
+  const summary = reply?.summary;
+  if (!reply || !summary.ok) {
+    console.log('Store query failed:', summary?.error);
+    return null;
+  }
+  if (summary.stale.length > 0) {
+    console.log('Stored discounts are stale for:', summary.stale);
+    return null;
+  }
+  return { discounts: reply.discounts, cache: summary.stores, matches: summary.matches };
+}
+
+async function runScraper(location: string, filters: ScrapeFilters, deadline: number): Promise<ScrapeResult> {
+  const daemonResult = await queryDaemon(location, filters, deadline);
+  if (daemonResult) {
+    return daemonResult;
+  }
+
   return new Promise((resolve, reject) => {
     // Log the current working directory and script path
     const scriptPath = path.join(process.cwd(), 'scripts', 'scrape_discounts.py');
@@ -26,135 +278,226 @@ async function runScraper(location: string): Promise<any[]> {
       console.error('Python version error:', data.toString());
     });
 
-    const python = spawn('python3', [scriptPath, location]);
-    let dataString = '';
-    let errorString = '';
+    // A result file of our own, so concurrent requests never read each other's
+    const outputPath = path.join(
+      scraperDataDir(), 'output', `request-${process.pid}-${Date.now()}-${Math.random().toString(36).slice(2)}.json`
+    );
+    const python = spawn('python3', [scriptPath, ...scraperArgs(location, filters, deadline, outputPath)]);
+    const discounts: any[] = [];
+    let summary: any = null;
+    let lastLog = '';
+
+    // The scraper returns by itself within the deadline; this only catches
+    // one that hangs, keeping the products it has already streamed
+    let killed = false;
+    const killTimer = setTimeout(() => {
+      console.log('Scraper missed the deadline, stopping it');
+      killed = true;
+      python.kill('SIGKILL');
+    }, deadline * 1000 + DEADLINE_GRACE_MS);
     
-    python.stdout.on('data', (data) => {
-      console.log('Python output:', data.toString());
-      dataString += data.toString();
-    });
+    // stdout carries one record per product, then a summary trailer
+    python.stdout.on('data', createRecordParser((record) => {
+      if (record.type === 'discount') {
+        discounts.push(record.discount);
+      } else if (record.type === 'summary') {
+        summary = record;
+      }
+    }));
     
+    // stderr is the scraper's log, plus one JSON metrics record per store
     python.stderr.on('data', (data) => {
-      console.error('Python error:', data.toString());
-      errorString += data.toString();
+      lastLog = data.toString();
+      for (const line of lastLog.split('\n')) {
+        if (line.startsWith(METRICS_PREFIX)) {
+          try {
+            logScrapeMetrics(JSON.parse(line.substring(METRICS_PREFIX.length)));
+            continue;
+          } catch (e) {
+            // Not a complete record; log it as plain text
+          }
+        }
+        if (line.trim()) console.log('Scraper log:', line);
+      }
     });
     
     python.on('close', (code) => {
-      console.log('Python process exited with code:', code);
-      if (code !== 0) {
-        reject(new Error(`Python process failed with code ${code}. Error: ${errorString}`));
-        return;
-      }
-      
+      clearTimeout(killTimer);
+      console.log('Python process exited with code:', code, summary ? { count: summary.count, elapsed: summary.elapsed } : '');
       try {
-        // Try to parse the JSON output directly from stdout first
-        try {
-          const jsonStart = dataString.indexOf('[');
-          const jsonEnd = dataString.lastIndexOf(']') + 1;
-          if (jsonStart >= 0 && jsonEnd > jsonStart) {
-            const jsonStr = dataString.substring(jsonStart, jsonEnd);
-            const discounts = JSON.parse(jsonStr);
-            resolve(discounts);
-            return;
-          }
-        } catch (e) {
-          console.log('Could not parse JSON from stdout, trying file...');
-        }
-
-        // Fallback to reading from file
-        const discountsPath = path.join(process.cwd(), 'discounts.json');
-        console.log('Looking for discounts file at:', discountsPath);
-        console.log('File exists:', fs.existsSync(discountsPath));
-        
-        if (!fs.existsSync(discountsPath)) {
+        if (summary && summary.ok) {
+          resolve({ discounts, cache: summary.cache, partial: summary.partial, matches: summary.matches });
+        } else if (killed) {
+          resolve({ discounts, partial: true });
+        } else if (code !== 0) {
+          reject(new Error(`Python process failed with code ${code}. Error: ${summary?.error || lastLog}`));
+        } else if (!fs.existsSync(outputPath)) {
           reject(new Error('Discounts file not found'));
-          return;
+        } else {
+          // No summary record; fall back to the result file this run wrote
+          const output = JSON.parse(fs.readFileSync(outputPath, 'utf8'));
+          resolve({ discounts: output.discounts, partial: output.partial, matches: output.matches });
         }
-
-        const discountsData = fs.readFileSync(discountsPath, 'utf8');
-        const discounts = JSON.parse(discountsData);
-        resolve(discounts);
       } catch (error) {
         console.error('Error reading discounts:', error);
         reject(error);
+      } finally {
+        fs.rmSync(outputPath, { force: true });
       }
     });
   });
 }
 
-async function filterDiscountsWithGPT(
-  discounts: any[],
-  userPreferences: {
-    categories: string[];
-    dietaryPreferences?: string[];
-    maxPrice?: number;
-    minDiscount?: number;
-  }
-) {
-  try {
-    console.log('Filtering discounts with GPT. Input:', {
-      discountsCount: discounts.length,
-      preferences: userPreferences
-    });
-
-    // If no preferences are set, return all discounts
-    if (
-      userPreferences.categories.length === 0 &&
-      !userPreferences.dietaryPreferences &&
-      !userPreferences.maxPrice &&
-      !userPreferences.minDiscount
-    ) {
-      console.log('No preferences set, returning all discounts');
-      return discounts;
-    }
+interface DiscountPreferences {
+  categories: string[];
+  dietaryPreferences?: string[];
+  maxPrice?: number;
+  minDiscount?: number;
+}
 
-    const prompt = `
-      You are a helpful assistant that filters grocery discounts based on user preferences.
-      Your task is to return a JSON object with a "discounts" array containing only the items that match the following criteria:
-
-      ${userPreferences.categories.length > 0 ? `Categories of interest: ${userPreferences.categories.join(', ')}` : 'No category restrictions'}
-      ${userPreferences.dietaryPreferences ? `Dietary preferences: ${userPreferences.dietaryPreferences.join(', ')}` : 'No dietary restrictions'}
-      ${userPreferences.maxPrice ? `Maximum price: R${userPreferences.maxPrice}` : 'No maximum price'}
-      ${userPreferences.minDiscount ? `Minimum discount percentage: ${userPreferences.minDiscount}%` : 'No minimum discount'}
-
-      Rules for filtering:
-      1. If no categories are specified, include all categories
-      2. If no maximum price is set, include all prices
-      3. If no minimum discount is set, include all discounts
-      4. If dietary preferences are not specified, include all items
-
-      Here are the discounts to filter:
-      ${JSON.stringify(discounts, null, 2)}
-
-      Please return a JSON object in this exact format:
-      {
-        "discounts": [
-          // filtered discount objects here, maintaining their original structure
-        ]
-      }
+// One compact id|title|category table from scripts/discount_prefilter.py,
+// within the token budget, with each short id's discount index.
+interface PrefilterBatch {
+  table: string;
+  ids: Record<string, number>;
+  tokens: number;
+}
+
+// Output of scripts/discount_prefilter.py: the indexes of the discounts that
+// pass the deterministic filters, split into batches that together hold
+// every one of them.
+interface PrefilterResult {
+  keep: number[];
+  batches: PrefilterBatch[];
+}
 
-      Include ALL fields from the original discount objects in your response.
-    `;
+// Discounts after the API's own filters. dietaryUnchecked counts those
+// that are returned without the model having judged them for the dietary
+// preferences (the prefilter or a model call failed).
+interface RefinedDiscounts {
+  discounts: any[];
+  dietaryUnchecked: number;
+}
 
-    const completion = await openai.chat.completions.create({
-      messages: [{ role: "user", content: prompt }],
-      model: "gpt-4o-mini",
-      response_format: { type: "json_object" },
-      temperature: 0.2
+function prefilterDiscounts(discounts: any[], preferences: DiscountPreferences): Promise<PrefilterResult> {
+  return new Promise((resolve, reject) => {
+    const scriptPath = path.join(process.cwd(), 'scripts', 'discount_prefilter.py');
+    const args = [scriptPath];
+    if (preferences.categories.length > 0) args.push('--categories', preferences.categories.join(','));
+    if (preferences.maxPrice) args.push('--max-price', String(preferences.maxPrice));
+    if (preferences.minDiscount) args.push('--min-discount', String(preferences.minDiscount));
+    const python = spawn('python3', args);
+    let output = '';
+
+    python.stdout.on('data', (data) => {
+      output += data.toString();
+    });
+    python.stderr.on('data', (data) => {
+      console.log('Prefilter log:', data.toString());
     });
+    python.on('error', reject);
+    python.on('close', (code) => {
+      if (code !== 0) {
+        reject(new Error(`Prefilter failed with code ${code}`));
+        return;
+      }
+      try {
+        resolve(JSON.parse(output));
+      } catch (error) {
+        reject(error);
+      }
+    });
+    python.stdin.end(JSON.stringify(discounts));
+  });
+}
+
+// Asks the model which rows of one prefilter batch suit the dietary
+// preferences, and returns their discount indexes.
+async function checkDietaryBatch(batch: PrefilterBatch, dietaryPreferences: string[]): Promise<number[]> {
+  const prompt = `
+    You are a helpful assistant that filters grocery discounts for dietary preferences: ${dietaryPreferences.join(', ')}.
+    Each line below is one product as id|title|category.
+
+    ${batch.table}
+
+    Return a JSON object in this exact format, listing the ids of the products that suit these preferences
+    and leaving out any product that does not or that you cannot judge:
+    { "ids": ["0", "1"] }
+  `;
+
+  const completion = await openai.chat.completions.create({
+    messages: [{ role: "user", content: prompt }],
+    model: "gpt-4o-mini",
+    response_format: { type: "json_object" },
+    temperature: 0.2
+  });
+
+  console.log('GPT response received', { promptTokens: completion.usage?.prompt_tokens, estimated: batch.tokens });
+  const content = completion.choices[0].message.content || '{}';
+  const ids: string[] = Array.from(new Set<string>((JSON.parse(content).ids || []).map(String)));
+  return ids.filter((id) => id in batch.ids).map((id) => batch.ids[id]);
+}
+
+// Categories, price and minimum discount are applied by the prefilter; only
+// dietary preferences go to the model, one call per prefilter batch, which
+// sees a compact table and answers with ids that are mapped back to the
+// full discounts. A batch whose call fails is passed through unchecked.
+async function filterDiscountsWithGPT(discounts: any[], userPreferences: DiscountPreferences): Promise<RefinedDiscounts> {
+  console.log('Filtering discounts. Input:', {
+    discountsCount: discounts.length,
+    preferences: userPreferences
+  });
 
-    console.log('GPT response received');
-    const content = completion.choices[0].message.content;
-    const filtered = JSON.parse(content).discounts || [];
-    console.log('Filtered discounts count:', filtered.length);
-    return filtered;
+  // If no preferences are set, return all discounts
+  if (
+    userPreferences.categories.length === 0 &&
+    !userPreferences.dietaryPreferences?.length &&
+    !userPreferences.maxPrice &&
+    !userPreferences.minDiscount
+  ) {
+    console.log('No preferences set, returning all discounts');
+    return { discounts, dietaryUnchecked: 0 };
+  }
+
+  let prefiltered: PrefilterResult;
+  try {
+    prefiltered = await prefilterDiscounts(discounts, userPreferences);
   } catch (error) {
-    console.error('Error in GPT filtering:', error);
-    // If GPT filtering fails, return unfiltered discounts
+    console.error('Error in discount prefilter:', error);
     console.log('Falling back to unfiltered discounts');
-    return discounts;
+    return { discounts, dietaryUnchecked: userPreferences.dietaryPreferences?.length ? discounts.length : 0 };
+  }
+  const kept = prefiltered.keep.map((index) => discounts[index]);
+  console.log('Prefilter kept', kept.length, 'of', discounts.length, 'discounts');
+
+  const dietaryPreferences = userPreferences.dietaryPreferences || [];
+  if (dietaryPreferences.length === 0 || kept.length === 0) {
+    return { discounts: kept, dietaryUnchecked: 0 };
   }
+  if (prefiltered.batches.length > 1) {
+    console.log('Token budget reached, checking', kept.length, 'discounts in', prefiltered.batches.length, 'GPT calls');
+  }
+
+  const checked = await Promise.allSettled(
+    prefiltered.batches.map((batch) => checkDietaryBatch(batch, dietaryPreferences))
+  );
+  const indexes: number[] = [];
+  let dietaryUnchecked = 0;
+  checked.forEach((result, n) => {
+    if (result.status === 'fulfilled') {
+      indexes.push(...result.value);
+    } else {
+      // The deterministic filters still hold; only this batch's dietary pass is skipped
+      console.error('Error in GPT filtering:', result.reason);
+      const unchecked = Object.values(prefiltered.batches[n].ids);
+      indexes.push(...unchecked);
+      dietaryUnchecked += unchecked.length;
+    }
+  });
+  // Back in input order
+  const filtered = indexes.sort((a, b) => a - b).map((index) => discounts[index]);
+  console.log('Filtered discounts count:', filtered.length, dietaryUnchecked ? { dietaryUnchecked } : '');
+  return { discounts: filtered, dietaryUnchecked };
 }
 
 export async function GET(request: NextRequest) {
@@ -167,6 +510,10 @@ export async function GET(request: NextRequest) {
     const maxPrice = searchParams.get('maxPrice') ? parseFloat(searchParams.get('maxPrice')!) : undefined;
     const minPrice = searchParams.get('minPrice') ? parseFloat(searchParams.get('minPrice')!) : undefined;
     const radius = searchParams.get('radius') ? parseInt(searchParams.get('radius')!) : undefined;
+    const dietaryPreferences = searchParams.get('dietary')?.split(',').filter(Boolean) || [];
+    const minDiscount = searchParams.get('minDiscount') ? parseFloat(searchParams.get('minDiscount')!) : undefined;
+    const requestedDeadline = parseFloat(searchParams.get('deadline') || '');
+    const deadline = requestedDeadline > 0 ? requestedDeadline : DEFAULT_DEADLINE_SECONDS;
 
     console.log('Request parameters:', {
       location,
@@ -174,7 +521,10 @@ export async function GET(request: NextRequest) {
       stores,
       maxPrice,
       minPrice,
-      radius
+      radius,
+      dietaryPreferences,
+      minDiscount,
+      deadline
     });
 
     if (!location) {
@@ -184,41 +534,30 @@ export async function GET(request: NextRequest) {
       );
     }
 
-    // Run the Python scraper
-    console.log('Starting Python scraper');
-    const scrapedDiscounts = await runScraper(location);
-    console.log('Scraper completed, found', scrapedDiscounts.length, 'discounts');
-
-    // Filter discounts based on preferences
-    let filteredDiscounts = scrapedDiscounts;
-
-    // Filter by store if specified
-    if (stores.length > 0) {
-      filteredDiscounts = filteredDiscounts.filter(d => 
-        stores.some(s => d.store.toLowerCase().includes(s.toLowerCase()))
-      );
-    }
+    const filters = { stores, categories, minPrice, maxPrice };
 
-    // Filter by category if specified
-    if (categories.length > 0) {
-      filteredDiscounts = filteredDiscounts.filter(d => 
-        categories.some(c => d.category?.toLowerCase().includes(c.toLowerCase()))
-      );
-    }
+    // A minimum discount and dietary preferences are applied afterwards
+    // (see filterDiscountsWithGPT)
+    const refine = (discounts: any[]): Promise<RefinedDiscounts> =>
+      dietaryPreferences.length > 0 || minDiscount
+        ? filterDiscountsWithGPT(discounts, { categories, dietaryPreferences, maxPrice, minDiscount })
+        : Promise.resolve({ discounts, dietaryUnchecked: 0 });
 
-    // Filter by price range
-    if (minPrice !== undefined || maxPrice !== undefined) {
-      filteredDiscounts = filteredDiscounts.filter(d => {
-        const price = parseFloat(d.price?.replace(/[£R]/g, '').trim());
-        if (isNaN(price)) return false;
-        if (minPrice !== undefined && price < minPrice) return false;
-        if (maxPrice !== undefined && price > maxPrice) return false;
-        return true;
-      });
+    // Serve recent scrapes straight from the indexed store; the filters
+    // are applied by the query, so only matching rows come back
+    const stored = await queryStore(location, filters);
+    if (stored) {
+      console.log('Serving', stored.discounts.length, 'stored discounts', { cache: stored.cache });
+      return NextResponse.json({ ...stored, ...(await refine(stored.discounts)) });
     }
 
-    console.log('Filtering completed, returning', filteredDiscounts.length, 'discounts');
-    return NextResponse.json({ discounts: filteredDiscounts });
+    // Run the Python scraper. It applies the same filters while scraping
+    // and records what it scraped in the store for the next request. Stores
+    // still going at the deadline contribute what they have found so far.
+    console.log('Starting Python scraper');
+    const { discounts, cache, partial, matches } = await runScraper(location, filters, deadline);
+    console.log('Scraper completed, returning', discounts.length, 'discounts', cache ? { cache } : '', partial ? '(partial)' : '');
+    return NextResponse.json({ ...(await refine(discounts)), cache, partial: Boolean(partial), matches: matches || [] });
   } catch (error: any) {
     console.error('Detailed error in discount API:', {
       error: error.message,
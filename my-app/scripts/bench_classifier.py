@@ -0,0 +1,93 @@
+"""Throughput benchmark for the category classifier.
+
+Generates synthetic product titles and compares:
+
+* ``substring`` - the old approach: per title, ``any(word in title)`` over
+  each category's keywords in turn (run over the full taxonomy)
+* ``single`` - ``CategoryClassifier.classify`` called once per title
+* ``batch`` - ``CategoryClassifier.classify_batch`` over all titles
+
+Usage: python bench_classifier.py [--titles 50000] [--repeat 3]
+"""
+import argparse
+import json
+import random
+import time
+
+from category_classifier import default_classifier, DEFAULT_TAXONOMY
+
+BRANDS = ['Clover', 'Albany', 'Tesco', 'Checkers', 'Heinz', 'Koo', 'Simple Truth', 'Finest']
+SIZES = ['500g', '1kg', '2L', '6 x 330ml', '750ml', '12 pack', '400g']
+FILLER = ['Family Size', 'Value Pack', 'Original', 'Lightly Salted', 'Extra', 'Fresh', 'Select']
+
+
+def make_titles(count, seed=0):
+    with open(DEFAULT_TAXONOMY) as f:
+        keywords = [k for entry in json.load(f)['categories'] for k in entry['keywords']]
+    rng = random.Random(seed)
+    titles = []
+    for _ in range(count):
+        words = [rng.choice(BRANDS), rng.choice(FILLER)]
+        # About one title in ten matches nothing in the taxonomy
+        if rng.random() > 0.1:
+            words.append(rng.choice(keywords).title())
+        words.append(rng.choice(SIZES))
+        titles.append(' '.join(words))
+    return titles
+
+
+def substring_classify(titles, categories, default):
+    result = []
+    for title in titles:
+        title_lower = title.lower()
+        for name, keywords in categories:
+            if any(word in title_lower for word in keywords):
+                result.append(name)
+                break
+        else:
+            result.append(default)
+    return result
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    titles = make_titles(args.titles)
+    with open(DEFAULT_TAXONOMY) as f:
+        taxonomy = json.load(f)
+    categories = [(entry['category'], entry['keywords']) for entry in taxonomy['categories']]
+    classifier = default_classifier()
+
+    runs = {
+        'substring': lambda: substring_classify(titles, categories, taxonomy.get('default', 'other')),
+        'single': lambda: [classifier.classify(title) for title in titles],
+        'batch': lambda: classifier.classify_batch(titles),
+    }
+    results = {}
+    for name, fn in runs.items():
+        elapsed = best_of(args.repeat, fn)
+        results[name] = {
+            'seconds': round(elapsed, 4),
+            'titles_per_second': round(len(titles) / elapsed),
+        }
+        print(f"{name:>10}: {elapsed:.3f}s  {len(titles) / elapsed:,.0f} titles/s")
+
+    uncategorized = classifier.classify_batch(titles).count(classifier.default)
+    print(json.dumps({'titles': len(titles), 'uncategorized': uncategorized, 'results': results}))
+
+
+if __name__ == '__main__':
+    main()
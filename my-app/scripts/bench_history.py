@@ -0,0 +1,71 @@
+"""Query benchmark for the price history.
+
+Fills a temporary history with daily snapshots of synthetic products, then
+times ``PriceHistory.stats`` over a window for every product, before and
+after compaction.
+
+Usage: python bench_history.py [--products 5000] [--days 90] [--window 30] [--repeat 5]
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from discount_record import Discount
+from price_history import DAY, PriceHistory, product_key
+
+
+def make_products(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        (f"Product {i} {rng.choice(['500g', '1kg', '2L', '6 pack'])}", rng.randint(500, 20000))
+        for i in range(count)
+    ]
+
+
+def snapshot(products, rng):
+    discounts = []
+    for title, base in products:
+        price_minor = int(base * rng.uniform(0.7, 1.1))
+        discounts.append(Discount(
+            title=title, store='Checkers', location='Cape Town', category=None, currency='ZAR',
+            price_minor=price_minor, original_price_minor=None, discount_bp=None,
+            price=f"R{price_minor / 100:.2f}", original_price=None, discount_percentage=None,
+        ))
+    return discounts
+
+
+def time_stats(history, keys, window, now, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stats = history.stats(keys, days=window, now=now)
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=90, help='daily snapshots to generate')
+    parser.add_argument('--window', type=float, default=30, help='days covered by the query')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    products = make_products(args.products)
+    now = time.time()
+    with tempfile.TemporaryDirectory() as directory:
+        # No automatic compaction, so the first timing is over raw segments
+        history = PriceHistory(directory, max_segments=args.days + 1)
+        started = time.perf_counter()
+        for day in range(args.days, 0, -1):
+            history.append(snapshot(products, rng), at=now - day * DAY)
+        print(f"appended {args.days} snapshots of {args.products} products in {time.perf_counter() - started:.2f}s")
+
+        keys = [product_key(d) for d in snapshot(products, rng)]
+        for label in ('segments', 'compacted'):
+            if label == 'compacted':
+                history.compact(now=now)
+            best, found = time_stats(history, keys, args.window, now, args.repeat)
+            print(f"{label:>10}: stats for {found} products over {args.window:g} days in {best * 1000:.1f}ms")
@@ -0,0 +1,84 @@
+"""Compare the ``full`` and ``light`` scrape profiles on real store pages.
+
+For each profile and store, starts a fresh driver and loads the store page,
+then reports:
+
+* seconds until the first product card is in the DOM
+* seconds until the network goes idle
+* requests made, requests blocked and bytes transferred
+* the driver's RSS (chromedriver plus browser processes)
+
+Usage: python bench_profile.py [--stores checkers,tesco] [--runs 1]
+
+Point ``CHECKERS_URL`` / ``TESCO_URL`` at recorded pages to benchmark
+offline.
+"""
+import argparse
+import json
+import sys
+import time
+
+from driver_governor import quit_driver
+from page_readiness import PageReadiness
+from proc_stats import driver_rss_bytes
+from scrape_discounts import setup_driver, _csv
+from scrape_profile import PROFILES
+from store_registry import STORE_ADAPTERS
+
+
+def measure(adapter, profile):
+    driver = setup_driver(profile=profile)
+    try:
+        ready = PageReadiness(driver, jitter=(0, 0))
+        ready.reset_network()
+        started = time.monotonic()
+        driver.get(adapter.url)
+        first_product = ready.first_match(adapter.card_selector, timeout=30)
+        ready.network_idle(timeout=30)
+        rss = driver_rss_bytes(driver)
+        return {
+            'store': adapter.key,
+            'profile': profile,
+            'first_product': None if first_product is None else round(time.monotonic() - started, 3),
+            'network_idle': round(time.monotonic() - started, 3),
+            'requests': ready.network['requests'],
+            'blocked': ready.network['blocked'],
+            'bytes': ready.network['bytes'],
+            'rss_mb': None if rss is None else round(rss / 2**20, 1),
+        }
+    finally:
+        quit_driver(driver)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scrape profiles.')
+    parser.add_argument('--stores', type=_csv, default=None, help='comma-separated store names')
+    parser.add_argument('--runs', type=int, default=1)
+    args = parser.parse_args()
+
+    adapters = [
+        adapter for adapter in STORE_ADAPTERS.values()
+        if not args.stores or any(s.lower() in adapter.key for s in args.stores)
+    ]
+    results = []
+    for adapter in adapters:
+        for _ in range(args.runs):
+            for profile in PROFILES:
+                try:
+                    result = measure(adapter, profile)
+                except Exception as e:
+                    print(f"{adapter.name} ({profile}) failed: {str(e)}", file=sys.stderr)
+                    continue
+                print(
+                    f"{adapter.name:>9} {profile:>5}: first product {result['first_product']}s, "
+                    f"idle {result['network_idle']}s, {result['requests']} requests "
+                    f"({result['blocked']} blocked), {result['bytes'] / 2**20:.2f} MB, "
+                    f"RSS {result['rss_mb']} MB",
+                    file=sys.stderr,
+                )
+                results.append(result)
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
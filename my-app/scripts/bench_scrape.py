@@ -0,0 +1,213 @@
+"""Offline benchmark of the scraper pipeline against recorded store pages.
+
+Serves ``scripts/fixtures`` from a local HTTP server, points ``CHECKERS_URL``
+and ``TESCO_URL`` at it and runs the store scrapers, recording per run:
+
+* ``startup``: seconds to start the driver
+* ``navigation``: seconds spent in ``driver.get``
+* ``first_product``: seconds from the start of the scrape to the first
+  discount
+* ``products`` and ``products_per_second``
+* ``webdriver_calls``: WebDriver round trips
+* ``peak_rss_mb``: peak RSS of the driver's process tree (Linux)
+
+along with the full per-phase timings and counters (see ``scrape_metrics``).
+
+``--mode http`` times the browserless HTTP path on the same pages instead.
+Results are written as JSON (default ``.scraper/bench/``), tagged with the
+git commit, so runs can be compared across commits.
+
+Usage: python bench_scrape.py [--stores checkers,tesco] [--runs 3] [--mode browser|http|both]
+"""
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from proc_stats import driver_rss_bytes
+from scrape_metrics import ScrapeMetrics
+from scraper_paths import SCRIPTS_DIR, data_dir
+
+FIXTURES_DIR = os.path.join(SCRIPTS_DIR, 'fixtures')
+
+# Store key -> (URL override variable, recorded page)
+FIXTURES = {
+    'checkers': ('CHECKERS_URL', 'checkers_specials.html'),
+    'tesco': ('TESCO_URL', 'tesco_promotions.html'),
+}
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    extensions_map = dict(SimpleHTTPRequestHandler.extensions_map, **{'.html': 'text/html; charset=utf-8'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(FixtureHandler, directory=FIXTURES_DIR))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class PeakRss:
+    """Samples a driver's RSS on a background thread, keeping the peak."""
+
+    def __init__(self, driver, interval=0.1):
+        self.driver = driver
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = driver_rss_bytes(self.driver)
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _first_product_timer(started):
+    first = []
+
+    def on_discount(discount):
+        if not first:
+            first.append(time.monotonic() - started)
+    return first, on_discount
+
+
+def bench_browser(adapter, profile=None):
+    from scrape_discounts import setup_driver
+
+    metrics = ScrapeMetrics(adapter.key)
+    with metrics.phase('driver_setup'):
+        driver = setup_driver(profile=profile)
+    try:
+        with metrics.active(), metrics.watch_driver(driver), PeakRss(driver) as rss:
+            started = time.monotonic()
+            first, on_discount = _first_product_timer(started)
+            discounts = adapter.scrape(driver=driver, on_discount=on_discount)
+            elapsed = time.monotonic() - started
+    finally:
+        driver.quit()
+    record = metrics.to_dict()
+    return {
+        'startup': record['phases']['driver_setup']['seconds'],
+        'navigation': record['phases'].get('navigation', {}).get('seconds'),
+        'first_product': round(first[0], 3) if first else None,
+        'elapsed': round(elapsed, 3),
+        'products': len(discounts),
+        'products_per_second': round(len(discounts) / elapsed, 1) if elapsed else None,
+        'webdriver_calls': metrics.counters['webdriver_calls'],
+        'peak_rss_mb': None if rss.peak is None else round(rss.peak / 2**20, 1),
+        'phases': record['phases'],
+        'counters': record['counters'],
+    }
+
+
+def bench_http(adapter):
+    from http_fetch import fetch_discounts_http
+
+    started = time.monotonic()
+    discounts = fetch_discounts_http(adapter) or []
+    elapsed = time.monotonic() - started
+    return {
+        'elapsed': round(elapsed, 3),
+        'products': len(discounts),
+        'products_per_second': round(len(discounts) / elapsed, 1) if elapsed else None,
+    }
+
+
+def summarise(runs):
+    """Median of every numeric metric per (store, mode)."""
+    groups = {}
+    for run in runs:
+        groups.setdefault(f"{run['store']}/{run['mode']}", []).append(run)
+    summary = {}
+    for name, group in groups.items():
+        metrics = {}
+        for key, value in group[0].items():
+            values = [run[key] for run in group if isinstance(run.get(key), (int, float))]
+            if key != 'run' and isinstance(value, (int, float)) and values:
+                metrics[key] = round(statistics.median(values), 3)
+        summary[name] = metrics
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers against recorded pages.')
+    parser.add_argument('--stores', default=','.join(FIXTURES), help='comma-separated store keys')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--mode', choices=['browser', 'http', 'both'], default='browser')
+    parser.add_argument('--profile', default=None, help='browser scrape profile (see scrape_profile)')
+    parser.add_argument('--output', default=None, help='results file (default: .scraper/bench/)')
+    args = parser.parse_args()
+
+    server = start_fixture_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    for variable, page in FIXTURES.values():
+        os.environ[variable] = f"{base_url}/{page}"
+
+    # Imported after the URL overrides so the adapters pick them up
+    from store_registry import get_adapter
+    import scrape_discounts  # noqa: F401 - registers the store adapters
+
+    modes = ['browser', 'http'] if args.mode == 'both' else [args.mode]
+    runs = []
+    for key in [k.strip() for k in args.stores.split(',') if k.strip()]:
+        adapter = get_adapter(key)
+        for mode in modes:
+            for attempt in range(args.runs):
+                try:
+                    result = bench_browser(adapter, args.profile) if mode == 'browser' else bench_http(adapter)
+                except Exception as e:
+                    print(f"{adapter.name} {mode} run {attempt + 1} failed: {str(e)}", file=sys.stderr)
+                    continue
+                runs.append(dict(result, store=key, mode=mode, run=attempt + 1))
+                print(f"{adapter.name} {mode} run {attempt + 1}: {json.dumps(result)}", file=sys.stderr)
+    server.shutdown()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'profile': args.profile or os.environ.get('SCRAPE_PROFILE') or 'light',
+        'summary': summarise(runs),
+        'runs': runs,
+    }
+    output = args.output or os.path.join(
+        data_dir('bench'), f"scrape-{results['commit'] or 'unknown'}-{int(time.time())}.json"
+    )
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results['summary'], indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
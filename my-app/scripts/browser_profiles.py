@@ -0,0 +1,110 @@
+"""Reusable Chrome ``user-data-dir`` profiles, one set per store.
+
+A fresh profile makes every scrape accept the cookie banner again and start
+with a cold disk cache. Profiles kept under ``.scraper/profiles`` carry the
+consent cookies and cached assets from one scrape to the next.
+
+Chrome cannot share a profile between processes, so each profile directory
+is a slot guarded by an ``flock``: ``checkers-0``, ``checkers-1``, ... up to
+``SCRAPE_PROFILE_SLOTS`` (default 2) per name. When every slot is busy the
+scrape gets a throwaway temporary profile instead of waiting; zero slots
+turns persistent profiles off. A profile is wiped and recreated once it is
+older than ``SCRAPE_PROFILE_MAX_AGE`` seconds (default 7 days), or when a
+scrape using it failed, in case the failure came from a corrupted profile.
+"""
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from discount_cache import write_json_atomic
+from scraper_paths import data_dir
+
+DEFAULT_SLOTS = 2
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+# Left behind by a Chrome that was killed; safe to delete under our lock
+SINGLETON_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+
+class ProfileLease:
+    """One profile directory, held until ``release``."""
+
+    def __init__(self, path, lock_file=None):
+        self.path = path
+        self._lock_file = lock_file
+
+    @property
+    def temporary(self):
+        return self._lock_file is None
+
+    def release(self, reset=False):
+        """Give the profile back, wiping it first if ``reset``."""
+        if self.temporary or reset:
+            shutil.rmtree(self.path, ignore_errors=True)
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class BrowserProfiles:
+    def __init__(self, directory=None, slots=None, max_age=None):
+        self.directory = directory or data_dir('profiles')
+        self.slots = slots if slots is not None else int(os.environ.get('SCRAPE_PROFILE_SLOTS', DEFAULT_SLOTS))
+        self.max_age = max_age if max_age is not None else float(
+            os.environ.get('SCRAPE_PROFILE_MAX_AGE', DEFAULT_MAX_AGE)
+        )
+
+    def acquire(self, name):
+        """Lock a free profile slot for ``name``, or fall back to a temporary one."""
+        for slot in range(self.slots):
+            path = os.path.join(self.directory, f"{name}-{slot}")
+            lock_file = open(f"{path}.lock", 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            self._prepare(path)
+            return ProfileLease(path, lock_file)
+
+        if self.slots:
+            print(f"All {name} browser profiles are in use; using a temporary one", file=sys.stderr)
+        return ProfileLease(tempfile.mkdtemp(prefix=f"{name}-", dir=self.directory))
+
+    @contextmanager
+    def lease(self, name):
+        """Hold a profile for ``name``; it is reset if the block raises."""
+        lease = self.acquire(name)
+        failed = True
+        try:
+            yield lease
+            failed = False
+        finally:
+            lease.release(reset=failed)
+
+    def _prepare(self, path):
+        meta_path = os.path.join(path, 'scraper-profile.json')
+        try:
+            with open(meta_path) as f:
+                created = json.load(f)['created']
+        except (OSError, ValueError, KeyError):
+            created = None
+        if created is not None and time.time() - created > self.max_age:
+            print(f"Resetting expired browser profile {os.path.basename(path)}", file=sys.stderr)
+            shutil.rmtree(path, ignore_errors=True)
+            created = None
+
+        os.makedirs(path, exist_ok=True)
+        for name in SINGLETON_FILES:
+            try:
+                os.unlink(os.path.join(path, name))
+            except OSError:
+                pass
+        if created is None:
+            write_json_atomic(meta_path, {'created': time.time()})
@@ -0,0 +1,139 @@
+"""Keyword-based product category classifier shared by every store.
+
+The taxonomy is loaded from ``categories.json`` next to this file (or the
+path in ``CATEGORY_TAXONOMY``): an ordered list of categories, each with
+keywords. Keywords are compiled into word lookup tables, and a batch of
+titles is classified by tokenising all of them with a single regex scan and
+one pass over the tokens, so matching is on whole words ("ham" does not
+match "shampoo") at a dictionary lookup per word.
+
+A title gets the category of its longest matching keyword ("ice cream"
+beats "cream"), ties going to the category listed first. A keyword's last
+word also matches its regular English plural or singular: "apple" matches
+"apples", "tomato" "tomatoes", "berry" "berries" and "loaf" "loaves", and a
+plural keyword such as "beans" matches "bean". Irregular plurals ("mice")
+need their own keyword. A keyword spelled out in the taxonomy always wins
+over another keyword's inflected form.
+"""
+from functools import lru_cache
+import json
+import os
+import re
+
+DEFAULT_TAXONOMY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'categories.json')
+
+# Words, keeping hyphenated and apostrophe forms ("coca-cola", "kellogg's")
+# whole; a newline token separates titles in a batch.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*|\n")
+
+
+_VOWELS = set('aeiou')
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _inflections(word):
+    """Regular plural and singular forms of ``word``, other than itself."""
+    forms = {word + 's', word + 'es'}
+    if len(word) > 2 and word.endswith('y') and word[-2] not in _VOWELS:
+        forms.add(word[:-1] + 'ies')
+    elif word.endswith('fe'):
+        forms.add(word[:-2] + 'ves')
+    elif word.endswith('f'):
+        forms.add(word[:-1] + 'ves')
+
+    if word.endswith('ies') and len(word) > 4:
+        forms.add(word[:-3] + 'y')
+    elif word.endswith('ves') and len(word) > 4:
+        forms.update((word[:-3] + 'f', word[:-3] + 'fe'))
+    elif word.endswith(('ches', 'shes', 'sses', 'xes', 'zes', 'oes')):
+        forms.add(word[:-2])
+    elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')) and len(word) > 3:
+        forms.add(word[:-1])
+    forms.discard(word)
+    return forms
+
+
+class CategoryClassifier:
+    def __init__(self, categories, default='other'):
+        """``categories`` is an ordered list of ``(name, keywords)`` pairs."""
+        self.default = default
+        # word -> match, and first word -> {remaining words: match}, where a
+        # match is ``(keyword length, -priority, category)`` so ``max`` wins
+        self._words = {}
+        self._phrases = {}
+        compiled = []
+        for priority, (name, keywords) in enumerate(categories):
+            for keyword in keywords:
+                words = tuple(_tokens(keyword))
+                if words:
+                    compiled.append((words, (len(' '.join(words)), -priority, name)))
+        # Keywords as written first, so an inflected form never shadows a
+        # keyword of another category
+        for words, match in compiled:
+            self._add(words, match)
+        for words, match in compiled:
+            for form in sorted(_inflections(words[-1])):
+                self._add(words[:-1] + (form,), match)
+
+    def _add(self, words, match):
+        if len(words) == 1:
+            self._words.setdefault(words[0], match)
+        else:
+            self._phrases.setdefault(words[0], {}).setdefault(words[1:], match)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            taxonomy = json.load(f)
+        categories = [(entry['category'], entry['keywords']) for entry in taxonomy['categories']]
+        return cls(categories, default=taxonomy.get('default', 'other'))
+
+    def classify_batch(self, titles):
+        """Categories for ``titles``, computed in one pass over their words."""
+        tokens = _tokens('\n'.join((title or '').replace('\n', ' ') for title in titles))
+        tokens.append('\n')
+        words = self._words.get
+        phrases = self._phrases.get
+
+        categories = []
+        best = None
+        for i, token in enumerate(tokens):
+            if token == '\n':
+                categories.append(best[2] if best else self.default)
+                best = None
+                continue
+            match = words(token)
+            if match and (best is None or match > best):
+                best = match
+            tails = phrases(token)
+            if tails:
+                for tail, match in tails.items():
+                    if tuple(tokens[i + 1:i + 1 + len(tail)]) == tail and (best is None or match > best):
+                        best = match
+        return categories
+
+    def classify(self, title):
+        return self.classify_batch([title])[0]
+
+
+@lru_cache(maxsize=None)
+def _load(path):
+    return CategoryClassifier.from_file(path)
+
+
+def default_classifier():
+    """Classifier for the configured taxonomy file, loaded once per process."""
+    return _load(os.environ.get('CATEGORY_TAXONOMY') or DEFAULT_TAXONOMY)
+
+
+def assign_categories(discounts, classifier=None):
+    """Fill in missing categories on ``Discount`` records from their titles."""
+    pending = [d for d in discounts if not d.category]
+    if pending:
+        classifier = classifier or default_classifier()
+        for discount, category in zip(pending, classifier.classify_batch([d.title for d in pending])):
+            discount.category = category
+    return discounts
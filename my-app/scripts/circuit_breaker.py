@@ -0,0 +1,98 @@
+"""Per-store circuit breaker shared by every scraper process.
+
+After ``SCRAPE_BREAKER_FAILURES`` (default 3) failed live scrapes in a row,
+a store's breaker opens and live scrapes of it are skipped for
+``SCRAPE_BREAKER_COOLDOWN`` seconds (default 300), so a store that is down
+or blocking us stops eating the request budget. Cached results are still
+served meanwhile. Once the cooldown has passed one trial scrape is allowed
+through: the first caller claims the trial and everyone else is refused
+until it records success (closing the breaker) or failure (re-opening it).
+A trial that never reports back, e.g. because its process died, lapses
+after another cooldown.
+
+State lives in ``.scraper/breakers/<store>.json`` so one-off scraper
+processes, background refreshes and the daemon all see the same breaker.
+Every read-modify-write of it happens under an ``flock`` on
+``<store>.lock``, so concurrent threads and processes never lose an update.
+"""
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+import sys
+import time
+
+from discount_cache import write_json_atomic
+from scraper_paths import data_dir
+
+DEFAULT_FAILURES = 3
+DEFAULT_COOLDOWN = 5 * 60
+
+CLOSED = {'failures': 0, 'opened': None, 'trial': None}
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, directory=None, failures=None, cooldown=None):
+        self.name = name
+        directory = directory or data_dir('breakers')
+        self.path = os.path.join(directory, f"{name}.json")
+        self._lock_path = os.path.join(directory, f"{name}.lock")
+        self.failures = failures or int(os.environ.get('SCRAPE_BREAKER_FAILURES', DEFAULT_FAILURES))
+        self.cooldown = cooldown if cooldown is not None else float(
+            os.environ.get('SCRAPE_BREAKER_COOLDOWN', DEFAULT_COOLDOWN)
+        )
+
+    def _state(self):
+        try:
+            with open(self.path) as f:
+                return dict(CLOSED, **json.load(f))
+        except (OSError, ValueError):
+            return dict(CLOSED)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the breaker's lock; yields its current state."""
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self._state()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def allow(self):
+        """Whether a live scrape may run now: closed, or this caller claimed the trial."""
+        with self._locked() as state:
+            if state['opened'] is None:
+                return True
+            now = time.time()
+            if now - state['opened'] < self.cooldown:
+                return False
+            if state['trial'] is not None and now - state['trial'] < self.cooldown:
+                return False
+            write_json_atomic(self.path, dict(state, trial=now))
+            print(f"Allowing one trial scrape of {self.name}", file=sys.stderr)
+            return True
+
+    def check(self):
+        """Raise ``CircuitOpen`` unless a live scrape may run."""
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} circuit open after repeated failures")
+
+    def record_success(self):
+        with self._locked() as state:
+            if state != CLOSED:
+                write_json_atomic(self.path, CLOSED)
+
+    def record_failure(self):
+        with self._locked() as state:
+            failures = state['failures'] + 1
+            opened = state['opened']
+            if failures >= self.failures:
+                if opened is None or state['trial'] is not None:
+                    print(f"Opening {self.name} circuit after {failures} failed scrapes", file=sys.stderr)
+                opened = time.time()
+            write_json_atomic(self.path, {'failures': failures, 'opened': opened, 'trial': None})
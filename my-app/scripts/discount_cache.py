@@ -0,0 +1,144 @@
+"""On-disk TTL cache for store scrapes, with stale-while-revalidate.
+
+Entries are keyed by location, store and the filters applied to the
+results, stored as JSON under ``.scraper/cache`` and written atomically so
+concurrent readers never see a partial file. Within ``ttl`` an entry is
+served as a hit; after that it is still served immediately for up to
+``max_stale`` seconds while a background refresh replaces it.
+
+``DISCOUNT_CACHE_TTL`` and ``DISCOUNT_CACHE_MAX_STALE`` (seconds) override
+the defaults.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from scraper_paths import data_dir
+
+DEFAULT_TTL = 6 * 60 * 60
+DEFAULT_MAX_STALE = 3 * 24 * 60 * 60
+
+# A refresh claim older than this is assumed dead and can be retaken
+REFRESH_CLAIM_TIMEOUT = 10 * 60
+
+
+def _env_seconds(name, default):
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def write_json_atomic(path, data):
+    """Write JSON to ``path`` via a temp file and rename."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class PartialResult(list):
+    """Discounts from a scrape that was cut short; returned but never cached."""
+
+
+class DiscountCache:
+    def __init__(self, directory=None, ttl=None, max_stale=None):
+        self.directory = directory or data_dir('cache')
+        self.ttl = ttl if ttl is not None else _env_seconds('DISCOUNT_CACHE_TTL', DEFAULT_TTL)
+        self.max_stale = max_stale if max_stale is not None else _env_seconds('DISCOUNT_CACHE_MAX_STALE', DEFAULT_MAX_STALE)
+
+    @staticmethod
+    def key(location, store, filters=None):
+        normalised = {
+            'location': location.strip().lower(),
+            'store': store.lower(),
+            'filters': {k: v for k, v in sorted((filters or {}).items()) if v not in (None, [], '')},
+        }
+        digest = hashlib.sha1(json.dumps(normalised, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"{normalised['store']}-{digest[:16]}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, discounts, **meta):
+        entry = dict(meta, created=time.time(), discounts=discounts)
+        write_json_atomic(self._path(key), entry)
+        self._release_refresh(key)
+        return entry
+
+    def _claim_refresh(self, key):
+        """Take the refresh marker for ``key``; False if a refresh is running.
+
+        The marker is created exclusively, and a stale one is only retaken
+        under a lock, so concurrent readers of a stale entry start one
+        refresh between them.
+        """
+        marker = self._path(key) + '.refreshing'
+        with open(self._path(key) + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(marker) < REFRESH_CLAIM_TIMEOUT:
+                        return False
+                except OSError:
+                    pass
+                # The previous claim is dead; take it over
+                fd = os.open(marker, os.O_CREAT | os.O_TRUNC | os.O_WRONLY)
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+        return True
+
+    def _release_refresh(self, key):
+        try:
+            os.unlink(self._path(key) + '.refreshing')
+        except OSError:
+            pass
+
+    def fetch(self, key, scrape, refresh=None, **meta):
+        """Return ``(discounts, info)`` from cache, scraping on a miss.
+
+        ``scrape()`` produces fresh discounts synchronously; ``refresh()``
+        should start a background re-scrape that ends in ``put(key, ...)``.
+        Without ``refresh`` stale entries are treated as misses.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            age = time.time() - entry.get('created', 0)
+            if age <= self.ttl:
+                return entry['discounts'], {'status': 'hit', 'age': round(age, 1)}
+            if refresh is not None and age <= self.ttl + self.max_stale:
+                if self._claim_refresh(key):
+                    try:
+                        refresh()
+                    except Exception as e:
+                        print(f"Error starting background refresh: {str(e)}", file=sys.stderr)
+                        self._release_refresh(key)
+                return entry['discounts'], {'status': 'stale', 'age': round(age, 1)}
+
+        discounts = scrape()
+        # An empty result is far more likely a failed scrape than a store
+        # with no specials, so don't pin it for a whole TTL. Nor a partial one
+        if discounts and not isinstance(discounts, PartialResult):
+            self.put(key, discounts, **meta)
+        return discounts, {'status': 'miss', 'age': 0}
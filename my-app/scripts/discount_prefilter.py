@@ -0,0 +1,132 @@
+"""Narrow and compact a discount list before the API asks GPT to filter it.
+
+Only dietary preferences need the model. Categories, the price range and
+the minimum discount are applied here on the records' integer fields (see
+``store_parsing.apply_filters``), and the rows left are encoded for the
+prompt as a compact table that carries only what a dietary decision needs,
+keyed by short ids::
+
+    id|title|category
+    0|Clover Full Cream Milk 2L|dairy
+    1|Koo Baked Beans 410g|pantry
+
+Rows go in best-discount-first until the estimated prompt size reaches the
+token budget (``--token-budget``, default ``PREFILTER_TOKEN_BUDGET`` or
+4000); the rows left over start the next table, so every kept row is in
+exactly one batch and the caller makes one model call per batch.
+
+Reads the discount records as a JSON array on stdin and prints::
+
+    {"keep":[0,2,5],"batches":[{"table":"id|title|category\\n...","ids":{"0":5,"1":0},"tokens":212},...]}
+
+``keep`` indexes the input records that pass the deterministic filters, in
+input order. Each batch's ``ids`` maps its table ids back to input records,
+so the caller can rehydrate the full records from the ids the model
+returns; ids restart at ``0`` in every batch.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+
+from discount_record import Discount
+from store_parsing import apply_filters
+
+TOKEN_BUDGET = int(os.environ.get('PREFILTER_TOKEN_BUDGET', '4000'))
+TABLE_HEADER = 'id|title|category'
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token for English text."""
+    return math.ceil(len(text) / 4)
+
+
+def short_id(n):
+    """Base-36 id for row ``n``: ``0``..``z``, ``10``..."""
+    digits = ''
+    while True:
+        n, digit = divmod(n, 36)
+        digits = _DIGITS[digit] + digits
+        if not n:
+            return digits
+
+
+def prefilter(discounts, categories=None, min_price=None, max_price=None, min_discount=None):
+    """Indexes of ``discounts`` passing the deterministic filters."""
+    passing = {id(d) for d in apply_filters(discounts, categories, min_price, max_price)}
+    min_bp = None if min_discount is None else round(min_discount * 100)
+    return [
+        n for n, d in enumerate(discounts)
+        if id(d) in passing and (min_bp is None or (d.discount_bp or 0) >= min_bp)
+    ]
+
+
+def _cell(text):
+    return ' '.join((text or '').replace('|', '/').split())
+
+
+def compact_table(discounts, keep, budget=None):
+    """``(table, ids, omitted, tokens)`` for the ``keep`` rows, within ``budget`` tokens.
+
+    ``omitted`` lists the ``keep`` indexes left out of the table, in input
+    order. The best row is always tabled, even if it alone is over budget.
+    """
+    budget = budget or TOKEN_BUDGET
+    ranked = sorted(keep, key=lambda n: -(discounts[n].discount_bp or 0))
+    lines = [TABLE_HEADER]
+    tokens = estimate_tokens(TABLE_HEADER)
+    ids = {}
+    for n in ranked:
+        row_id = short_id(len(ids))
+        line = f"{row_id}|{_cell(discounts[n].title)}|{_cell(discounts[n].category)}"
+        cost = estimate_tokens(line) + 1
+        if ids and tokens + cost > budget:
+            break
+        lines.append(line)
+        tokens += cost
+        ids[row_id] = n
+    tabled = set(ids.values())
+    return '\n'.join(lines), ids, [n for n in keep if n not in tabled], tokens
+
+
+def compact_tables(discounts, keep, budget=None):
+    """``[(table, ids, tokens), ...]``: the ``keep`` rows split into budget-sized tables."""
+    batches = []
+    while keep:
+        table, ids, keep, tokens = compact_table(discounts, keep, budget)
+        batches.append((table, ids, tokens))
+    return batches
+
+
+def main():
+    csv = lambda value: [part.strip() for part in value.split(',') if part.strip()]
+    parser = argparse.ArgumentParser(description='Pre-filter and compact discounts for the GPT filter.')
+    parser.add_argument('--categories', type=csv, default=None, help='comma-separated categories')
+    parser.add_argument('--min-price', type=float, default=None)
+    parser.add_argument('--max-price', type=float, default=None)
+    parser.add_argument('--min-discount', type=float, default=None, help='minimum discount, in percent')
+    parser.add_argument('--token-budget', type=int, default=None,
+                        help='estimated tokens the table may use (default: PREFILTER_TOKEN_BUDGET or 4000)')
+    args = parser.parse_args()
+
+    discounts = [Discount.from_dict(record) for record in json.load(sys.stdin)]
+    keep = prefilter(
+        discounts,
+        categories=args.categories,
+        min_price=args.min_price,
+        max_price=args.max_price,
+        min_discount=args.min_discount,
+    )
+    batches = compact_tables(discounts, keep, budget=args.token_budget)
+    if len(batches) > 1:
+        print(f"Token budget reached: {len(keep)} discounts split into {len(batches)} tables", file=sys.stderr)
+    print(json.dumps(
+        {'keep': keep, 'batches': [{'table': table, 'ids': ids, 'tokens': tokens} for table, ids, tokens in batches]},
+        separators=(',', ':'),
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Compact, typed discount records.
+
+Prices are parsed once, at extraction time, into a currency code and
+integer minor units (cents/pence), and the discount into integer basis
+points, so filtering and sorting downstream is plain integer work. The
+display strings the UI shows are kept alongside.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import re
+
+CURRENCY_BY_SYMBOL = {'£': 'GBP', 'R': 'ZAR'}
+
+# A symbol-prefixed amount anywhere in the text ("2 for R50" -> R50)...
+_SYMBOL_PRICE_RE = re.compile(r'(£|R)\s*(\d[\d,]*(?:\.\d+)?)')
+# ...or a bare amount, optionally in pence ("1.50", "75p")
+_BARE_PRICE_RE = re.compile(r'\s*(\d[\d,]*(?:\.\d+)?)\s*(p?)\s*', re.IGNORECASE)
+
+
+def _to_minor(amount):
+    try:
+        value = Decimal(amount.replace(',', ''))
+    except InvalidOperation:
+        return None
+    return int((value * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def parse_price(text, default_currency=None):
+    """Parse a display price into ``(currency, minor_units)``.
+
+    Returns ``(default_currency, None)`` when no amount can be found.
+    """
+    if not text:
+        return default_currency, None
+    match = _SYMBOL_PRICE_RE.search(text)
+    if match:
+        return CURRENCY_BY_SYMBOL[match.group(1)], _to_minor(match.group(2))
+    match = _BARE_PRICE_RE.fullmatch(text)
+    if match:
+        if match.group(2):
+            return 'GBP', int(Decimal(match.group(1).replace(',', '')))
+        return default_currency, _to_minor(match.group(1))
+    return default_currency, None
+
+
+class Discount:
+    __slots__ = (
+        'title', 'store', 'location', 'category', 'currency',
+        'price_minor', 'original_price_minor', 'discount_bp',
+        'price', 'original_price', 'discount_percentage',
+    )
+
+    def __init__(self, title, store, location, category, currency,
+                 price_minor, original_price_minor, discount_bp,
+                 price, original_price, discount_percentage):
+        self.title = title
+        self.store = store
+        self.location = location
+        self.category = category
+        self.currency = currency
+        self.price_minor = price_minor
+        self.original_price_minor = original_price_minor
+        self.discount_bp = discount_bp
+        self.price = price
+        self.original_price = original_price
+        self.discount_percentage = discount_percentage
+
+    @classmethod
+    def from_display(cls, title, price, original_price, store, location, category, currency=None):
+        """Build a record from scraped display strings, parsing them once."""
+        currency, price_minor = parse_price(price, currency)
+        original_currency, original_minor = parse_price(original_price, currency)
+        if original_currency != currency:
+            original_minor = None
+
+        discount_bp = None
+        if price_minor is not None and original_minor:
+            discount_bp = round((original_minor - price_minor) * 10000 / original_minor)
+
+        return cls(
+            title=title,
+            store=store,
+            location=location,
+            category=category,
+            currency=currency,
+            price_minor=price_minor,
+            original_price_minor=original_minor,
+            discount_bp=discount_bp,
+            price=price,
+            original_price=original_price,
+            discount_percentage=f"{discount_bp / 100:.1f}%" if discount_bp else None,
+        )
+
+    @property
+    def store_key(self):
+        return self.store.lower()
+
+    @property
+    def dedupe_key(self):
+        return (self.title, self.price)
+
+    def to_dict(self):
+        record = {name: getattr(self, name) for name in self.__slots__}
+        # Lowercase store id so consumers can filter without normalising
+        record['store_key'] = self.store_key
+        return record
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def __repr__(self):
+        return f"Discount({self.store!r}, {self.title!r}, {self.price!r})"
@@ -0,0 +1,186 @@
+"""Indexed SQLite store of the latest scraped discounts.
+
+Every live store scrape replaces that store's rows for the location, so the
+database holds the current catalogue per (location, store) with the time it
+was scraped. Queries take the API's filters and let SQLite's indexes pick
+out only the matching rows:
+
+* the primary key ``(location_key, store_key, title, price)`` doubles as
+  the (location, store) index
+* ``(location_key, category)``, ``(location_key, price_minor)`` and
+  ``(location_key, discount_bp)`` serve category, price-range and
+  best-discount lookups
+
+API lookups are also logged in ``requests``, so the refresh scheduler can
+keep the most requested locations warm.
+
+The database lives at ``.scraper/discounts.sqlite3`` unless ``DISCOUNT_DB``
+points elsewhere. It is opened in WAL mode so the API's readers never block
+behind a scraper writing.
+"""
+from contextlib import closing
+import os
+import sqlite3
+import time
+
+from discount_record import Discount
+from scraper_paths import data_dir
+from store_parsing import to_minor_units
+
+# Discount fields stored as columns, besides the key columns
+FIELDS = tuple(name for name in Discount.__slots__ if name not in ('title', 'price'))
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS discounts (
+    location_key TEXT NOT NULL,
+    store_key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    price TEXT NOT NULL,
+    {', '.join(f"{name} {'INTEGER' if name.endswith(('_minor', '_bp')) else 'TEXT'}" for name in FIELDS)},
+    scraped_at REAL NOT NULL,
+    PRIMARY KEY (location_key, store_key, title, price)
+);
+CREATE INDEX IF NOT EXISTS discounts_category ON discounts (location_key, category);
+CREATE INDEX IF NOT EXISTS discounts_price ON discounts (location_key, price_minor);
+CREATE INDEX IF NOT EXISTS discounts_discount ON discounts (location_key, discount_bp);
+CREATE TABLE IF NOT EXISTS scrapes (
+    location_key TEXT NOT NULL,
+    store_key TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (location_key, store_key)
+);
+CREATE TABLE IF NOT EXISTS requests (
+    location_key TEXT NOT NULL,
+    location TEXT NOT NULL,
+    requested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_time ON requests (requested_at);
+'''
+
+COLUMNS = ('title', 'price') + FIELDS
+
+
+def location_key(location):
+    return location.strip().lower()
+
+
+class DiscountStore:
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('DISCOUNT_DB') or os.path.join(data_dir(), 'discounts.sqlite3')
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per call keeps the store usable from
+        # the daemon's worker threads and from concurrent processes
+        return sqlite3.connect(self.path, timeout=30)
+
+    def replace_store(self, location, store_key, discounts, scraped_at=None, partial=False):
+        """Make ``discounts`` the current catalogue of one store at a location.
+
+        A ``partial`` scrape only adds and updates rows: it neither drops the
+        products it did not reach nor counts as a fresh scrape.
+        """
+        scraped_at = scraped_at or time.time()
+        key = location_key(location)
+        rows = [
+            (key, store_key, scraped_at) + tuple(getattr(d, name) for name in COLUMNS)
+            for d in discounts
+        ]
+        placeholders = ', '.join('?' * (3 + len(COLUMNS)))
+        updates = ', '.join(f"{name} = excluded.{name}" for name in FIELDS + ('scraped_at',))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT INTO discounts (location_key, store_key, scraped_at, {', '.join(COLUMNS)}) "
+                f"VALUES ({placeholders}) "
+                f"ON CONFLICT (location_key, store_key, title, price) DO UPDATE SET {updates}",
+                rows,
+            )
+            if partial:
+                return
+            # Products no longer on offer
+            conn.execute(
+                'DELETE FROM discounts WHERE location_key = ? AND store_key = ? AND scraped_at < ?',
+                (key, store_key, scraped_at),
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO scrapes (location_key, store_key, scraped_at, count) VALUES (?, ?, ?, ?)',
+                (key, store_key, scraped_at, len(rows)),
+            )
+
+    def scraped_at(self, location):
+        """``{store_key: timestamp}`` of the last stored scrape per store."""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute(
+                'SELECT store_key, scraped_at FROM scrapes WHERE location_key = ?',
+                (location_key(location),),
+            ))
+
+    def record_request(self, location, requested_at=None):
+        """Log that the API asked for ``location``."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT INTO requests (location_key, location, requested_at) VALUES (?, ?, ?)',
+                (location_key(location), location.strip(), requested_at or time.time()),
+            )
+
+    def popular_locations(self, since, limit=None):
+        """``[(location, requests)]`` requested after ``since``, most requested first.
+
+        Each location is given as it was most recently spelled.
+        """
+        with closing(self._connect()) as conn:
+            # SQLite takes the bare ``location`` from the row holding MAX()
+            return [(location, count) for location, count, _ in conn.execute(
+                'SELECT location, COUNT(*) AS count, MAX(requested_at) FROM requests '
+                'WHERE requested_at > ? GROUP BY location_key ORDER BY count DESC LIMIT ?',
+                (since, -1 if limit is None else limit),
+            )]
+
+    def prune_requests(self, before):
+        """Forget logged requests older than ``before``."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM requests WHERE requested_at <= ?', (before,))
+
+    def query(self, location, stores=None, categories=None, min_price=None, max_price=None):
+        """Stored discounts matching the API's filters, best discount first.
+
+        Store and category filters match by substring, as ``apply_filters``
+        does; they are first resolved against the distinct keys present
+        (read straight off the indexes) so the row lookup is an indexed
+        ``IN``.
+        """
+        key = location_key(location)
+        where = ['location_key = ?']
+        params = [key]
+        with closing(self._connect()) as conn:
+            for column, wanted in (('store_key', stores), ('category', categories)):
+                if not wanted:
+                    continue
+                wanted = [w.lower() for w in wanted]
+                present = [value for (value,) in conn.execute(
+                    f'SELECT DISTINCT {column} FROM discounts WHERE location_key = ?', (key,)
+                ) if value]
+                matches = [value for value in present if any(w in value for w in wanted)]
+                if not matches:
+                    return []
+                where.append(f"{column} IN ({', '.join('?' * len(matches))})")
+                params.extend(matches)
+
+            min_minor = to_minor_units(min_price)
+            max_minor = to_minor_units(max_price)
+            if min_minor is not None:
+                where.append('price_minor >= ?')
+                params.append(min_minor)
+            if max_minor is not None:
+                where.append('price_minor <= ?')
+                params.append(max_minor)
+
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM discounts WHERE {' AND '.join(where)} "
+                f"ORDER BY discount_bp IS NULL, discount_bp DESC, store_key",
+                params,
+            ).fetchall()
+        return [Discount(**dict(zip(COLUMNS, row))) for row in rows]
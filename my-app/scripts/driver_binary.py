@@ -0,0 +1,111 @@
+"""Pinned, cached chromedriver location.
+
+Without a driver path Selenium runs Selenium Manager on every start to
+find (and possibly download) chromedriver. ``chromedriver_path`` resolves
+it once and remembers the result in ``.scraper/driver/chromedriver.json``,
+together with the browser Selenium Manager picked (which may be one it
+downloaded) and that browser's version. Each process checks the cached
+entry once: it is resolved again when the binary disappears or the
+browser's version has changed (e.g. Chrome auto-updated), and
+``forget_chromedriver`` drops it when a session fails to start. Set
+``CHROMEDRIVER_PATH`` to pin a specific binary instead.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+
+from discount_cache import write_json_atomic
+from scraper_paths import data_dir
+
+_lock = threading.Lock()
+_resolved = None
+
+
+def _cache_file():
+    return os.path.join(data_dir('driver'), 'chromedriver.json')
+
+
+def _usable(path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def browser_version(path):
+    """``--version`` output of the browser at ``path``, or None."""
+    try:
+        result = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _current(entry):
+    """Whether a cached entry still matches the installed driver and browser."""
+    if not entry or not _usable(entry.get('path')):
+        return False
+    browser = entry.get('browser_path')
+    if not browser:
+        return True
+    return _usable(browser) and browser_version(browser) == entry.get('browser_version')
+
+
+def _resolve(options):
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.selenium_manager import SeleniumManager
+
+    options = options or Options()
+    # Also points options.binary_location at the browser it picked
+    path = SeleniumManager().driver_location(options)
+    browser = getattr(options, 'binary_location', None) or None
+    entry = {
+        'path': path,
+        'browser_path': browser,
+        'browser_version': browser_version(browser) if browser else None,
+        'resolved': time.time(),
+    }
+    write_json_atomic(_cache_file(), entry)
+    return entry
+
+
+def chromedriver_path(options=None):
+    """Path to chromedriver; ``options`` guide Selenium Manager on a cache miss.
+
+    The browser the cached driver was resolved for is set on
+    ``options.binary_location``, unless ``options`` already name one.
+    """
+    global _resolved
+    pinned = os.environ.get('CHROMEDRIVER_PATH')
+    if pinned:
+        return pinned
+
+    with _lock:
+        if _resolved is None or not _usable(_resolved['path']):
+            try:
+                with open(_cache_file()) as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = None
+            _resolved = cached if _current(cached) else _resolve(options)
+        browser = _resolved.get('browser_path')
+        if options is not None and browser and not getattr(options, 'binary_location', None):
+            options.binary_location = browser
+        return _resolved['path']
+
+
+def forget_chromedriver():
+    """Drop the cached driver so the next start resolves it again.
+
+    Returns False when ``CHROMEDRIVER_PATH`` pins the driver, as there is
+    then nothing to re-resolve.
+    """
+    global _resolved
+    if os.environ.get('CHROMEDRIVER_PATH'):
+        return False
+    with _lock:
+        _resolved = None
+        try:
+            os.unlink(_cache_file())
+        except FileNotFoundError:
+            pass
+    return True
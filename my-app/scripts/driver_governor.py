@@ -0,0 +1,168 @@
+"""Keep headless Chrome's memory and leftover processes in check.
+
+Chrome's RSS keeps growing on long infinite-scroll pages, and a Chrome
+whose chromedriver or Python parent died keeps running unnoticed. This
+module gives the scrapers three tools:
+
+* ``over_memory(driver)`` reads the RSS of the driver's process tree (see
+  ``proc_stats``), records the peak in the active scrape metrics, and says
+  whether it is above ``SCRAPE_MAX_DRIVER_RSS_MB`` (default 1536). The
+  harvester stops scrolling when it is, and the driver pool recycles such
+  drivers instead of reusing them.
+* ``quit_driver(driver)`` quits a driver and then kills any process of its
+  tree that survived the quit.
+* ``reap_orphans()`` kills Chrome and chromedriver processes started by a
+  scraper process that no longer exists. Browsers are tagged with their
+  owner's PID on the command line (``owner_flag``) and chromedrivers in
+  their environment (``owner_env``), so processes started by anything else,
+  and those of live scrapers (including the daemon running as PID 1 in a
+  container), are never touched.
+"""
+import os
+import signal
+import sys
+
+from proc_stats import descendants, driver_rss_bytes
+from scrape_metrics import current_metrics
+
+MAX_RSS_BYTES = int(float(os.environ.get('SCRAPE_MAX_DRIVER_RSS_MB', '1536')) * 1024 * 1024)
+
+# Chrome ignores switches it doesn't know; this one marks our browsers
+OWNER_SWITCH = '--scraper-owner-pid='
+# chromedriver rejects unknown switches, so it is marked in its environment
+OWNER_ENV = 'SCRAPER_OWNER_PID'
+
+
+def owner_flag():
+    """Chrome argument tagging a browser as started by this process."""
+    return f'{OWNER_SWITCH}{os.getpid()}'
+
+
+def owner_env():
+    """Environment for a chromedriver, tagging it as started by this process."""
+    return dict(os.environ, **{OWNER_ENV: str(os.getpid())})
+
+
+def over_memory(driver, limit=None):
+    """Whether ``driver``'s process tree holds more than ``limit`` bytes."""
+    rss = driver_rss_bytes(driver)
+    if rss is None:
+        return False
+    current_metrics().peak('driver_rss_mb', round(rss / (1024 * 1024), 1))
+    return rss > (limit or MAX_RSS_BYTES)
+
+
+def _driver_pids(driver):
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if process is None:
+        return []
+    return [process.pid] + (descendants(process.pid) or [])
+
+
+def _running(pid):
+    """Whether ``pid`` exists and is not a zombie waiting to be reaped."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return False
+    return stat[stat.rfind(')') + 2:].split()[0] not in ('Z', 'X')
+
+
+def _kill(pids):
+    killed = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except OSError:
+            pass
+    return killed
+
+
+def quit_driver(driver):
+    """Quit ``driver``, then kill whatever of its process tree is left."""
+    pids = _driver_pids(driver)
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Error quitting driver: {str(e)}", file=sys.stderr)
+    survivors = [pid for pid in pids if _running(pid)]
+    killed = _kill(survivors)
+    if killed:
+        print(f"Killed {killed} browser processes left after quit", file=sys.stderr)
+        current_metrics().count('browser_processes_killed', killed)
+
+
+def _cmdline(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().decode('utf-8', 'replace').split('\0')
+    except OSError:
+        return []
+
+
+def _environ_owner(pid):
+    """The ``OWNER_ENV`` value in ``pid``'s environment, if any."""
+    prefix = f'{OWNER_ENV}='.encode()
+    try:
+        with open(f'/proc/{pid}/environ', 'rb') as f:
+            entries = f.read().split(b'\0')
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.startswith(prefix):
+            return entry[len(prefix):].decode('ascii', 'replace')
+    return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _orphaned(owner):
+    """Whether a recorded owner PID names a scraper process that is gone."""
+    return owner is not None and owner.isdigit() and int(owner) != os.getpid() and not _alive(int(owner))
+
+
+def reap_orphans():
+    """Kill our orphaned chrome/chromedriver processes; returns how many."""
+    if not os.path.isdir('/proc'):
+        return 0
+    uid = os.getuid()
+    me = os.getpid()
+    orphans = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        try:
+            if os.stat(f'/proc/{entry}').st_uid != uid:
+                continue
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        name = stat[stat.find('(') + 1:stat.rfind(')')]
+        ppid = int(stat[stat.rfind(')') + 2:].split()[1])
+        if pid == me or ppid == me:
+            continue
+        if name == 'chromedriver':
+            if _orphaned(_environ_owner(pid)):
+                orphans.append(pid)
+            continue
+        for arg in _cmdline(pid):
+            if arg.startswith(OWNER_SWITCH):
+                if _orphaned(arg[len(OWNER_SWITCH):]):
+                    orphans.append(pid)
+                break
+    killed = _kill(orphans)
+    if killed:
+        print(f"Reaped {killed} orphaned browser processes", file=sys.stderr)
+    return killed
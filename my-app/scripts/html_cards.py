@@ -0,0 +1,222 @@
+"""Browser-free product card extraction from raw HTML.
+
+Mirrors ``EXTRACT_CARDS_JS`` in ``scroll_harvester.py``: given a card
+selector and the store's field selectors it returns the same compact rows,
+so ``store_parsing`` rules can run on pages fetched over plain HTTP.
+
+Only the selector forms the store layouts use are supported: comma lists of
+compound selectors made of a tag, ``.class``, ``#id`` and ``[attr]``,
+``[attr='v']``, ``[attr*='v']``, ``[attr^='v']``, ``[attr$='v']``.
+"""
+from html.parser import HTMLParser
+import json
+import re
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+}
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl',
+    'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2',
+    'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p',
+    'section', 'table', 'tr', 'ul',
+}
+SKIP_TEXT_TAGS = {'script', 'style', 'noscript', 'template'}
+
+_SIMPLE_RE = re.compile(
+    r"(?P<tag>^[a-zA-Z][\w-]*)"
+    r"|\.(?P<cls>[\w-]+)"
+    r"|#(?P<id>[\w-]+)"
+    r"|\[\s*(?P<attr>[\w-]+)\s*(?:(?P<op>[*^$~]?=)\s*(?P<q>['\"]?)(?P<val>.*?)(?P=q))?\s*\]"
+)
+
+
+class Node:
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    @property
+    def classes(self):
+        return (self.attrs.get('class') or '').split()
+
+    def iter_descendants(self):
+        stack = [child for child in reversed(self.children) if isinstance(child, Node)]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in reversed(node.children) if isinstance(child, Node))
+
+    def inner_text(self):
+        """Approximate ``innerText``: block elements break lines, whitespace collapses."""
+        parts = []
+        self._collect_text(parts)
+        lines = (' '.join(line.split()) for line in ''.join(parts).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+    def _collect_text(self, parts):
+        if self.tag in SKIP_TEXT_TAGS:
+            return
+        block = self.tag in BLOCK_TAGS
+        if block:
+            parts.append('\n')
+        for child in self.children:
+            if isinstance(child, Node):
+                child._collect_text(parts)
+            else:
+                parts.append(child)
+        if block:
+            parts.append('\n')
+
+
+class Document(Node):
+    """Parse root; also carries the page's raw JSON-LD blocks."""
+
+    def __init__(self):
+        super().__init__('#document', {})
+        self.json_ld = []
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Document()
+        self.current = self.root
+        self._in_json_ld = False
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: value or '' for name, value in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+        if tag == 'script' and node.attrs.get('type') == 'application/ld+json':
+            self._in_json_ld = True
+            self.root.json_ld.append('')
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(Node(tag, {name: value or '' for name, value in attrs}, self.current))
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+        if tag == 'script':
+            self._in_json_ld = False
+
+    def handle_data(self, data):
+        if self._in_json_ld:
+            self.root.json_ld[-1] += data
+        self.current.children.append(data)
+
+
+def parse_html(html):
+    """Parse a page into a ``Node`` tree; JSON-LD blocks are kept on ``.json_ld``."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _compile_simple(selector):
+    tests = []
+    for match in _SIMPLE_RE.finditer(selector.strip()):
+        if match.group('tag'):
+            tag = match.group('tag').lower()
+            tests.append(lambda node, tag=tag: node.tag == tag)
+        elif match.group('cls'):
+            cls = match.group('cls')
+            tests.append(lambda node, cls=cls: cls in node.classes)
+        elif match.group('id'):
+            id_ = match.group('id')
+            tests.append(lambda node, id_=id_: node.attrs.get('id') == id_)
+        else:
+            attr, op, val = match.group('attr'), match.group('op'), match.group('val')
+            tests.append(lambda node, attr=attr, op=op, val=val: _attr_matches(node, attr, op, val))
+    return lambda node: all(test(node) for test in tests)
+
+
+def _attr_matches(node, attr, op, val):
+    if attr not in node.attrs:
+        return False
+    actual = node.attrs[attr]
+    if op is None:
+        return True
+    if op == '=':
+        return actual == val
+    if op == '*=':
+        return val in actual
+    if op == '^=':
+        return actual.startswith(val)
+    if op == '$=':
+        return actual.endswith(val)
+    return val in actual.split()
+
+
+_compiled = {}
+
+
+def compile_selector(selector):
+    """Compile a comma list of compound selectors into a node predicate."""
+    if selector not in _compiled:
+        alternatives = [_compile_simple(part) for part in selector.split(',') if part.strip()]
+        _compiled[selector] = lambda node: any(test(node) for test in alternatives)
+    return _compiled[selector]
+
+
+def select_all(root, selector):
+    matches = compile_selector(selector)
+    return [node for node in root.iter_descendants() if matches(node)]
+
+
+def select_one(root, selector):
+    matches = compile_selector(selector)
+    return next((node for node in root.iter_descendants() if matches(node)), None)
+
+
+def _text_of(card, selector):
+    node = select_one(card, selector) if selector else None
+    return node.inner_text().strip() if node is not None else None
+
+
+def extract_cards_from_tree(root, card_selector, fields):
+    """Same rows as ``scroll_harvester.EXTRACT_CARDS_JS``, computed from a parsed page."""
+    return [
+        [
+            [_text_of(card, selector) for selector in field] if isinstance(field, list)
+            else _text_of(card, field)
+            for field in fields
+        ]
+        for card in select_all(root, card_selector)
+    ]
+
+
+def extract_cards_from_html(html, card_selector, fields):
+    return extract_cards_from_tree(parse_html(html), card_selector, fields)
+
+
+def json_ld_products(root):
+    """Yield schema.org ``Product`` objects embedded as JSON-LD."""
+    for block in root.json_ld:
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(reversed(item))
+            elif isinstance(item, dict):
+                types = item.get('@type')
+                types = types if isinstance(types, list) else [types]
+                if 'Product' in types and item.get('name'):
+                    yield item
+                    continue
+                stack.extend(value for key, value in item.items() if isinstance(value, (dict, list)))
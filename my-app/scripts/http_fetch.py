@@ -0,0 +1,160 @@
+"""HTTP-first fetch of store specials, without a browser.
+
+Fetches a store's specials page over a pooled ``requests.Session`` and runs
+the same card rules as the Selenium path on it (``html_cards`` +
+``store_parsing``), falling back to schema.org JSON-LD product data embedded
+in the page. Returns ``None`` when the page is blocked or yields nothing so
+the caller can escalate to the browser.
+
+Point it at recorded fixture pages with ``CHECKERS_URL`` / ``TESCO_URL`` or
+``--url``::
+
+    python3 scripts/http_fetch.py checkers --url http://localhost:8000/checkers.html
+"""
+import json
+import sys
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from category_classifier import assign_categories
+from html_cards import parse_html, extract_cards_from_tree, json_ld_products
+from page_archive import archive_page
+from scrape_metrics import current_metrics
+from selector_discovery import resolve_card_selector_html
+from store_parsing import dedupe_discounts
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-GB,en;q=0.9',
+}
+
+# Statuses bot protection answers with; anything here means "use the browser"
+BLOCKED_STATUSES = {401, 403, 429, 503}
+
+CURRENCY_SYMBOLS = {'ZAR': 'R', 'GBP': '£'}
+
+_session = None
+
+
+class FetchBlocked(Exception):
+    pass
+
+
+def get_session():
+    """Process-wide session so connections and TLS sessions are reused."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        retries = Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 504))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+
+def fetch_page(url, timeout=10):
+    response = get_session().get(url, timeout=timeout)
+    if response.status_code in BLOCKED_STATUSES:
+        raise FetchBlocked(f"HTTP {response.status_code} from {url}")
+    response.raise_for_status()
+    if 'charset' not in response.headers.get('Content-Type', '').lower():
+        # requests assumes ISO-8859-1 for text/html without a charset, which
+        # mangles "£"; the store pages are UTF-8
+        response.encoding = 'utf-8'
+    return response.text
+
+
+def _json_ld_price(product):
+    offers = product.get('offers') or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    price = offers.get('price') or offers.get('lowPrice')
+    if price is None:
+        return None
+    symbol = CURRENCY_SYMBOLS.get(offers.get('priceCurrency'), '')
+    return f"{symbol}{price}"
+
+
+def discounts_from_html(adapter, html, mode='http'):
+    """Parse a specials page into discount dicts using the adapter's rules.
+
+    ``mode`` is where the page came from; see ``resolve_card_selector_html``.
+    """
+    metrics = current_metrics()
+    with metrics.phase('extract'):
+        root = parse_html(html)
+        card_selector = resolve_card_selector_html(
+            root, adapter.key, adapter.card_candidates, adapter.fields, mode=mode,
+        )
+        rows = extract_cards_from_tree(root, card_selector, adapter.fields) if card_selector else []
+        if not rows:
+            rows = []
+            for product in json_ld_products(root):
+                price = _json_ld_price(product)
+                if price:
+                    rows.append(adapter.json_ld_row(product['name'].strip(), price))
+    metrics.count('cards_seen', len(rows))
+
+    with metrics.phase('parse'):
+        discounts = []
+        for row in rows:
+            try:
+                discount = adapter.parse_card(row)
+            except Exception as e:
+                print(f"Error processing {adapter.name} product: {str(e)}", file=sys.stderr)
+                metrics.skip('parse_error')
+                continue
+            if discount:
+                discounts.append(discount)
+            else:
+                metrics.skip('missing_title_or_price')
+
+    with metrics.phase('dedupe'):
+        unique = dedupe_discounts(discounts)
+    metrics.skip('duplicate', len(discounts) - len(unique))
+    with metrics.phase('classify'):
+        return assign_categories(unique)
+
+
+def fetch_discounts_http(adapter, url=None, timeout=10):
+    """Fetch and parse a store's specials; ``None`` means escalate to Selenium."""
+    url = url or adapter.url
+    try:
+        with current_metrics().phase('http_fetch'):
+            html = fetch_page(url, timeout=timeout)
+    except FetchBlocked as e:
+        print(f"HTTP fetch blocked for {adapter.name}: {str(e)}", file=sys.stderr)
+        return None
+    except requests.RequestException as e:
+        print(f"HTTP fetch failed for {adapter.name}: {str(e)}", file=sys.stderr)
+        return None
+    archive_page(adapter.key, url, html, 'http')
+
+    discounts = discounts_from_html(adapter, html)
+    if not discounts:
+        print(f"HTTP fetch for {adapter.name} found no products", file=sys.stderr)
+        return None
+    print(f"Found {len(discounts)} {adapter.name} discounts over HTTP", file=sys.stderr)
+    return discounts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import scrape_discounts  # registers the built-in store adapters
+    from store_registry import STORE_ADAPTERS, get_adapter
+
+    parser = argparse.ArgumentParser(description='Fetch store specials over plain HTTP.')
+    parser.add_argument('store', choices=sorted(STORE_ADAPTERS))
+    parser.add_argument('--url', default=None, help='override the specials page URL')
+    args = parser.parse_args()
+
+    discounts = fetch_discounts_http(get_adapter(args.store), url=args.url)
+    if discounts is None:
+        sys.exit(1)
+    print(json.dumps([d.to_dict() for d in discounts], indent=2))
@@ -0,0 +1,58 @@
+"""Newline-delimited JSON records streamed from the scraper to its caller.
+
+Each product is written as one compact line as soon as it is extracted::
+
+    {"type":"discount","discount":{"title":"...","price":"R12.99",...}}
+
+and the stream ends with a single trailer::
+
+    {"type":"summary","ok":true,"count":42,"cache":[...],"elapsed":3.1}
+
+Logs never go to this channel (they are on stderr), so every line parses.
+"""
+import json
+import threading
+import time
+
+
+class NdjsonWriter:
+    """Thread-safe writer of discount records and the summary trailer.
+
+    ``write_line`` receives each encoded line (without the newline) and
+    ``tags`` are merged into every record, e.g. a daemon request ``id``.
+    """
+
+    def __init__(self, write_line, **tags):
+        self._write_line = write_line
+        self._tags = tags
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.count = 0
+
+    @classmethod
+    def for_stream(cls, stream, **tags):
+        def write_line(line):
+            stream.write(line + '\n')
+            stream.flush()
+        return cls(write_line, **tags)
+
+    def write(self, record):
+        line = json.dumps(dict(self._tags, **record), separators=(',', ':'))
+        with self._lock:
+            self._write_line(line)
+
+    def discount(self, discount, **fields):
+        """Write one ``Discount`` record, with any extra ``fields`` added to it."""
+        with self._lock:
+            self.count += 1
+        self.write({'type': 'discount', 'discount': dict(discount.to_dict(), **fields)})
+
+    def summary(self, ok=True, **fields):
+        record = {
+            'type': 'summary',
+            'ok': ok,
+            'count': self.count,
+            'elapsed': round(time.monotonic() - self._started, 3),
+        }
+        record.update(fields)
+        self.write(record)
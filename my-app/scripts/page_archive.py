@@ -0,0 +1,205 @@
+"""Archive of raw store pages, for re-running extraction without a browser.
+
+With ``SCRAPE_SNAPSHOTS=on`` (or the scraper's ``--snapshots``) every page
+a scrape extracts from is saved: the HTML fetched over HTTP, or the
+browser's DOM once scrolling has loaded all cards. Pages are stored
+gzip-compressed under their SHA-256, so an unchanged page scraped again is
+stored once, and every capture is logged in ``index.jsonl``::
+
+    .scraper/snapshots/
+        index.jsonl                  {"captured":..., "store":"checkers", "url":..., "source":"http", "sha256":...}
+        blobs/3f/3f2a...e1.html.gz
+
+``extract`` re-runs a store's current card selectors and parsing rules
+(``html_cards`` + ``store_parsing``, as over HTTP) on archived pages, one
+page per worker process, so a selector fix can be checked against every
+page seen so far, or the price history backfilled, at disk speed::
+
+    python3 scripts/page_archive.py list --store checkers
+    python3 scripts/page_archive.py extract --store checkers --workers 4 > rows.ndjson
+    python3 scripts/page_archive.py extract --history
+"""
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from scrape_metrics import current_metrics
+from scraper_paths import data_dir
+
+
+def snapshots_enabled():
+    return os.environ.get('SCRAPE_SNAPSHOTS', 'off').lower() not in ('off', '0', 'false', 'no', '')
+
+
+class PageArchive:
+    def __init__(self, directory=None):
+        self.directory = directory or data_dir('snapshots')
+        self._index_path = os.path.join(self.directory, 'index.jsonl')
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, 'blobs', digest[:2], f"{digest}.html.gz")
+
+    def save(self, store, url, html, source, captured=None):
+        """Store ``html`` (once per distinct page) and log the capture; returns its digest."""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(gzip.compress(data, compresslevel=6))
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        entry = {
+            'captured': captured or time.time(),
+            'store': store,
+            'url': url,
+            'source': source,
+            'sha256': digest,
+            'bytes': len(data),
+        }
+        # One short write in append mode, so concurrent scrapers never
+        # interleave lines
+        with open(self._index_path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        return digest
+
+    def load(self, digest):
+        with open(self._blob_path(digest), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+    def entries(self, store=None, since=None):
+        """Logged captures, oldest first, optionally for one store or after ``since``."""
+        found = []
+        try:
+            with open(self._index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if store and entry['store'] != store:
+                        continue
+                    if since and entry['captured'] < since:
+                        continue
+                    found.append(entry)
+        except FileNotFoundError:
+            pass
+        return found
+
+
+def archive_page(store, url, html, source):
+    """Save a page when snapshots are enabled; never fails the scrape."""
+    if not snapshots_enabled() or not html:
+        return None
+    try:
+        digest = PageArchive().save(store, url, html, source)
+    except OSError as e:
+        print(f"Could not save {store} page snapshot: {str(e)}", file=sys.stderr)
+        return None
+    current_metrics().count('snapshots')
+    return digest
+
+
+def archive_driver_page(store, driver):
+    """Save the browser's current DOM when snapshots are enabled."""
+    if not snapshots_enabled():
+        return None
+    try:
+        html, url = driver.page_source, driver.current_url
+    except Exception as e:
+        print(f"Could not read {store} page for a snapshot: {str(e)}", file=sys.stderr)
+        return None
+    return archive_page(store, url, html, 'browser')
+
+
+def _init_worker():
+    import scrape_discounts  # registers the built-in store adapters
+
+
+def _extract(job):
+    """Worker: ``(store, digest, source, discount dicts or None, error or None)``."""
+    directory, store, digest, source = job
+    from http_fetch import discounts_from_html
+    from store_registry import get_adapter
+    try:
+        html = PageArchive(directory).load(digest)
+        # Browser DOM snapshots are checked against the browser's saved selector
+        discounts = discounts_from_html(get_adapter(store), html, mode=source)
+    except Exception as e:
+        return store, digest, source, None, str(e)
+    return store, digest, source, [d.to_dict() for d in discounts], None
+
+
+def extract(archive, entries, workers=None):
+    """Yield ``(entry, discount dicts or None, error)`` for every capture.
+
+    Each distinct page is parsed once, across ``workers`` processes
+    (default: one per CPU); captures of the same page share its result.
+    """
+    pages = {}
+    for entry in entries:
+        pages.setdefault((entry['store'], entry['sha256'], entry.get('source', 'http')), []).append(entry)
+    jobs = [(archive.directory, store, digest, source) for store, digest, source in pages]
+    if not jobs:
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for store, digest, source, records, error in executor.map(_extract, jobs, chunksize=4):
+            for entry in pages[(store, digest, source)]:
+                yield entry, records, error
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from discount_record import Discount
+    from ndjson_stream import NdjsonWriter
+    from price_history import PriceHistory
+
+    parser = argparse.ArgumentParser(description='List archived pages or re-extract discounts from them.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('list', 'list archived captures'), ('extract', 're-run extraction on archived pages')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--store', default=None, help='only pages of this store')
+        command.add_argument('--since', type=float, default=None, help='only captures from the last N days')
+    extract_parser = commands.choices['extract']
+    extract_parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    extract_parser.add_argument('--history', action='store_true',
+                                help='append the extracted prices to the price history at their capture times')
+    args = parser.parse_args()
+
+    archive = PageArchive()
+    since = time.time() - args.since * 24 * 60 * 60 if args.since else None
+    entries = archive.entries(store=args.store, since=since)
+    if args.command == 'list':
+        for entry in entries:
+            print(json.dumps(entry, separators=(',', ':')))
+        sys.exit(0)
+
+    started = time.monotonic()
+    history = PriceHistory() if args.history else None
+    writer = NdjsonWriter.for_stream(sys.stdout)
+    pages = failed = products = 0
+    for entry, records, error in extract(archive, entries, workers=args.workers):
+        pages += 1
+        if error is not None:
+            failed += 1
+            print(f"Could not extract {entry['store']} page {entry['sha256'][:12]}: {error}", file=sys.stderr)
+            continue
+        products += len(records)
+        if history is not None:
+            history.append([Discount.from_dict(record) for record in records], at=entry['captured'])
+        writer.write({'type': 'snapshot', 'snapshot': entry, 'count': len(records), 'discounts': records})
+    elapsed = time.monotonic() - started
+    print(f"Extracted {products} products from {pages} captures ({failed} failed) in {elapsed:.2f}s",
+          file=sys.stderr)
+    writer.summary(ok=failed == 0, count=products, pages=pages, failed=failed)
@@ -0,0 +1,170 @@
+"""Event-driven page readiness waits for the discount scrapers.
+
+Instead of fixed sleeps, scrapers wait on real signals: the network going
+quiet (from Chrome's CDP performance log), the cookie banner disappearing
+and the product-card count settling after a scroll. A small, optional
+jitter budget can be layered on top for politeness; set ``SCRAPE_JITTER``
+to ``"min,max"`` seconds (default ``"0,0"``). Every wait is also capped by
+the scrape's deadline (see ``scrape_deadline``).
+"""
+import json
+import os
+import random
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from scrape_deadline import current_deadline
+
+COOKIE_BUTTON_ID = "onetrust-accept-btn-handler"
+COOKIE_BANNER_ID = "onetrust-banner-sdk"
+
+# Long-polling and analytics beacons can stay open indefinitely, so treat
+# the page as idle with this many requests still in flight
+IDLE_INFLIGHT_LIMIT = 2
+
+COUNT_JS = "return document.querySelectorAll(arguments[0]).length;"
+
+
+def jitter_range():
+    """Parse ``SCRAPE_JITTER`` into a (min, max) pair of seconds."""
+    raw = os.environ.get('SCRAPE_JITTER', '0,0')
+    try:
+        low, high = (float(part) for part in raw.split(','))
+    except ValueError:
+        return 0.0, 0.0
+    return max(low, 0.0), max(high, low, 0.0)
+
+
+class PageReadiness:
+    """Readiness waits for one driver, recording how long each one took."""
+
+    def __init__(self, driver, jitter=None, poll=0.25):
+        self.driver = driver
+        self.jitter_range = jitter if jitter is not None else jitter_range()
+        self.poll = poll
+        self.timings = {}
+        self.network = {'requests': 0, 'blocked': 0, 'bytes': 0}
+        self._inflight = set()
+
+    def _record(self, name, started):
+        elapsed = time.monotonic() - started
+        total, count = self.timings.get(name, (0.0, 0))
+        self.timings[name] = (total + elapsed, count + 1)
+        return elapsed
+
+    def report(self):
+        """Seconds spent per wait kind, e.g. ``{'network_idle': 1.42, ...}``."""
+        return {name: round(total, 3) for name, (total, _) in self.timings.items()}
+
+    def reset_network(self):
+        """Drop buffered network events; call just before navigating."""
+        self._inflight.clear()
+        try:
+            self.driver.get_log('performance')
+        except Exception:
+            pass
+
+    def _drain_network_events(self):
+        for entry in self.driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            method = message.get('method')
+            request_id = message.get('params', {}).get('requestId')
+            if method == 'Network.requestWillBeSent':
+                self._inflight.add(request_id)
+                self.network['requests'] += 1
+            elif method == 'Network.loadingFinished':
+                self._inflight.discard(request_id)
+                self.network['bytes'] += int(message['params'].get('encodedDataLength') or 0)
+            elif method == 'Network.loadingFailed':
+                self._inflight.discard(request_id)
+                if message['params'].get('blockedReason'):
+                    self.network['blocked'] += 1
+
+    def network_idle(self, timeout=20, idle_for=0.5):
+        """Wait until the network has been quiet for ``idle_for`` seconds."""
+        timeout = current_deadline().cap(timeout)
+        started = time.monotonic()
+        quiet_since = None
+        while time.monotonic() - started < timeout:
+            try:
+                self._drain_network_events()
+                busy = len(self._inflight) > IDLE_INFLIGHT_LIMIT
+            except Exception:
+                # No performance log on this driver; fall back to readyState
+                busy = self.driver.execute_script('return document.readyState') != 'complete'
+            if busy:
+                quiet_since = None
+            elif quiet_since is None:
+                quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since >= idle_for:
+                break
+            time.sleep(self.poll)
+        return self._record('network_idle', started)
+
+    def dismiss_cookie_banner(self, timeout=5):
+        """Accept the OneTrust banner if shown and wait for it to go away."""
+        timeout = current_deadline().cap(timeout)
+        started = time.monotonic()
+        accepted = False
+        try:
+            # OneTrust renders before the network settles, so a missing
+            # button means there is nothing to dismiss
+            if not self.driver.find_elements(By.ID, COOKIE_BUTTON_ID):
+                self._record('cookie_banner', started)
+                return False
+            button = WebDriverWait(self.driver, timeout).until(
+                EC.element_to_be_clickable((By.ID, COOKIE_BUTTON_ID))
+            )
+            button.click()
+            WebDriverWait(self.driver, timeout).until(
+                EC.invisibility_of_element_located((By.ID, COOKIE_BANNER_ID))
+            )
+            accepted = True
+        except Exception:
+            pass
+        self._record('cookie_banner', started)
+        return accepted
+
+    def stable_count(self, selector, timeout=10, settle=1.0, min_count=1):
+        """Wait until at least ``min_count`` cards match and the count stops changing."""
+        timeout = current_deadline().cap(timeout)
+        started = time.monotonic()
+        last = -1
+        changed_at = started
+        while time.monotonic() - started < timeout:
+            count = self.driver.execute_script(COUNT_JS, selector)
+            now = time.monotonic()
+            if count != last:
+                last, changed_at = count, now
+            elif count >= min_count and now - changed_at >= settle:
+                break
+            time.sleep(self.poll)
+        self._record('stable_count', started)
+        return max(last, 0)
+
+    def first_match(self, selector, timeout=20):
+        """Wait for the first element matching ``selector``; seconds waited, or None."""
+        timeout = current_deadline().cap(timeout)
+        started = time.monotonic()
+        while time.monotonic() - started < timeout:
+            try:
+                self._drain_network_events()
+            except Exception:
+                pass
+            if self.driver.execute_script(COUNT_JS, selector):
+                return self._record('first_match', started)
+            time.sleep(self.poll)
+        self._record('first_match', started)
+        return None
+
+    def jitter(self):
+        """Sleep a random politeness delay from the jitter budget."""
+        low, high = self.jitter_range
+        if high <= 0:
+            return 0.0
+        started = time.monotonic()
+        current_deadline().sleep(random.uniform(low, high))
+        return self._record('jitter', started)
@@ -0,0 +1,330 @@
+"""Append-only price history, stored as memory-mapped NumPy columns.
+
+Every live scrape appends one price point per product: ``(product id,
+unix time, price in minor units)``. Products are identified by location,
+store and normalised title, and numbered in ``products.jsonl`` (line N is
+product N). Each append is written as a new segment directory holding one
+``.npy`` file per column, sorted by product then time, and renamed into
+place once complete. The index and its segments live together in one
+generation directory, named by ``CURRENT``::
+
+    .scraper/history/
+        CURRENT                                  gen-1735689600-9b1d04aa
+        gen-1735689600-9b1d04aa/
+            products.jsonl
+            seg-1735689600-3f2a9c1e/{product,time,price}.npy
+
+(A history without ``CURRENT`` keeps both at the top level, as earlier
+versions wrote it, until its first compaction.)
+
+Queries memory-map every segment, select the window with a vectorised
+mask and aggregate per product in sorted order, so ``stats`` over a
+month of daily snapshots for thousands of products takes milliseconds.
+
+``compact`` (run automatically once there are more than
+``PRICE_HISTORY_MAX_SEGMENTS`` segments, default 30) merges the segments
+into one, drops points older than ``PRICE_HISTORY_RETENTION_DAYS`` (default
+365) and collapses each product's points from past days to one per day:
+that day's lowest price. Products with no points left are dropped from
+the index and the rest renumbered, so it stays bounded by the products seen
+within the retention window. The merged segment and the renumbered index
+are written as a new generation, published by replacing ``CURRENT`` in one
+atomic rename: readers see either the old ids and segments or the new ones,
+never a mix, and a compaction that dies part-way leaves the old generation
+in use. Disk use therefore grows with products x days kept, not with how
+often stores are scraped or how many titles have come and gone.
+
+Run it to query or compact from the command line::
+
+    python3 scripts/price_history.py stats "cape town" --store checkers --days 30
+    python3 scripts/price_history.py compact
+"""
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from scraper_paths import data_dir
+
+DAY = 24 * 60 * 60
+COLUMNS = (('product', np.int32), ('time', np.int64), ('price', np.int32))
+
+
+def product_key(discount):
+    """Identity of a product in the history: location, store and title."""
+    title = re.sub(r'\s+', ' ', discount.title.strip().lower())
+    return f"{(discount.location or '').strip().lower()}|{discount.store_key}|{title}"
+
+
+def _env_number(name, default):
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+class PriceHistory:
+    def __init__(self, directory=None, retention_days=None, max_segments=None):
+        self.directory = directory or data_dir('history')
+        self.retention_days = retention_days or _env_number('PRICE_HISTORY_RETENTION_DAYS', 365)
+        self.max_segments = max_segments or int(_env_number('PRICE_HISTORY_MAX_SEGMENTS', 30))
+        self._products = {}
+        self._products_size = 0
+        self._products_generation = None
+
+    @contextmanager
+    def _locked(self):
+        """Serialise writers (product numbering, segments, compaction)."""
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _generation(self):
+        """Directory holding the current index and segments."""
+        try:
+            with open(os.path.join(self.directory, 'CURRENT')) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            name = ''
+        return os.path.join(self.directory, name) if name else self.directory
+
+    def _publish(self, name):
+        """Make generation ``name`` current, atomically. Call with the lock held."""
+        tmp = os.path.join(self.directory, '.tmp-CURRENT')
+        with open(tmp, 'w') as f:
+            f.write(name + '\n')
+        os.replace(tmp, os.path.join(self.directory, 'CURRENT'))
+
+    def _load_products(self, generation=None):
+        """``{product key: id}``, re-reading only what was appended since last time."""
+        generation = generation or self._generation()
+        if generation != self._products_generation:
+            # Another generation numbers its products afresh
+            self._products, self._products_size, self._products_generation = {}, 0, generation
+        try:
+            with open(os.path.join(generation, 'products.jsonl')) as f:
+                f.seek(self._products_size)
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    self._products.setdefault(json.loads(line), len(self._products))
+                    self._products_size += len(line.encode('utf-8'))
+        except FileNotFoundError:
+            pass
+        return self._products
+
+    def _product_ids(self, generation, keys):
+        """Ids for ``keys``, numbering new products. Call with the lock held."""
+        products = self._load_products(generation)
+        new = [key for key in dict.fromkeys(keys) if key not in products]
+        if new:
+            with open(os.path.join(generation, 'products.jsonl'), 'a') as f:
+                f.write(''.join(json.dumps(key) + '\n' for key in new))
+            products = self._load_products(generation)
+        return np.array([products[key] for key in keys], dtype=np.int32)
+
+    def _segments(self, generation=None):
+        generation = generation or self._generation()
+        try:
+            names = os.listdir(generation)
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.join(generation, name) for name in names if name.startswith('seg-'))
+
+    def _write_segment(self, generation, columns):
+        order = np.lexsort((columns['time'], columns['product']))
+        tmp = tempfile.mkdtemp(dir=generation, prefix='.tmp-')
+        for name, dtype in COLUMNS:
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(columns[name][order], dtype=dtype))
+        os.rename(tmp, os.path.join(generation, f"seg-{int(columns['time'].max())}-{uuid.uuid4().hex[:8]}"))
+
+    def _read(self, generation, since=None):
+        """Every stored point (at or after ``since``) as ``{column: array}``."""
+        parts = {name: [] for name, _ in COLUMNS}
+        for path in self._segments(generation):
+            try:
+                segment = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name, _ in COLUMNS}
+            except FileNotFoundError:
+                # Compacted away while we were listing
+                continue
+            if since is not None:
+                mask = segment['time'] >= since
+                segment = {name: values[mask] for name, values in segment.items()}
+            for name, values in segment.items():
+                parts[name].append(values)
+        return {
+            name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+            for name, dtype in COLUMNS
+        }
+
+    def append(self, discounts, at=None):
+        """Record one price point per discount with a known price."""
+        priced = [d for d in discounts if d.price_minor is not None]
+        if not priced:
+            return 0
+        at = int(at or time.time())
+        with self._locked():
+            generation = self._generation()
+            self._write_segment(generation, {
+                'product': self._product_ids(generation, [product_key(d) for d in priced]),
+                'time': np.full(len(priced), at, dtype=np.int64),
+                'price': np.array([d.price_minor for d in priced], dtype=np.int32),
+            })
+            if len(self._segments(generation)) > self.max_segments:
+                self._compact(at)
+        return len(priced)
+
+    def stats(self, keys, days=30, now=None):
+        """``{key: {'lowest', 'median', 'last', 'points', 'last_seen'}}`` over the last ``days``.
+
+        Keys never seen in the window are left out. Prices are in minor
+        units; ``median`` is a float.
+        """
+        # A compaction that publishes while we read removes the generation
+        # we are reading from; read the new one instead
+        for _ in range(3):
+            generation = self._generation()
+            found = self._stats(generation, keys, days, now)
+            if self._generation() == generation:
+                break
+        return found
+
+    def _stats(self, generation, keys, days, now):
+        products = self._load_products(generation)
+        wanted = np.array(sorted({products[key] for key in keys if key in products}), dtype=np.int32)
+        if not len(wanted):
+            return {}
+        columns = self._read(generation, since=(now or time.time()) - days * DAY)
+        mask = np.isin(columns['product'], wanted)
+        product, when, price = columns['product'][mask], columns['time'][mask], columns['price'][mask]
+        if not len(product):
+            return {}
+
+        # Sorted by product then price: each product's run gives the lowest
+        # (first) and median (middle) prices
+        by_price = np.lexsort((price, product))
+        ids, starts, counts = np.unique(product[by_price], return_index=True, return_counts=True)
+        sorted_prices = price[by_price]
+        lowest = sorted_prices[starts]
+        median = (sorted_prices[starts + (counts - 1) // 2] + sorted_prices[starts + counts // 2].astype(np.float64)) / 2
+
+        # Sorted by product then time: each run's last entry is the latest
+        by_time = np.lexsort((when, product))
+        ends = starts + counts - 1
+        last = price[by_time][ends]
+        last_seen = when[by_time][ends]
+
+        names = {product_id: key for key, product_id in products.items()}
+        return {
+            names[product_id]: {
+                'lowest': int(lowest[i]),
+                'median': float(median[i]),
+                'last': int(last[i]),
+                'points': int(counts[i]),
+                'last_seen': int(last_seen[i]),
+            }
+            for i, product_id in enumerate(ids.tolist())
+        }
+
+    def stats_for(self, discounts, days=30, now=None):
+        """``stats`` for ``Discount`` records, as a list aligned with them."""
+        keys = [product_key(d) for d in discounts]
+        found = self.stats(keys, days=days, now=now)
+        return [found.get(key) for key in keys]
+
+    def compact(self, now=None):
+        with self._locked():
+            self._compact(now or time.time())
+
+    def _compact(self, now):
+        current = self._generation()
+        segments = self._segments(current)
+        if not segments:
+            return
+        columns = self._read(current, since=now - self.retention_days * DAY)
+        day = columns['time'] // DAY
+        past = day < int(now // DAY)
+
+        # Past days keep one point per product: the day's lowest price, at
+        # the time of that day's last scrape
+        old = {name: values[past] for name, values in columns.items()}
+        old_day = day[past]
+        order = np.lexsort((old['price'], old_day, old['product']))
+        group_keys = np.stack([old['product'][order], old_day[order]])
+        starts = np.flatnonzero(np.r_[True, np.any(group_keys[:, 1:] != group_keys[:, :-1], axis=0)]) \
+            if len(order) else np.empty(0, dtype=np.intp)
+        merged = {
+            'product': old['product'][order][starts],
+            'time': np.maximum.reduceat(old['time'][order], starts) if len(starts) else old['time'][:0],
+            'price': old['price'][order][starts],
+        }
+        for name in merged:
+            merged[name] = np.concatenate([merged[name], columns[name][~past]])
+
+        # The next generation: only products with points left, renumbered,
+        # and their merged segment, built aside and then published at once
+        keys = list(self._load_products(current))
+        surviving = np.unique(merged['product'])
+        merged['product'] = np.searchsorted(surviving, merged['product']).astype(np.int32)
+        name = f"gen-{int(now)}-{uuid.uuid4().hex[:8]}"
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        with open(os.path.join(tmp, 'products.jsonl'), 'w') as f:
+            f.write(''.join(json.dumps(keys[i]) + '\n' for i in surviving.tolist()))
+        if len(merged['time']):
+            self._write_segment(tmp, merged)
+        os.rename(tmp, os.path.join(self.directory, name))
+        self._publish(name)
+        self._remove_stale(name)
+
+    def _remove_stale(self, current):
+        """Delete every generation but ``current``, and leftovers of interrupted writes.
+
+        Call with the lock held.
+        """
+        for entry in os.listdir(self.directory):
+            path = os.path.join(self.directory, entry)
+            if entry == current or entry in ('CURRENT', '.lock'):
+                continue
+            if entry.startswith(('gen-', 'seg-', '.tmp-')):
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.unlink(path)
+            elif entry == 'products.jsonl':
+                # The index of a history from before generations
+                os.unlink(path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Query or compact the price history.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats_parser = commands.add_parser('stats', help='lowest, median and last price per product')
+    stats_parser.add_argument('location')
+    stats_parser.add_argument('--store', default=None, help='only products of this store')
+    stats_parser.add_argument('--days', type=float, default=30)
+    commands.add_parser('compact', help='merge segments and drop expired points')
+    args = parser.parse_args()
+
+    history = PriceHistory()
+    if args.command == 'compact':
+        history.compact()
+        print(f"Compacted into {len(history._segments())} segment(s)", file=sys.stderr)
+    else:
+        prefix = f"{args.location.strip().lower()}|{args.store.lower() + '|' if args.store else ''}"
+        keys = [key for key in history._load_products() if key.startswith(prefix)]
+        for key, stats in sorted(history.stats(keys, days=args.days).items()):
+            _, store, title = key.split('|', 2)
+            print(json.dumps(dict(stats, store=store, title=title), separators=(',', ':')))
@@ -0,0 +1,67 @@
+"""Process memory readings from ``/proc`` (Linux only).
+
+Chrome runs as a tree of processes under chromedriver, so a driver's memory
+is the summed RSS of that tree. Every function returns ``None`` where
+``/proc`` is not available.
+"""
+import os
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes(pid):
+    """Resident set size of one process."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _parent_pids():
+    """``{pid: ppid}`` for every visible process."""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name can contain spaces, so split after its ')'
+        fields = stat[stat.rfind(')') + 2:].split()
+        parents[int(entry)] = int(fields[1])
+    return parents
+
+
+def descendants(pid):
+    """PIDs of every process below ``pid``."""
+    if not os.path.isdir('/proc'):
+        return None
+    children = {}
+    for child, parent in _parent_pids().items():
+        children.setdefault(parent, []).append(child)
+    found = []
+    pending = [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+
+def tree_rss_bytes(pid):
+    """Summed RSS of ``pid`` and all of its descendants."""
+    below = descendants(pid)
+    if below is None:
+        return None
+    return sum(rss_bytes(p) or 0 for p in [pid] + below)
+
+
+def driver_rss_bytes(driver):
+    """Memory held by a Selenium Chrome driver: chromedriver plus its browser."""
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if process is None:
+        return None
+    return tree_rss_bytes(process.pid)
@@ -0,0 +1,249 @@
+"""Match equivalent products across stores and differently worded listings.
+
+Each title is normalised into a pack size (converted to grams, millilitres
+or a count), a brand (its first word) and name tokens: the other words
+plus their character trigrams, so "Yoghurt" and "Yogurt" still overlap.
+Listings only match when size and brand agree; among those, titles are
+compared on the Jaccard similarity of their token sets, estimated with
+MinHash:
+
+* every token is hashed once, and each title's signature is the minimum
+  of ``NUM_PERM`` hash permutations over its tokens, computed for all titles
+  at once with NumPy (``np.minimum.reduceat`` over a flat token array);
+* signatures are cut into bands, and titles of the same size and brand
+  sharing any band are candidates (locality-sensitive hashing, with size
+  and brand hashed into every band), so only likely matches are ever
+  compared instead of all n^2 pairs;
+* candidates are scored in bulk by the fraction of equal signature values,
+  and kept when that reaches ``PRODUCT_MATCH_THRESHOLD`` (default 0.7).
+
+Accepted pairs are joined into groups, and every member must also reach
+the threshold against its group's seed (first listing): chains of similar
+pairs would otherwise join products that only resemble their neighbours
+("Full Cream Milk" - "Cream Milk" - "Low Fat Milk"). Members that don't
+are regrouped among themselves around new seeds. ``match_groups(discounts)``
+returns the groups with two or more listings for the API.
+"""
+from functools import lru_cache
+import os
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16
+# Titles sharing a band bucket are paired with at most this many
+# neighbours each; larger buckets still end up in one group transitively
+MAX_BUCKET_SPAN = 32
+
+# Hash permutations are (a * h + b) mod a prime just above 2^32
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(0x5EED)
+_PERM_A = _rng.integers(1, 2 ** 31, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2 ** 31, NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_SIZE_RE = re.compile(
+    r"(?:(\d+)\s*[x×]\s*)?(\d+(?:[.,]\d+)?)\s*(kg|g|mg|ml|cl|l|lt|litres?|liters?)\b"
+    r"|(\d+)\s*(?:pack|pk|pcs|pieces|s)\b|\bpack\s+of\s+(\d+)\b"
+)
+_UNITS = {
+    'g': ('g', 1), 'kg': ('g', 1000), 'mg': ('g', 0.001),
+    'ml': ('ml', 1), 'cl': ('ml', 10), 'l': ('ml', 1000), 'lt': ('ml', 1000),
+    'litre': ('ml', 1000), 'litres': ('ml', 1000), 'liter': ('ml', 1000), 'liters': ('ml', 1000),
+}
+_STOPWORDS = frozenset({
+    'a', 'and', 'the', 'of', 'with', 'in', 'for', 'x', 'each', 'pack', 'pk',
+    'value', 'special', 'offer', 'save', 'new',
+})
+
+
+def parse_size(text):
+    """``(quantity, unit)`` of the first pack size in ``text``, or ``(None, None)``.
+
+    Weights are in grams, volumes in millilitres and counts in ``each``;
+    multipacks are multiplied out ("6 x 330ml" is 1980 ml).
+    """
+    match = _SIZE_RE.search(text.lower())
+    if not match:
+        return None, None
+    count, amount, unit, pack, pack_of = match.groups()
+    if unit:
+        base, factor = _UNITS[unit]
+        quantity = float(amount.replace(',', '.')) * factor * (int(count) if count else 1)
+        return round(quantity, 3), base
+    return float(pack or pack_of), 'each'
+
+
+def normalise(title):
+    """``(quantity, unit, brand, tokens)`` for a product title."""
+    text = (title or '').lower()
+    quantity, unit = parse_size(text)
+    words = [
+        word for word in _WORD_RE.findall(_SIZE_RE.sub(' ', text))
+        if word not in _STOPWORDS and not word.isdigit()
+    ]
+    tokens = set(words)
+    # The brand is matched exactly (see ``group_ids``), so only the rest of
+    # the name gets trigrams
+    for word in words[1:]:
+        padded = f" {word} "
+        tokens.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return quantity, unit, words[0] if words else None, tokens
+
+
+class ProductMatcher:
+    def __init__(self, threshold=None):
+        if threshold is None:
+            threshold = float(os.environ.get('PRODUCT_MATCH_THRESHOLD', '0.7'))
+        self.threshold = threshold
+        self._token_hashes = {}
+
+    def _hash(self, token):
+        value = self._token_hashes.get(token)
+        if value is None:
+            value = self._token_hashes[token] = zlib.crc32(token.encode('utf-8'))
+        return value
+
+    def signatures(self, token_sets):
+        """MinHash signatures, one ``NUM_PERM``-wide row per non-empty token set."""
+        counts = np.fromiter((len(tokens) for tokens in token_sets), dtype=np.int64, count=len(token_sets))
+        hashes = np.fromiter(
+            (self._hash(token) for tokens in token_sets for token in tokens),
+            dtype=np.uint64, count=int(counts.sum()),
+        )
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        signatures = np.empty((len(token_sets), NUM_PERM), dtype=np.uint64)
+        for i in range(NUM_PERM):
+            permuted = (hashes * _PERM_A[i] + _PERM_B[i]) % _PRIME
+            signatures[:, i] = np.minimum.reduceat(permuted, starts)
+        return signatures
+
+    def _candidates(self, signatures, blocks):
+        """Index pairs ``(i, j)``, ``i < j``, in the same block sharing an LSH band."""
+        rows = NUM_PERM // BANDS
+        weights = np.array([1, 0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9][:rows], dtype=np.uint64)
+        block_keys = blocks * np.uint64(0xD6E8FEB86659FD93)
+        left, right = [], []
+        for band in range(BANDS):
+            # Wrapping uint64 arithmetic: one key per band row and block
+            keys = (signatures[:, band * rows:(band + 1) * rows] * weights).sum(axis=1, dtype=np.uint64) + block_keys
+            order = np.argsort(keys, kind='stable')
+            keys = keys[order]
+            for span in range(1, MAX_BUCKET_SPAN + 1):
+                same = keys[:-span] == keys[span:]
+                if not same.any():
+                    break
+                left.append(order[:-span][same])
+                right.append(order[span:][same])
+        if not left:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        i, j = np.concatenate(left), np.concatenate(right)
+        # Pairs found in several bands are kept once
+        pairs = np.sort(np.minimum(i, j) * len(signatures) + np.maximum(i, j))
+        pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+        return pairs // len(signatures), pairs % len(signatures)
+
+    def group_ids(self, titles):
+        """A group id per title; titles with the same id are the same product.
+
+        Ids are the index of the group's first title, so unmatched titles
+        get their own index.
+        """
+        count = len(titles)
+        labels = np.arange(count)
+        parsed = [normalise(title) for title in titles]
+        indices = np.array([n for n, (*_, tokens) in enumerate(parsed) if tokens], dtype=np.int64)
+        if len(indices) < 2:
+            return labels
+        signatures = self.signatures([parsed[n][3] for n in indices])
+        # Only titles of the same size and brand can match
+        blocks = np.fromiter(
+            (zlib.crc32(repr(parsed[n][:3]).encode('utf-8')) for n in indices),
+            dtype=np.uint64, count=len(indices),
+        )
+        i, j = self._candidates(signatures, blocks)
+
+        # Score in chunks to bound the (pairs x NUM_PERM) comparison
+        accepted = []
+        for start in range(0, len(i), 200000):
+            a, b = i[start:start + 200000], j[start:start + 200000]
+            similarity = (signatures[a] == signatures[b]).mean(axis=1)
+            accepted.append(similarity >= self.threshold)
+        if not accepted:
+            return labels
+        keep = np.concatenate(accepted)
+        labels[indices] = indices[self._seeded_components(signatures, i[keep], j[keep])]
+        return labels
+
+    def _seeded_components(self, signatures, i, j):
+        """Group label per signature row from the accepted pairs ``(i, j)``.
+
+        Labels are the smallest row of each group (its seed). Rows below the
+        threshold against their seed are split off and grouped again over
+        the pairs among them, until every row matches its seed.
+        """
+        labels = np.arange(len(signatures))
+        pending = np.ones(len(signatures), dtype=bool)
+        while len(i):
+            # Connected components: propagate the smallest label along the
+            # accepted pairs, with pointer jumping, until nothing changes
+            grouped = np.arange(len(signatures))
+            while True:
+                previous = grouped.copy()
+                np.minimum.at(grouped, i, grouped[j])
+                np.minimum.at(grouped, j, grouped[i])
+                grouped = grouped[grouped]
+                if np.array_equal(grouped, previous):
+                    break
+            rows = np.flatnonzero(pending)
+            labels[rows] = grouped[rows]
+            similarity = (signatures[rows] == signatures[grouped[rows]]).mean(axis=1)
+            pending[rows] = similarity < self.threshold
+            # Seeds always match themselves, so each round settles at least one row per group
+            between = pending[i] & pending[j]
+            i, j = i[between], j[between]
+        # Split off with no pairs left: on their own
+        labels[pending] = np.flatnonzero(pending)
+        return labels
+
+
+@lru_cache(maxsize=None)
+def default_matcher():
+    """Matcher for the configured threshold, created once per process."""
+    return ProductMatcher()
+
+
+def match_groups(discounts, matcher=None):
+    """Groups of ``Discount`` records that are the same product.
+
+    Each group lists its members (store, title and price) and, when they
+    share a currency, ``cheapest``: the index of the lowest-priced member.
+    Groups are ordered by size; single listings are left out.
+    """
+    matcher = matcher or default_matcher()
+    members = {}
+    for discount, group in zip(discounts, matcher.group_ids([d.title for d in discounts]).tolist()):
+        members.setdefault(group, []).append(discount)
+
+    groups = []
+    for listed in members.values():
+        if len(listed) < 2:
+            continue
+        priced = [n for n, d in enumerate(listed) if d.price_minor is not None]
+        cheapest = None
+        if priced and len({d.currency for d in listed}) == 1:
+            cheapest = min(priced, key=lambda n: listed[n].price_minor)
+        quantity, unit = parse_size(listed[0].title)
+        groups.append({
+            'size': None if unit is None else f"{quantity:g}{unit}",
+            'stores': sorted({d.store_key for d in listed}),
+            'members': [
+                {'store': d.store_key, 'title': d.title, 'price': d.price, 'price_minor': d.price_minor}
+                for d in listed
+            ],
+            'cheapest': cheapest,
+        })
+    groups.sort(key=lambda group: -len(group['members']))
+    return groups
@@ -0,0 +1,116 @@
+"""Query stored discounts with the API's filters, without scraping.
+
+Prints the matching rows from the SQLite store (see ``discount_store``) as
+the scraper's NDJSON records, followed by a summary listing each store's
+age and the stores whose data is missing or older than ``--max-age``::
+
+    {"type":"discount","discount":{...}}
+    ...
+    {"type":"summary","ok":true,"count":12,"stores":[...],"stale":["tesco"],"matches":[...],"elapsed":0.01}
+
+With ``--history-days N`` each record also carries ``history``: the
+product's lowest, median and last price over the last N days (see
+``price_history``) and whether today's price is the lowest.
+
+``matches`` groups the rows that are the same product in different stores
+or listings (see ``product_matching``).
+
+The API serves the rows directly when ``stale`` is empty and runs the
+scraper otherwise. Each query is logged as a request for the location
+(unless ``--no-record``), which is what ``refresh_scheduler`` prioritises by.
+
+The scraper daemon answers the same query in-process (``{"op": "query"}``,
+see ``scraper_daemon``); this script is the API's fallback when no daemon
+is running, so it stays clear of the scraper and browser modules.
+"""
+import argparse
+import sys
+import time
+
+from discount_cache import DiscountCache
+from discount_store import DiscountStore
+from ndjson_stream import NdjsonWriter
+from product_matching import match_groups
+from store_parsing import stores_for
+
+
+def _csv(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def query_location(location, writer, stores=None, categories=None, min_price=None, max_price=None,
+                   max_age=None, history_days=None, record=True):
+    """Stream the stored rows matching the filters through ``writer``.
+
+    Returns the summary fields: ``stores``, ``stale`` and ``matches``.
+    """
+    max_age = max_age if max_age is not None else DiscountCache().ttl
+    store = DiscountStore()
+    if record:
+        store.record_request(location)
+    discounts = store.query(
+        location,
+        stores=stores,
+        categories=categories,
+        min_price=min_price,
+        max_price=max_price,
+    )
+    if history_days:
+        # NumPy-backed; only loaded when history is asked for
+        from price_history import PriceHistory
+        for discount, history in zip(discounts, PriceHistory().stats_for(discounts, days=history_days)):
+            if history is not None:
+                history['is_lowest'] = discount.price_minor is not None and discount.price_minor <= history['lowest']
+            writer.discount(discount, history=history)
+    else:
+        for discount in discounts:
+            writer.discount(discount)
+
+    scraped_at = store.scraped_at(location)
+    now = time.time()
+    listed = []
+    stale = []
+    for key in stores_for(location, stores):
+        age = now - scraped_at[key] if key in scraped_at else None
+        listed.append({'store': key, 'status': 'stored', 'age': None if age is None else round(age)})
+        if age is None or age > max_age:
+            stale.append(key)
+    return {'stores': listed, 'stale': stale, 'matches': match_groups(discounts)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query stored grocery discounts for a location.')
+    parser.add_argument('location')
+    parser.add_argument('--stores', type=_csv, default=None, help='comma-separated store names')
+    parser.add_argument('--categories', type=_csv, default=None, help='comma-separated categories')
+    parser.add_argument('--min-price', type=float, default=None)
+    parser.add_argument('--max-price', type=float, default=None)
+    parser.add_argument('--max-age', type=float, default=None,
+                        help='seconds before stored data counts as stale (default: cache TTL)')
+    parser.add_argument('--history-days', type=float, default=None,
+                        help='add each product\'s lowest/median/last price over this many days')
+    parser.add_argument('--no-record', action='store_true',
+                        help="don't log this query as a request for the location")
+    args = parser.parse_args()
+
+    writer = NdjsonWriter.for_stream(sys.stdout)
+    try:
+        summary = query_location(
+            args.location,
+            writer,
+            stores=args.stores,
+            categories=args.categories,
+            min_price=args.min_price,
+            max_price=args.max_price,
+            max_age=args.max_age,
+            history_days=args.history_days,
+            record=not args.no_record,
+        )
+    except Exception as e:
+        writer.summary(ok=False, error=str(e))
+        sys.exit(1)
+    writer.summary(**summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Keep popular locations' discounts scraped ahead of demand.
+
+Run ``python3 scripts/refresh_scheduler.py`` next to the app. Every
+(location, store) pair of the most requested locations (as logged by
+``query_discounts.py`` over ``--window``) gets its own refresh schedule:
+it is re-scraped every ``--interval`` seconds, by default a little under
+the cache TTL so the API's store lookup never finds it stale. Each pair's
+next run is jittered by up to ``--jitter`` of the interval so the stores
+are not all hit at once.
+
+Due pairs run most-requested location first, at most ``--concurrency`` at
+a time, with browsers leased from one warm ``DriverPool`` of that size.
+Results land where the API reads them: the SQLite store (one transaction
+per store) and the cache entries (written atomically). A pair that was
+scraped recently by someone else, e.g. a request that missed, is pushed
+back instead of being scraped twice; one that fails is retried after
+``--retry-delay`` seconds.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import sys
+import threading
+import time
+
+from browser_profiles import BrowserProfiles
+from discount_cache import DiscountCache
+from discount_store import DiscountStore, location_key
+from scrape_discounts import scrape_location, select_adapters, _csv
+from scraper_daemon import DriverPool
+
+DEFAULT_WINDOW = 24 * 60 * 60
+DEFAULT_RETRY_DELAY = 5 * 60
+# Refresh this far into the cache TTL, ahead of entries going stale
+INTERVAL_FRACTION = 0.8
+
+
+class RefreshScheduler:
+    def __init__(self, pool=None, store=None, cache=None, concurrency=2, interval=None, jitter=0.1,
+                 window=DEFAULT_WINDOW, max_locations=20, locations=(), mode=None,
+                 retry_delay=DEFAULT_RETRY_DELAY):
+        self.pool = pool
+        self.store = store or DiscountStore()
+        self.cache = cache or DiscountCache()
+        self.concurrency = concurrency
+        self.interval = interval or self.cache.ttl * INTERVAL_FRACTION
+        self.jitter = jitter
+        self.window = window
+        self.max_locations = max_locations
+        # Always kept warm, whether or not anyone asked for them lately
+        self.locations = list(locations)
+        self.mode = mode
+        self.retry_delay = retry_delay
+        self._due = {}
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def _jittered(self, seconds):
+        return seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def plan(self, now=None):
+        """Due ``(location, adapter)`` pairs, most requested location first."""
+        now = now or time.time()
+        ranked = self.store.popular_locations(now - self.window, self.max_locations)
+        counts = {location_key(location): count for location, count in ranked}
+        locations = [location for location, _ in ranked]
+        locations += [location for location in self.locations if location_key(location) not in counts]
+
+        due = []
+        for location in locations:
+            key = location_key(location)
+            scraped_at = None
+            for adapter in select_adapters(location):
+                pair = (key, adapter.key)
+                with self._lock:
+                    if pair in self._running:
+                        continue
+                    if pair not in self._due:
+                        # First sighting: due one interval after it was last stored
+                        if scraped_at is None:
+                            scraped_at = self.store.scraped_at(location)
+                        last = scraped_at.get(adapter.key)
+                        self._due[pair] = now if last is None else last + self._jittered(self.interval)
+                    when = self._due[pair]
+                if when <= now:
+                    due.append((-counts.get(key, 0), when, location, adapter))
+        due.sort(key=lambda item: item[:2])
+        return [(location, adapter) for _, _, location, adapter in due]
+
+    def refresh(self, location, adapter):
+        """Re-scrape one pair unless it was stored recently, then reschedule it."""
+        pair = (location_key(location), adapter.key)
+        next_due = time.time() + self._jittered(self.retry_delay)
+        try:
+            scraped_at = self.store.scraped_at(location).get(adapter.key)
+            if scraped_at is not None and time.time() - scraped_at < self.interval * (1 - self.jitter):
+                # Someone else scraped it in the meantime
+                next_due = scraped_at + self._jittered(self.interval)
+                return
+            print(f"Refreshing {adapter.name} for {location}", file=sys.stderr)
+            discounts, cache_info = scrape_location(
+                location, pool=self.pool, mode=self.mode, stores=[adapter.key],
+                cache=self.cache, store=self.store, refresh=True,
+            )
+            info = next((i for i in cache_info if i['store'] == adapter.key), {})
+            if info.get('status') == 'refresh' and not info.get('partial') and discounts:
+                next_due = time.time() + self._jittered(self.interval)
+            else:
+                print(f"Refresh of {adapter.name} for {location} failed ({info.get('status')}), "
+                      f"retrying in {self.retry_delay:.0f}s", file=sys.stderr)
+        except Exception as e:
+            print(f"Error refreshing {adapter.name} for {location}: {str(e)}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._due[pair] = next_due
+                self._running.discard(pair)
+
+    def run(self, once=False, tick=5):
+        """Refresh due pairs until interrupted.
+
+        With ``once``, start the pairs due now (up to ``concurrency``) and
+        return when they have finished.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                self.store.prune_requests(time.time() - self.window)
+                with self._lock:
+                    free = self.concurrency - len(self._running)
+                # Only hand out free slots, so later ticks re-rank what is still waiting
+                for location, adapter in self.plan()[:max(free, 0)]:
+                    with self._lock:
+                        self._running.add((location_key(location), adapter.key))
+                    executor.submit(self.refresh, location, adapter)
+                if once:
+                    break
+                time.sleep(tick)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Refresh popular locations\' discounts ahead of requests.')
+    parser.add_argument('--concurrency', type=int, default=2, help='stores scraped (and browsers run) at once')
+    parser.add_argument('--interval', type=float, default=None,
+                        help=f'seconds between refreshes of a store (default: {INTERVAL_FRACTION:g} x cache TTL)')
+    parser.add_argument('--jitter', type=float, default=0.1, help='random spread of each refresh, as a fraction of the interval')
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW, help='seconds of request history to rank locations by')
+    parser.add_argument('--max-locations', type=int, default=20, help='most requested locations to keep warm')
+    parser.add_argument('--locations', type=_csv, default=[], help='comma-separated locations to always keep warm')
+    parser.add_argument('--mode', choices=['auto', 'http', 'browser'], default=None)
+    parser.add_argument('--retry-delay', type=float, default=DEFAULT_RETRY_DELAY, help='seconds before retrying a failed refresh')
+    parser.add_argument('--tick', type=float, default=5, help='seconds between scheduling passes')
+    parser.add_argument('--once', action='store_true', help='refresh what is due now and exit (e.g. from cron)')
+    args = parser.parse_args()
+
+    pool = DriverPool(
+        size=args.concurrency,
+        profiles=BrowserProfiles(slots=None if 'SCRAPE_PROFILE_SLOTS' in os.environ else args.concurrency),
+    )
+    scheduler = RefreshScheduler(
+        pool=pool,
+        concurrency=args.concurrency,
+        interval=args.interval,
+        jitter=args.jitter,
+        window=args.window,
+        max_locations=args.max_locations,
+        locations=args.locations,
+        mode=args.mode,
+        retry_delay=args.retry_delay,
+    )
+    try:
+        scheduler.run(once=args.once, tick=args.tick)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
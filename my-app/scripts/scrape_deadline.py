@@ -0,0 +1,59 @@
+"""Latency budget for a scrape.
+
+A ``Deadline`` is made active for each store worker (like the scrape
+metrics), and everything that waits on the browser or the network takes
+its timeouts through ``current_deadline().cap(...)``. So readiness waits,
+scroll passes, retries and back-offs all shrink to fit the remaining
+budget, and the scrape returns what it has when the budget runs out. With
+no deadline the budget is unbounded and timeouts pass through unchanged.
+"""
+from contextlib import contextmanager
+import math
+import threading
+import time
+
+_active = threading.local()
+
+
+class Deadline:
+    def __init__(self, seconds=None):
+        self.expires = None if seconds is None else time.monotonic() + max(seconds, 0)
+
+    @property
+    def bounded(self):
+        return self.expires is not None
+
+    def remaining(self):
+        if self.expires is None:
+            return math.inf
+        return max(self.expires - time.monotonic(), 0.0)
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """Whether at least ``seconds`` of budget are left."""
+        return self.remaining() >= seconds
+
+    def cap(self, timeout):
+        """``timeout`` cut down to the remaining budget."""
+        return min(timeout, self.remaining())
+
+    def sleep(self, seconds):
+        time.sleep(self.cap(seconds))
+
+    @contextmanager
+    def active(self):
+        """Make this the deadline ``current_deadline()`` returns on this thread."""
+        previous = getattr(_active, 'deadline', None)
+        _active.deadline = self
+        try:
+            yield self
+        finally:
+            _active.deadline = previous
+
+
+def current_deadline():
+    """The active deadline for this thread, or an unbounded one."""
+    return getattr(_active, 'deadline', None) or Deadline()
@@ -1,15 +1,53 @@
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import time
 import json
+import os
 import random
+import sqlite3
+import subprocess
+import sys
+import threading
 
-def setup_driver():
-    """Set up Chrome driver with optimal settings."""
+from browser_profiles import BrowserProfiles
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from discount_cache import DiscountCache, PartialResult, write_json_atomic
+from discount_record import Discount
+from discount_store import DiscountStore
+from driver_binary import chromedriver_path, forget_chromedriver
+from driver_governor import owner_env, owner_flag, quit_driver, reap_orphans
+import scrape_profile
+from http_fetch import fetch_discounts_http
+from ndjson_stream import NdjsonWriter
+from page_archive import archive_driver_page
+from page_readiness import PageReadiness
+from price_history import PriceHistory
+from product_matching import match_groups
+from scrape_deadline import Deadline, current_deadline
+from scrape_metrics import ScrapeMetrics, current_metrics, emit_metrics, profile_thread, profiling
+from scraper_paths import location_output_path
+from scroll_harvester import harvest_cards
+from selector_discovery import resolve_card_selector
+from single_flight import FlightTimeout, SingleFlight
+from store_parsing import (
+    CHECKERS_URL, CHECKERS_CARD_SELECTOR, CHECKERS_CARD_CANDIDATES, CHECKERS_FIELDS,
+    parse_checkers_card, checkers_json_ld_row,
+    TESCO_URL, TESCO_CARD_SELECTOR, TESCO_CARD_CANDIDATES, TESCO_FIELDS, parse_tesco_card, tesco_json_ld_row,
+    STORE_LOCATIONS, apply_filters, dedupe_discounts,
+)
+from store_shards import scrape_shards, shard_urls
+from store_registry import StoreAdapter, register_store, adapters_for
+
+def setup_driver(profile=None, user_data_dir=None):
+    """Set up Chrome driver with optimal settings.
+    
+    ``profile`` picks the resource profile (see ``scrape_profile``);
+    ``user_data_dir`` reuses a persistent browser profile (see
+    ``browser_profiles``).
+    """
     options = Options()
     
     # Mobile emulation settings
@@ -24,12 +62,34 @@ def setup_driver():
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
     options.add_argument('--disable-blink-features=AutomationControlled')
+    if user_data_dir:
+        options.add_argument(f'--user-data-dir={user_data_dir}')
+    # Lets reap_orphans find this browser if we die without quitting it
+    options.add_argument(owner_flag())
     
     # Disable automation flags
     options.add_experimental_option('excludeSwitches', ['enable-automation'])
     options.add_experimental_option('useAutomationExtension', False)
     
-    driver = webdriver.Chrome(options=options)
+    # CDP network events, used by PageReadiness to detect network idle
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    
+    # Skip images, fonts, media and trackers; we only read card text
+    scrape_profile.apply_options(options, profile)
+    
+    # The owner tag in its environment lets reap_orphans find chromedriver too
+    service = Service(executable_path=chromedriver_path(options), env=owner_env())
+    try:
+        driver = webdriver.Chrome(service=service, options=options)
+    except SessionNotCreatedException as e:
+        # Usually the cached chromedriver no longer matching an updated
+        # Chrome: resolve it again and retry once
+        if not forget_chromedriver():
+            raise
+        print(f"Chrome session failed to start, resolving chromedriver again: {str(e).strip()}", file=sys.stderr)
+        service = Service(executable_path=chromedriver_path(options), env=owner_env())
+        driver = webdriver.Chrome(service=service, options=options)
+    scrape_profile.apply_blocking(driver, profile)
     
     # Additional anti-detection measures
     driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
@@ -42,288 +102,622 @@ def setup_driver():
     
     return driver
 
-def scrape_checkers():
-    """Scrape discounts from Checkers."""
-    driver = setup_driver()
+# Longest a navigation may block, before the deadline cuts it down further
+PAGE_LOAD_TIMEOUT = 60
+# Not worth starting another attempt with less budget than this
+MIN_ATTEMPT_SECONDS = 5
+
+def scrape_checkers(driver=None, on_discount=None, url=None):
+    """Scrape discounts from Checkers.
+
+    Pass a ``driver`` to reuse a warm browser (e.g. one leased from the
+    daemon's pool); otherwise a fresh one is started and quit afterwards.
+    ``on_discount`` is called with each discount as soon as it is parsed.
+    ``url`` scrapes one shard (see ``store_shards``) instead of the specials
+    page.
+    Waits, scrolling and retries are scheduled within the active deadline
+    (see ``scrape_deadline``); whatever was found when it runs out is
+    returned. Products found before the retries ran out on errors come back
+    as a ``PartialResult``, so they don't replace the stored catalogue.
+    """
+    metrics = current_metrics()
+    deadline = current_deadline()
+    owns_driver = driver is None
+    if owns_driver:
+        with metrics.phase('driver_setup'):
+            driver = setup_driver()
+    ready = PageReadiness(driver)
     discounts = []
+    seen = set()
     max_retries = 3
     retry_count = 0
+    errored = False
     
     while retry_count < max_retries:
+        if not deadline.allows(MIN_ATTEMPT_SECONDS):
+            print("Checkers deadline reached, returning what was found", file=sys.stderr)
+            break
         try:
             # Go to Checkers mobile specials page
-            driver.get('https://www.checkers.co.za/m/specials')
-            
-            # Add random delay to appear more human-like
-            time.sleep(random.uniform(8, 12))
+            ready.reset_network()
+            driver.set_page_load_timeout(max(deadline.cap(PAGE_LOAD_TIMEOUT), 1))
+            with metrics.phase('navigation'):
+                driver.get(url or CHECKERS_URL)
+            ready.network_idle(timeout=20)
+            ready.jitter()
             
             # Accept cookies if present
-            try:
-                cookie_button = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-                )
-                cookie_button.click()
-                time.sleep(2)
-            except:
-                pass
+            ready.dismiss_cookie_banner(timeout=5)
             
-            # Scroll down a few times to load more products
-            for _ in range(3):
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(random.uniform(2, 4))
+            # Wait for products to load, on whichever card selector matches them
+            with metrics.phase('wait_products'):
+                card_selector = resolve_card_selector(
+                    driver, 'checkers', CHECKERS_CARD_CANDIDATES, CHECKERS_FIELDS, timeout=deadline.cap(15),
+                )
             
-            # Wait for products to load
-            products = WebDriverWait(driver, 15).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".product-card, .product-item"))
+            # Scroll until no new cards appear, extracting only the new ones
+            _, stats = harvest_cards(
+                driver, ready, card_selector, CHECKERS_FIELDS, parse_checkers_card,
+                'Checkers', on_discount=on_discount, seen=seen, found=discounts,
             )
+            print(f"Checkers harvest: {stats}", file=sys.stderr)
+            archive_driver_page('checkers', driver)
             
-            if not products:
-                print("No products found, retrying...")
+            if not discounts:
+                print("No products found, retrying...", file=sys.stderr)
+                metrics.count('retries')
                 retry_count += 1
                 continue
             
-            for product in products:
-                try:
-                    # Get title
-                    title = WebDriverWait(product, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, ".product-card__name, .product-item__name"))
-                    ).text.strip()
-                    
-                    if not title:  # Skip if no title
-                        continue
-                    
-                    # Get current price
-                    try:
-                        price_element = WebDriverWait(product, 5).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, ".price__current, .product-item__price"))
-                        )
-                        current_price = price_element.text.strip()
-                    except:
-                        continue  # Skip if no price
-                    
-                    # Get original price
-                    try:
-                        original_price = product.find_element(By.CSS_SELECTOR, ".price__was, .product-item__was-price").text.strip()
-                    except:
-                        original_price = None
-                    
-                    # Clean up the price for display
-                    if '\n' in current_price:
-                        # Handle card member prices
-                        prices = current_price.split('\n')
-                        current_price = prices[-1].replace('WITH CARD', '').strip()
-                        if not original_price and len(prices) > 1:
-                            original_price = prices[0].strip()
-                    
-                    # Calculate discount percentage
-                    discount_percentage = None
-                    if original_price:
-                        try:
-                            original_value = float(original_price.replace('R', '').replace(',', '').strip())
-                            current_value = float(current_price.replace('R', '').replace(',', '').strip())
-                            if original_value > 0:
-                                discount_percentage = ((original_value - current_value) / original_value) * 100
-                        except:
-                            pass
-                    
-                    # Try to determine category from product title
-                    title_lower = title.lower()
-                    if any(word in title_lower for word in ['milk', 'cheese', 'yogurt']):
-                        category = 'dairy'
-                    elif any(word in title_lower for word in ['bread', 'roll', 'bun']):
-                        category = 'bakery'
-                    elif any(word in title_lower for word in ['chicken', 'beef', 'pork', 'meat']):
-                        category = 'meat'
-                    elif any(word in title_lower for word in ['apple', 'banana', 'orange']):
-                        category = 'fruits'
-                    elif any(word in title_lower for word in ['carrot', 'potato', 'onion']):
-                        category = 'vegetables'
-                    elif any(word in title_lower for word in ['coca-cola', 'sprite', 'fanta', 'juice']):
-                        category = 'beverages'
-                    elif any(word in title_lower for word in ['chips', 'chocolate', 'candy']):
-                        category = 'snacks'
-                    else:
-                        category = 'other'
-                    
-                    discounts.append({
-                        'title': title,
-                        'price': current_price,
-                        'original_price': original_price,
-                        'discount_percentage': f"{discount_percentage:.1f}%" if discount_percentage else None,
-                        'store': 'Checkers',
-                        'location': 'Cape Town',
-                        'category': category
-                    })
-                except Exception as e:
-                    print(f"Error processing Checkers product: {str(e)}")
-                    continue
-            
             # If we got here successfully, break the retry loop
+            errored = False
             break
             
         except Exception as e:
-            print(f"Error scraping Checkers: {str(e)}")
+            print(f"Error scraping Checkers: {str(e)}", file=sys.stderr)
+            metrics.count('errors')
+            errored = True
             retry_count += 1
             if retry_count < max_retries:
-                print(f"Retrying... (Attempt {retry_count + 1} of {max_retries})")
-                time.sleep(random.uniform(5, 10))  # Wait before retrying
+                print(f"Retrying... (Attempt {retry_count + 1} of {max_retries})", file=sys.stderr)
+                metrics.count('retries')
+                with metrics.phase('retry_backoff'):
+                    deadline.sleep(random.uniform(5, 10))  # Wait before retrying
             continue
         
         finally:
             if retry_count >= max_retries:
-                print("Max retries reached, giving up")
-    
-    try:
-        driver.quit()
-    except:
-        pass
+                print("Max retries reached, giving up", file=sys.stderr)
     
-    # Remove duplicates based on title and price
-    unique_discounts = []
-    seen = set()
-    for d in discounts:
-        key = (d['title'], d['price'])
-        if key not in seen:
-            seen.add(key)
-            unique_discounts.append(d)
+    if owns_driver:
+        quit_driver(driver)
     
-    discounts = unique_discounts
-    print(f"Found {len(discounts)} Checkers discounts")
+    print(f"Found {len(discounts)} Checkers discounts", file=sys.stderr)
+    metrics.merge_readiness(ready)
     
+    if errored and discounts:
+        return PartialResult(discounts)
     return discounts
 
-def scrape_tesco():
-    """Scrape discounts from Tesco."""
-    driver = setup_driver()
+def scrape_tesco(driver=None, on_discount=None, url=None):
+    """Scrape discounts from Tesco. See ``scrape_checkers`` for the arguments and result."""
+    metrics = current_metrics()
+    deadline = current_deadline()
+    owns_driver = driver is None
+    if owns_driver:
+        with metrics.phase('driver_setup'):
+            driver = setup_driver()
+    ready = PageReadiness(driver)
     discounts = []
+    errored = False
     
     try:
         # Go to Tesco Offers page
-        driver.get('https://www.tesco.com/groceries/en-GB/promotions')
-        time.sleep(15)  # Wait longer for initial load
+        ready.reset_network()
+        driver.set_page_load_timeout(max(deadline.cap(PAGE_LOAD_TIMEOUT), 1))
+        with metrics.phase('navigation'):
+            driver.get(url or TESCO_URL)
+        ready.network_idle(timeout=30)
+        ready.jitter()
         
         # Accept cookies if the popup appears
-        try:
-            accept_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
+        if not ready.dismiss_cookie_banner(timeout=10):
+            print("No cookie banner found or already accepted", file=sys.stderr)
+        
+        # Wait for products to load, on whichever card selector matches them
+        with metrics.phase('wait_products'):
+            card_selector = resolve_card_selector(
+                driver, 'tesco', TESCO_CARD_CANDIDATES, TESCO_FIELDS, timeout=deadline.cap(10),
             )
-            accept_button.click()
-            time.sleep(2)
-        except:
-            print("No cookie banner found or already accepted")
         
-        # Wait for products to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "product-list--list-item"))
+        # Scroll until no new cards appear, extracting only the new ones
+        _, stats = harvest_cards(
+            driver, ready, card_selector, TESCO_FIELDS, parse_tesco_card,
+            'Tesco', on_discount=on_discount, found=discounts,
         )
-        
-        # Find all product elements
-        products = driver.find_elements(By.CLASS_NAME, "product-list--list-item")
-        
-        for product in products:
-            try:
-                # Get title
-                title = product.find_element(By.CSS_SELECTOR, "[data-auto='product-tile--title']").text
-                
-                # Try different price selectors
-                current_price = None
-                original_price = None
-                price_selectors = [
-                    ".beans-price__text",
-                    ".styled__Text-sc-8qlq5b-1",
-                    "[class*='ContentText']",
-                    ".styled__StyledHeading-sc-119w3hf-2"
-                ]
-                
-                for selector in price_selectors:
-                    try:
-                        price_element = product.find_element(By.CSS_SELECTOR, selector)
-                        price_text = price_element.text
-                        if '£' in price_text:
-                            if 'was' in price_text.lower():
-                                original_price = price_text.split('was')[-1].strip()
-                            else:
-                                current_price = price_text
-                    except:
-                        continue
-                
-                if not current_price:
-                    continue
-                
-                # Get clubcard price if available
-                try:
-                    clubcard_element = product.find_element(By.CSS_SELECTOR, "[class*='ContentText']")
-                    clubcard_text = clubcard_element.text
-                    if 'Clubcard Price' in clubcard_text:
-                        current_price = clubcard_text.split(' ')[0]  # Get just the price
-                except:
-                    pass
-                
-                # Try to get category
-                try:
-                    category = product.find_element(By.CSS_SELECTOR, "[class*='category']").text.lower()
-                except:
-                    category = 'uncategorized'
-                
-                # Calculate discount percentage
-                discount_percentage = None
-                if original_price and current_price:
-                    try:
-                        original_value = float(original_price.replace('£', '').strip())
-                        current_value = float(current_price.replace('£', '').strip())
-                        if original_value > 0:
-                            discount_percentage = ((original_value - current_value) / original_value) * 100
-                    except:
-                        pass
-                
-                discounts.append({
-                    'title': title,
-                    'price': current_price,
-                    'original_price': original_price,
-                    'discount_percentage': f"{discount_percentage:.1f}%" if discount_percentage else None,
-                    'store': 'Tesco',
-                    'location': 'London',
-                    'category': category
-                })
-                
-            except Exception as e:
-                print(f"Error processing Tesco product: {str(e)}")
-                continue
-        
-        print(f"Found {len(discounts)} Tesco discounts")
+        print(f"Tesco harvest: {stats}", file=sys.stderr)
+        archive_driver_page('tesco', driver)
+        print(f"Found {len(discounts)} Tesco discounts", file=sys.stderr)
         
     except Exception as e:
-        print(f"Error scraping Tesco: {str(e)}")
+        print(f"Error scraping Tesco: {str(e)}, keeping {len(discounts)} found", file=sys.stderr)
+        metrics.count('errors')
+        errored = True
     
     finally:
-        driver.quit()
+        metrics.merge_readiness(ready)
+        if owns_driver:
+            quit_driver(driver)
     
+    if errored and discounts:
+        return PartialResult(discounts)
     return discounts
 
-def main(location):
-    all_discounts = []
+def _run_scraper(adapter, pool=None, on_discount=None):
+    """Run a store's browser scraper, one browser per shard (see ``store_shards``)."""
+    urls = adapter.shard_urls()
+    if len(urls) == 1:
+        return _run_shard(adapter, None, pool, on_discount)
+    discounts = scrape_shards(
+        adapter.name, urls,
+        lambda url, sink: _run_shard(adapter, url, pool, sink),
+        on_discount=on_discount,
+    )
+    if discounts is None:
+        # Every shard came back empty: a failed scrape, as for one page
+        return []
+    if discounts.failed:
+        return PartialResult(discounts)
+    return discounts
+
+def _run_shard(adapter, url, pool=None, on_discount=None):
+    """Scrape one shard, on a leased pool driver when a pool is given.
+    
+    Without a pool, the driver runs on the store's persistent browser
+    profile, so consent cookies and the disk cache survive between runs.
+    """
+    metrics = current_metrics()
+    if pool is None:
+        with BrowserProfiles().lease(adapter.key) as profile:
+            with metrics.phase('driver_setup'):
+                driver = setup_driver(user_data_dir=profile.path)
+            try:
+                with metrics.watch_driver(driver):
+                    return adapter.scrape(driver, on_discount=on_discount, url=url)
+            finally:
+                with metrics.phase('driver_quit'):
+                    quit_driver(driver)
+    started = time.monotonic()
+    with pool.lease() as driver:
+        metrics.add_phase('driver_lease', time.monotonic() - started)
+        with metrics.watch_driver(driver):
+            return adapter.scrape(driver, on_discount=on_discount, url=url)
+
+register_store(StoreAdapter(
+    key='checkers',
+    name='Checkers',
+    locations=STORE_LOCATIONS['checkers'],
+    url=CHECKERS_URL,
+    card_selector=CHECKERS_CARD_SELECTOR,
+    card_candidates=CHECKERS_CARD_CANDIDATES,
+    fields=CHECKERS_FIELDS,
+    parse_card=parse_checkers_card,
+    json_ld_row=checkers_json_ld_row,
+    scrape=scrape_checkers,
+    shards=lambda: shard_urls(CHECKERS_URL, 'CHECKERS_SHARD_URLS'),
+))
+
+register_store(StoreAdapter(
+    key='tesco',
+    name='Tesco',
+    locations=STORE_LOCATIONS['tesco'],
+    url=TESCO_URL,
+    card_selector=TESCO_CARD_SELECTOR,
+    card_candidates=TESCO_CARD_CANDIDATES,
+    fields=TESCO_FIELDS,
+    parse_card=parse_tesco_card,
+    json_ld_row=tesco_json_ld_row,
+    scrape=scrape_tesco,
+    shards=lambda: shard_urls(TESCO_URL, 'TESCO_SHARD_URLS'),
+))
+
+# Upper bound on stores scraped at once for one location
+MAX_STORE_WORKERS = int(os.environ.get('SCRAPE_MAX_STORE_WORKERS', '4'))
+# Seconds of a caller's deadline kept back for collecting and returning results
+DEADLINE_MARGIN = 1.0
+
+def _scrape_store(adapter, pool=None, mode=None, on_discount=None):
+    """Try the lightweight HTTP fetch first and escalate to the browser.
+
+    ``mode`` is ``auto`` (default), ``http`` (never start a browser) or
+    ``browser`` (skip the HTTP attempt); see also ``SCRAPE_MODE``.
+    """
+    mode = mode or os.environ.get('SCRAPE_MODE', 'auto')
+    metrics = current_metrics()
+    deadline = current_deadline()
+    if mode != 'browser':
+        metrics.tags['mode'] = 'http'
+        urls = adapter.shard_urls()
+        failed = []
+        if len(urls) == 1:
+            discounts = fetch_discounts_http(adapter, timeout=max(deadline.cap(10), 0.1))
+        else:
+            discounts = scrape_shards(
+                adapter.name, urls,
+                lambda url, _: fetch_discounts_http(adapter, url=url, timeout=max(deadline.cap(10), 0.1)),
+            )
+            failed = discounts.failed if discounts else []
+        if discounts or mode == 'http':
+            for discount in discounts or []:
+                if on_discount:
+                    on_discount(discount)
+            if not failed:
+                return discounts or []
+            if mode == 'http':
+                print(f"{len(failed)} {adapter.name} shards failed over HTTP; result is partial", file=sys.stderr)
+                return PartialResult(discounts)
+            return _retry_shards_in_browser(adapter, failed, discounts, pool, on_discount)
+        if not deadline.allows(MIN_ATTEMPT_SECONDS):
+            print(f"No budget left for a browser scrape of {adapter.name}", file=sys.stderr)
+            return []
+        print(f"Falling back to browser scrape for {adapter.name}", file=sys.stderr)
+    metrics.tags['mode'] = 'browser'
+    return _run_scraper(adapter, pool, on_discount)
+
+def _retry_shards_in_browser(adapter, urls, discounts, pool=None, on_discount=None):
+    """Scrape the shards the HTTP path got nothing from in the browser, merged into ``discounts``.
+
+    Returns a ``PartialResult`` if some of them still came back empty.
+    """
+    if not current_deadline().allows(MIN_ATTEMPT_SECONDS):
+        print(f"No budget left to retry {len(urls)} {adapter.name} shards in the browser", file=sys.stderr)
+        return PartialResult(discounts)
+    print(f"Retrying {len(urls)} {adapter.name} shards in the browser", file=sys.stderr)
+    current_metrics().count('shards_retried', len(urls))
+    try:
+        retried = scrape_shards(
+            adapter.name, urls,
+            lambda url, sink: _run_shard(adapter, url, pool, sink),
+            on_discount=on_discount,
+        )
+    except Exception as e:
+        print(f"Error retrying {adapter.name} shards in the browser: {str(e)}", file=sys.stderr)
+        return PartialResult(discounts)
+    merged = dedupe_discounts(list(discounts) + list(retried or []))
+    if retried is None or retried.failed:
+        return PartialResult(merged)
+    return merged
+
+def _refresh_in_background(location, store, filters, pool=None, mode=None):
+    """Re-scrape one store's cache entry without blocking the caller."""
+    if pool is not None:
+        # Inside the daemon: refresh on a thread using the warm driver pool
+        threading.Thread(
+            target=scrape_location,
+            args=(location,),
+            kwargs=dict(filters, pool=pool, mode=mode, stores=[store], cache=DiscountCache(),
+                        store=DiscountStore(), refresh=True),
+            daemon=True,
+        ).start()
+        return
+    
+    args = [sys.executable, os.path.abspath(__file__), location, '--refresh', '--stores', store]
+    if mode:
+        args += ['--mode', mode]
+    if filters['categories']:
+        args += ['--categories', ','.join(filters['categories'])]
+    if filters['min_price'] is not None:
+        args += ['--min-price', str(filters['min_price'])]
+    if filters['max_price'] is not None:
+        args += ['--max-price', str(filters['max_price'])]
+    subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+def _filtered_sink(on_discount, filters):
+    """Wrap ``on_discount`` so it only sees new discounts passing ``filters``."""
+    if on_discount is None:
+        return None
+    seen = set()
+    
+    def sink(discount):
+        key = discount.dedupe_key
+        if key in seen:
+            return
+        seen.add(key)
+        if apply_filters([discount], **filters):
+            on_discount(discount)
+    return sink
+
+def _save_to_store(store, location, adapter, discounts, partial=False):
+    """Record a live scrape in the SQLite store; failures only cost the index."""
+    try:
+        store.replace_store(location, adapter.key, discounts, partial=partial)
+    except sqlite3.Error as e:
+        print(f"Could not store {adapter.name} discounts: {str(e)}", file=sys.stderr)
+
+def _record_history(adapter, discounts):
+    """Append a live scrape's prices to the price history; failures only cost history."""
+    try:
+        PriceHistory().append(discounts)
+    except (OSError, ValueError) as e:
+        print(f"Could not record {adapter.name} price history: {str(e)}", file=sys.stderr)
+
+def _store_result(adapter, location, filters, pool, mode, cache, refresh, on_discount=None, store=None,
+                  deadline=None):
+    """Discounts and cache info for one store, emitting its scrape metrics."""
+    metrics = ScrapeMetrics(adapter.key, location=location)
+    status = 'error'
+    try:
+        with metrics.active(), (deadline or Deadline()).active(), profile_thread():
+            try:
+                discounts, info = _cached_store_result(
+                    adapter, location, filters, pool, mode, cache, refresh, on_discount, store,
+                )
+            except CircuitOpen as e:
+                print(f"Skipping {adapter.name}: {str(e)}", file=sys.stderr)
+                discounts, info = [], {'status': 'circuit_open', 'age': None}
+        status = info['status']
+        metrics.count('products', len(discounts))
+        if info.get('partial'):
+            metrics.tags['partial'] = True
+        return discounts, info
+    finally:
+        metrics.tags['cache'] = status
+        emit_metrics(metrics)
+
+def _cached_store_result(adapter, location, filters, pool, mode, cache, refresh, on_discount=None, store=None):
+    """Discounts and cache info for one store, from cache or a live scrape.
+    
+    A live scrape cut short by the deadline is returned but flagged
+    ``partial``, and is neither cached nor allowed to replace the store's
+    full catalogue in ``store``. Concurrent live scrapes of the same store
+    and location share one flight (see ``single_flight``); whichever caller
+    runs it scrapes unfiltered, and each applies its own filters.
+    """
+    sink = _filtered_sink(on_discount, filters)
+    scraped = []
+    shared = []
+    breaker = CircuitBreaker(adapter.key)
+    
+    def live():
+        try:
+            discounts = _scrape_store(adapter, pool, mode, sink)
+        except Exception:
+            breaker.record_failure()
+            raise
+        # Out of time, or shards that came back with nothing
+        partial = current_deadline().expired or isinstance(discounts, PartialResult)
+        if discounts:
+            breaker.record_success()
+        elif not partial:
+            breaker.record_failure()
+        if store is not None and discounts:
+            _save_to_store(store, location, adapter, discounts, partial=partial)
+        if discounts:
+            _record_history(adapter, discounts)
+        return {'discounts': [d.to_dict() for d in discounts], 'partial': partial}
+    
+    def scrape():
+        breaker.check()
+        try:
+            flight, coalesced = SingleFlight().run(DiscountCache.key(location, adapter.key), live)
+        except FlightTimeout as e:
+            print(f"{adapter.name}: {str(e)}", file=sys.stderr)
+            flight, coalesced = {'discounts': [], 'partial': True}, True
+        scraped.append(flight['partial'])
+        discounts = apply_filters([Discount.from_dict(record) for record in flight['discounts']], **filters)
+        if coalesced:
+            shared.append(True)
+            if sink:
+                # Another caller's scrape streamed to its own client, not ours
+                for discount in discounts:
+                    sink(discount)
+        return PartialResult(discounts) if flight['partial'] else discounts
+    
+    def live_info(status):
+        return {'status': status, 'age': 0, 'partial': any(scraped), 'coalesced': bool(shared)}
+    
+    if cache is None:
+        discounts = scrape()
+        return discounts, live_info('bypass')
+    
+    key = cache.key(location, adapter.key, filters)
+    if refresh:
+        discounts = scrape()
+        if discounts and not isinstance(discounts, PartialResult):
+            cache.put(key, [d.to_dict() for d in discounts], location=location, store=adapter.key)
+        return discounts, live_info('refresh')
+    
+    def scrape_records():
+        discounts = scrape()
+        records = [d.to_dict() for d in discounts]
+        return PartialResult(records) if isinstance(discounts, PartialResult) else records
+    
+    records, info = cache.fetch(
+        key, scrape_records,
+        refresh=lambda: _refresh_in_background(location, adapter.key, filters, pool, mode),
+        location=location, store=adapter.key,
+    )
+    discounts = [Discount.from_dict(record) for record in records]
+    if scraped:
+        info = dict(info, partial=any(scraped), coalesced=bool(shared))
+    elif sink:
+        # Served from cache: nothing was streamed during a scrape
+        for discount in discounts:
+            sink(discount)
+    return discounts, info
+
+def select_adapters(location, stores=None):
+    """Adapters serving ``location``, narrowed to ``stores`` (substring match)."""
+    return [
+        adapter for adapter in adapters_for(location)
+        if not stores or any(s.lower() in adapter.key for s in stores)
+    ]
+
+def scrape_location(location, pool=None, mode=None, stores=None, categories=None,
+                    min_price=None, max_price=None, cache=None, refresh=False, on_discount=None,
+                    store=None, deadline=None):
+    """Scrape (or serve from ``cache``) filtered discounts for a location.
+    
+    Every registered store serving the location runs concurrently, each
+    bounded by its adapter's ``timeout`` and by ``deadline`` seconds overall,
+    so the slowest store sets the latency. Stores schedule their waits to
+    finish inside the deadline and return what they have, flagged
+    ``partial``. Returns ``(discounts, cache_info)``; ``cache_info`` has the
+    cache status (hit/stale/miss/refresh/bypass, or timeout/error/
+    circuit_open), entry age in seconds and ``partial`` flag per store.
     
-    if location.lower() == 'cape town':
-        checkers_discounts = scrape_checkers()
-        all_discounts.extend(checkers_discounts)
-    elif location.lower() == 'london':
-        tesco_discounts = scrape_tesco()
-        all_discounts.extend(tesco_discounts)
+    ``on_discount`` is called (possibly from several threads) with each
+    filtered, de-duplicated discount as soon as it is available. Live
+    scrapes replace the store's rows in ``store`` (a ``DiscountStore``).
+    """
+    filters = {
+        'categories': sorted(c.lower() for c in categories or []),
+        'min_price': min_price,
+        'max_price': max_price,
+    }
+    adapters = select_adapters(location, stores)
+    if not adapters:
+        return [], []
+    
+    all_discounts = []
+    cache_info = []
+    executor = ThreadPoolExecutor(max_workers=min(len(adapters), MAX_STORE_WORKERS))
+    started = time.monotonic()
+    limits = [adapter.timeout if deadline is None else min(adapter.timeout, deadline) for adapter in adapters]
+    # Stores get a slightly shorter deadline than we wait for, so they can
+    # hand back partial results before we give up on them
+    futures = [
+        executor.submit(
+            _store_result, adapter, location, filters, pool, mode, cache, refresh, on_discount, store,
+            Deadline(limit - DEADLINE_MARGIN),
+        )
+        for adapter, limit in zip(adapters, limits)
+    ]
+    try:
+        for adapter, limit, future in zip(adapters, limits, futures):
+            remaining = limit - (time.monotonic() - started)
+            try:
+                discounts, info = future.result(timeout=max(remaining, 0))
+            except FuturesTimeout:
+                # The store's breaker hears how the scrape went from the
+                # worker itself once it finishes, not from us giving up on it
+                print(f"{adapter.name} scrape timed out after {limit:.0f}s", file=sys.stderr)
+                discounts, info = [], {'status': 'timeout', 'age': None, 'partial': True}
+            except Exception as e:
+                print(f"Error scraping {adapter.name}: {str(e)}", file=sys.stderr)
+                discounts, info = [], {'status': 'error', 'age': None}
+            cache_info.append(dict(info, store=adapter.key))
+            all_discounts.extend(discounts)
+    finally:
+        # Don't block on stores that blew their timeout
+        executor.shutdown(wait=False, cancel_futures=True)
     
-    return all_discounts
+    return all_discounts, cache_info
+
+def main(location, pool=None, mode=None):
+    """Scrape all discounts for a location, bypassing the cache."""
+    discounts, _ = scrape_location(location, pool=pool, mode=mode)
+    return discounts
+
+def _csv(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1:
-        location = sys.argv[1]
-    else:
-        location = 'london'  # default location
+    import argparse
     
-    discounts = main(location)
+    parser = argparse.ArgumentParser(description='Scrape grocery discounts for a location.')
+    parser.add_argument('location', nargs='?', default='london')
+    parser.add_argument('--mode', choices=['auto', 'http', 'browser'], default=None,
+                        help='HTTP-first with browser fallback (auto), or force one path')
+    parser.add_argument('--stores', type=_csv, default=None, help='comma-separated store names')
+    parser.add_argument('--categories', type=_csv, default=None, help='comma-separated categories')
+    parser.add_argument('--min-price', type=float, default=None)
+    parser.add_argument('--max-price', type=float, default=None)
+    parser.add_argument('--ttl', type=float, default=None, help='cache TTL in seconds')
+    parser.add_argument('--no-cache', action='store_true', help='always scrape live')
+    parser.add_argument('--refresh', action='store_true', help='re-scrape and update the cache only')
+    parser.add_argument('--deadline', type=float, default=None,
+                        help='seconds to return within, with whatever each store has found by then')
+    parser.add_argument('--no-store', action='store_true', help="don't record live scrapes in the SQLite store")
+    parser.add_argument('--output', default=None,
+                        help='file to save the result to (default: .scraper/output/<location>.json)')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help='one result line at the end (json) or a record per product as found (ndjson)')
+    parser.add_argument('--metrics', default=None,
+                        help="where per-store metrics records go: 'stderr', a file path or 'off' (default: SCRAPE_METRICS)")
+    parser.add_argument('--snapshots', action='store_true',
+                        help='save the scraped pages to the snapshot archive (see page_archive; default: SCRAPE_SNAPSHOTS)')
+    parser.add_argument('--profile-cpu', choices=['cprofile', 'sample'], default=None,
+                        help='profile the scrape with cProfile or a stack sampler; summary on stderr')
+    parser.add_argument('--profile-out', default=None,
+                        help='also save the raw profile (pstats file, or collapsed stacks when sampling)')
+    args = parser.parse_args()
     
-    # Save discounts to file
-    with open('discounts.json', 'w') as f:
-        json.dump(discounts, f, indent=2)
+    if args.metrics:
+        # Exported so background refreshes report to the same place
+        os.environ['SCRAPE_METRICS'] = args.metrics
+    if args.snapshots:
+        os.environ['SCRAPE_SNAPSHOTS'] = 'on'
+    
+    # Browsers left behind by scraper runs that died
+    reap_orphans()
+    
+    writer = NdjsonWriter.for_stream(sys.stdout) if args.format == 'ndjson' and not args.refresh else None
+    cache = None if args.no_cache else DiscountCache(ttl=args.ttl)
+    try:
+        with profiling(args.profile_cpu, args.profile_out):
+            discounts, cache_info = scrape_location(
+                args.location,
+                mode=args.mode,
+                stores=args.stores,
+                categories=args.categories,
+                min_price=args.min_price,
+                max_price=args.max_price,
+                cache=cache,
+                refresh=args.refresh,
+                on_discount=writer.discount if writer else None,
+                store=None if args.no_store else DiscountStore(),
+                deadline=args.deadline,
+            )
+    except Exception as e:
+        if writer is None:
+            raise
+        writer.summary(ok=False, error=str(e))
+        sys.exit(1)
+    
+    if args.refresh:
+        sys.exit(0)
+    
+    records = [d.to_dict() for d in discounts]
+    partial = any(info.get('partial') for info in cache_info)
+    matches = match_groups(discounts)
+    
+    # Save the result for this location; written atomically so concurrent
+    # runs for the same or other locations never read a half-written file
+    output = args.output or location_output_path(args.location)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    write_json_atomic(output, {
+        'location': args.location, 'written': time.time(), 'partial': partial, 'discounts': records,
+        'matches': matches,
+    })
+    
+    if writer:
+        writer.summary(cache=cache_info, partial=partial, matches=matches)
+    else:
+        # Final stdout line is the machine-readable result
+        print(json.dumps(
+            {'discounts': records, 'cache': cache_info, 'partial': partial, 'matches': matches},
+            separators=(',', ':'),
+        ))
+    sys.stdout.flush()
     
-    # Also print for debugging
-    print(json.dumps(discounts, indent=2)) 
\ No newline at end of file
+    # A store that blew its timeout may still be running in a worker thread;
+    # its result is no longer wanted, so don't wait for it at exit
+    if any(info['status'] == 'timeout' for info in cache_info):
+        os._exit(0)
@@ -0,0 +1,291 @@
+"""Structured timing and counters for store scrapes, plus optional profiling.
+
+Each store scrape gets a ``ScrapeMetrics`` that is made active for its
+worker thread, so the scrapers, the scroll harvester and the HTTP path
+record into it through ``current_metrics()`` without threading it through
+every call. When the scrape ends, one JSON record is emitted::
+
+    {"type":"metrics","store":"checkers","mode":"browser","elapsed":21.4,
+     "phases":{"driver_setup":{"seconds":1.9,"count":1},...},
+     "counters":{"cards_seen":212,"skipped.duplicate":12,"webdriver_calls":57,...},
+     "peaks":{"driver_rss_mb":412.5}}
+
+Records go to stderr by default. Set ``SCRAPE_METRICS`` to a file path to
+append them there as JSON lines instead, or to ``off`` to disable them.
+
+``profiling('cprofile')`` runs cProfile in the store workers and prints
+the merged stats. Only one cProfile can be active in a process at a time
+(Python 3.12+ refuses a second), so concurrent workers take turns: a
+worker that starts while another is profiled runs unprofiled and is
+reported as skipped. ``profiling('sample')`` samples all threads' stacks
+instead, which also shows time spent blocked on the browser.
+"""
+from collections import Counter
+from contextlib import contextmanager
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+_active = threading.local()
+_emit_lock = threading.Lock()
+
+
+class ScrapeMetrics:
+    def __init__(self, store=None, **tags):
+        self.tags = dict(store=store, **tags)
+        self.phases = {}
+        self.counters = Counter()
+        self.peaks = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def add_phase(self, name, seconds, count=1):
+        with self._lock:
+            total, calls = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, calls + count)
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as one occurrence of phase ``name``."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.monotonic() - started)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def peak(self, name, value):
+        """Keep the highest ``value`` seen for gauge ``name`` (e.g. memory)."""
+        with self._lock:
+            if value > self.peaks.get(name, value - 1):
+                self.peaks[name] = value
+
+    def skip(self, reason, n=1):
+        """Count products dropped for ``reason``."""
+        if n:
+            self.count(f'skipped.{reason}', n)
+
+    def merge_readiness(self, ready):
+        """Fold a ``PageReadiness``'s wait timings and network counters in."""
+        for name, (total, calls) in ready.timings.items():
+            self.add_phase(name, total, calls)
+        for name, value in ready.network.items():
+            self.count(f'network.{name}', value)
+
+    @contextmanager
+    def watch_driver(self, driver):
+        """Count every WebDriver command ``driver`` sends while inside."""
+        previous = driver.__dict__.get('execute')
+        execute = driver.execute
+
+        def counted(command, params=None):
+            self.count('webdriver_calls')
+            self.count(f'webdriver.{command}')
+            return execute(command, params)
+
+        driver.execute = counted
+        try:
+            yield driver
+        finally:
+            if previous is None:
+                del driver.execute
+            else:
+                driver.execute = previous
+
+    @contextmanager
+    def active(self):
+        """Make these the metrics ``current_metrics()`` returns on this thread."""
+        previous = getattr(_active, 'metrics', None)
+        _active.metrics = self
+        try:
+            yield self
+        finally:
+            _active.metrics = previous
+
+    def to_dict(self):
+        record = {'type': 'metrics'}
+        record.update(self.tags)
+        record['elapsed'] = round(time.monotonic() - self._started, 3)
+        record['phases'] = {
+            name: {'seconds': round(total, 3), 'count': calls}
+            for name, (total, calls) in self.phases.items()
+        }
+        record['counters'] = dict(sorted(self.counters.items()))
+        if self.peaks:
+            record['peaks'] = dict(sorted(self.peaks.items()))
+        return record
+
+
+def current_metrics():
+    """The active metrics for this thread, or a throwaway instance."""
+    return getattr(_active, 'metrics', None) or ScrapeMetrics()
+
+
+def emit_metrics(metrics):
+    """Write a metrics record to ``SCRAPE_METRICS`` (default: stderr)."""
+    destination = os.environ.get('SCRAPE_METRICS', 'stderr')
+    if destination.lower() in ('off', '0', 'none', ''):
+        return
+    line = json.dumps(metrics.to_dict(), separators=(',', ':'))
+    with _emit_lock:
+        if destination in ('stderr', '-'):
+            print(f"Scrape metrics: {line}", file=sys.stderr)
+        else:
+            with open(destination, 'a') as f:
+                f.write(line + '\n')
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval.
+
+    Unlike cProfile this sees time spent waiting on the browser, and it
+    covers the store worker threads with no per-call overhead.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, limit=25):
+        """Most-sampled frames: ``(inclusive samples, self samples, frame)``."""
+        inclusive = Counter()
+        own = Counter()
+        for stack, hits in self.stacks.items():
+            for frame in set(stack):
+                inclusive[frame] += hits
+            own[stack[-1]] += hits
+        return [(hits, own[frame], frame) for frame, hits in inclusive.most_common(limit)]
+
+    def write_collapsed(self, path):
+        """Write stacks in the collapsed format flame graph tools read."""
+        with open(path, 'w') as f:
+            for stack, hits in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {hits}\n")
+
+
+class _CProfileRun:
+    """Profiles collected during one ``profiling('cprofile')`` block."""
+
+    def __init__(self):
+        self.profiles = []
+        self.skipped = 0
+        # Held by the one thread being profiled
+        self.active = threading.Lock()
+        self._lock = threading.Lock()
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+
+_cprofile_run = None
+
+
+@contextmanager
+def profile_thread():
+    """Run cProfile on this thread while ``profiling('cprofile')`` is on.
+
+    If another thread is already being profiled, runs unprofiled.
+    """
+    run = _cprofile_run
+    if run is None:
+        yield
+        return
+    if not run.active.acquire(blocking=False):
+        run.skip()
+        yield
+        return
+    try:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Some other profiler is already running in this process
+            profile = None
+            run.skip()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                run.profiles.append(profile)
+    finally:
+        run.active.release()
+
+
+@contextmanager
+def profiling(kind, output=None, limit=25):
+    """Profile the enclosed block with ``cprofile`` or ``sample`` (or ``None``).
+
+    A summary goes to stderr; ``output`` also keeps the raw data (pstats
+    file for cProfile, collapsed stacks for the sampler).
+    """
+    global _cprofile_run
+    if kind == 'cprofile':
+        # The calling thread only waits on the store workers; they are
+        # what gets profiled (see ``profile_thread``)
+        _cprofile_run = run = _CProfileRun()
+        try:
+            yield
+        finally:
+            _cprofile_run = None
+            profiled = len(run.profiles)
+            if run.skipped:
+                print(f"cProfile covered {profiled} of {profiled + run.skipped} store workers, one at a time; "
+                      f"use the sampling profiler (--profile-cpu sample) to see them all", file=sys.stderr)
+            if profiled:
+                stats = pstats.Stats(run.profiles[0], stream=io.StringIO())
+                for profile in run.profiles[1:]:
+                    stats.add(profile)
+                if output:
+                    stats.dump_stats(output)
+                stream = io.StringIO()
+                stats.stream = stream
+                stats.sort_stats('cumulative').print_stats(limit)
+                print(stream.getvalue(), file=sys.stderr)
+    elif kind == 'sample':
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            if output:
+                profiler.write_collapsed(output)
+            print(f"Sampled {profiler.samples} times every {profiler.interval * 1000:.0f}ms:", file=sys.stderr)
+            for inclusive, own, frame in profiler.report(limit):
+                print(f"{inclusive:>8} {own:>8}  {frame}", file=sys.stderr)
+    else:
+        yield
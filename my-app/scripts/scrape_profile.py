@@ -0,0 +1,90 @@
+"""Lightweight browser profile for scraping.
+
+We only read text out of product cards, so the ``light`` profile (the
+default) stops Chrome from fetching what the cards don't need: images,
+media and web fonts are dropped with CDP ``Network.setBlockedURLs``, as are
+known analytics and ad domains. Image loading is also switched off in the
+browser prefs, and Chrome gets a set of memory-saving flags.
+
+``SCRAPE_PROFILE=full`` loads pages as a normal browser would. Extra
+comma-separated URL patterns (``*`` wildcards) can be blocked with
+``SCRAPE_BLOCK_URLS``. ``bench_profile.py`` compares the two profiles.
+
+V8's heap is left uncapped: infinite-scroll pages hold every loaded
+product in JS, and a renderer that hits the cap crashes with a generic
+WebDriver error rather than anything that reads as memory. Driver memory is
+policed from outside instead (see ``driver_governor``). ``SCRAPE_JS_HEAP_MB``
+still caps it for experiments; no cap size has been measured against the
+live store pages.
+"""
+import os
+
+PROFILES = ('light', 'full')
+
+BLOCKED_RESOURCE_PATTERNS = [
+    # Images
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*.bmp',
+    # Media
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3', '*.ogg',
+    # Web fonts
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+]
+
+BLOCKED_TRACKER_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*googleadservices.com*',
+    '*doubleclick.net*', '*googlesyndication.com*', '*adservice.google.*',
+    '*facebook.net*', '*connect.facebook.com*', '*hotjar.com*', '*clarity.ms*',
+    '*nr-data.net*', '*newrelic.com*', '*criteo.com*', '*criteo.net*',
+    '*analytics.tiktok.com*', '*bat.bing.com*', '*scorecardresearch.com*',
+    '*adobedtm.com*', '*omtrdc.net*', '*demdex.net*', '*quantummetric.com*',
+]
+
+# Flags that trim a headless scraping browser's memory and background work
+LIGHT_FLAGS = [
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication',
+    '--mute-audio',
+    '--no-first-run',
+    '--blink-settings=imagesEnabled=false',
+    '--disk-cache-size=33554432',
+]
+
+
+def profile_name(profile=None):
+    """The profile to use: ``profile``, else ``SCRAPE_PROFILE``, else ``light``."""
+    name = (profile or os.environ.get('SCRAPE_PROFILE') or 'light').lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown scrape profile: {name}")
+    return name
+
+
+def blocked_url_patterns():
+    extra = [p.strip() for p in os.environ.get('SCRAPE_BLOCK_URLS', '').split(',') if p.strip()]
+    return BLOCKED_RESOURCE_PATTERNS + BLOCKED_TRACKER_PATTERNS + extra
+
+
+def apply_options(options, profile=None):
+    """Add the profile's Chrome flags and prefs to ``options``."""
+    if profile_name(profile) != 'light':
+        return
+    for flag in LIGHT_FLAGS:
+        options.add_argument(flag)
+    heap_mb = os.environ.get('SCRAPE_JS_HEAP_MB')
+    if heap_mb:
+        options.add_argument(f"--js-flags=--max-old-space-size={int(heap_mb)}")
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+    })
+
+
+def apply_blocking(driver, profile=None):
+    """Install the profile's URL blocklist on a started driver."""
+    if profile_name(profile) != 'light':
+        return
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_url_patterns()})
@@ -0,0 +1,405 @@
+"""Long-lived scraper service with a warm pool of Chrome drivers.
+
+Run ``python3 scripts/scraper_daemon.py`` to listen on a unix socket (see
+``scraper_paths.daemon_socket_path``), or ``--stdio`` to serve requests over
+stdin/stdout. Each request is one JSON line, e.g.::
+
+    {"id": 1, "op": "scrape", "location": "london", "categories": ["dairy"]}
+
+and is answered with the same NDJSON records as ``scrape_discounts.py
+--format ndjson`` (see ``ndjson_stream``), each tagged with the request id::
+
+    {"id": 1, "type": "discount", "discount": {...}}
+    ...
+    {"id": 1, "type": "summary", "ok": true, "count": 42, "cache": [...]}
+
+Optional request fields mirror the scraper CLI: ``stores``,
+``categories``, ``min_price``, ``max_price``, ``no_cache`` and
+``deadline`` (seconds; the summary then says whether it is ``partial``).
+The summary also lists ``matches``, the same product listed by several
+stores (see ``product_matching``).
+
+``{"op": "query", ...}`` answers from the stored rows without scraping,
+exactly like ``query_discounts.py`` (same filters plus ``max_age``,
+``history_days`` and ``no_record``), but without starting a Python
+process per request.
+
+Drivers are created with ``setup_driver`` (same mobile emulation and
+anti-detection setup as one-off runs), leased per scrape, health-checked
+before reuse and recycled after ``--max-uses`` scrapes, on failure, or when
+its process tree outgrows ``SCRAPE_MAX_DRIVER_RSS_MB`` (see
+``driver_governor``). Orphaned browsers from earlier runs are reaped at
+start-up and with every idle health check. Each driver runs on one of the
+persistent ``pool-N`` browser profiles (see ``browser_profiles``), so
+consent cookies and cached assets outlive it.
+"""
+from contextlib import contextmanager
+import argparse
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+
+from browser_profiles import BrowserProfiles
+from discount_cache import DiscountCache
+from discount_store import DiscountStore
+from driver_governor import over_memory, quit_driver, reap_orphans
+from ndjson_stream import NdjsonWriter
+from proc_stats import driver_rss_bytes
+from product_matching import match_groups
+from query_discounts import query_location
+from scrape_discounts import setup_driver, scrape_location
+from scrape_metrics import current_metrics
+from scraper_paths import daemon_socket_path
+
+
+class DriverPool:
+    """Bounded pool of pre-initialised WebDriver instances.
+
+    At most ``size`` drivers are live at once, counting idle, leased and
+    starting ones. A lease that finds none idle starts one only while there
+    is room, and otherwise waits for one to come back (e.g. from
+    ``check_idle``, which holds the idle drivers while it checks them).
+    """
+
+    def __init__(self, size=2, max_uses=20, lease_timeout=120, factory=setup_driver, profiles=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self._factory = factory
+        # Persistent browser profiles (``BrowserProfiles``), one per live driver
+        self._profiles = profiles
+        self._profile_leases = {}
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._live = {}
+        self._lock = threading.Lock()
+        # Signalled whenever a driver goes idle or stops being live
+        self._changed = threading.Condition(self._lock)
+        self._starting = 0
+        self._closed = False
+
+    def warm(self):
+        """Start drivers until the pool holds ``size`` live ones."""
+        while True:
+            with self._lock:
+                if self._closed or not self._has_room():
+                    return
+                self._starting += 1
+            try:
+                self._put_idle(self._new_driver())
+            except Exception as e:
+                print(f"Error starting pooled driver: {str(e)}", file=sys.stderr)
+                return
+
+    @contextmanager
+    def lease(self):
+        """Lease a healthy driver for the duration of one scrape."""
+        if not self._slots.acquire(timeout=self.lease_timeout):
+            raise TimeoutError('Timed out waiting for a free driver')
+        driver = None
+        healthy = False
+        try:
+            driver = self._checkout()
+            yield driver
+            healthy = True
+        finally:
+            if driver is not None:
+                self._checkin(driver, healthy)
+            self._slots.release()
+
+    def check_idle(self):
+        """Health-check idle drivers, replacing any that died or outgrew the memory limit."""
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for driver in checked:
+            if not self._is_healthy(driver):
+                self._discard(driver, reset_profile=True)
+            elif over_memory(driver):
+                print("Recycling idle driver over the memory limit", file=sys.stderr)
+                self._discard(driver)
+            else:
+                self._put_idle(driver)
+        self.warm()
+
+    def rss_bytes(self):
+        """Memory held by every live driver's process tree, idle or leased."""
+        with self._lock:
+            drivers = list(self._live.values())
+        return sum(driver_rss_bytes(driver) or 0 for driver in drivers)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._changed.notify_all()
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def _has_room(self):
+        """Whether another driver may start. Call with the lock held."""
+        return len(self._live) + self._starting < self.size
+
+    def _put_idle(self, driver):
+        with self._lock:
+            self._idle.put(driver)
+            self._changed.notify_all()
+
+    def _new_driver(self):
+        """Start a driver in a slot already counted in ``_starting``."""
+        try:
+            if self._profiles is None:
+                driver = self._factory()
+                profile = None
+            else:
+                profile = self._profiles.acquire('pool')
+                try:
+                    driver = self._factory(user_data_dir=profile.path)
+                except Exception:
+                    profile.release(reset=True)
+                    raise
+        except Exception:
+            with self._lock:
+                self._starting -= 1
+                self._changed.notify_all()
+            raise
+        with self._lock:
+            self._starting -= 1
+            self._uses[id(driver)] = 0
+            self._live[id(driver)] = driver
+            if profile is not None:
+                self._profile_leases[id(driver)] = profile
+        return driver
+
+    def _checkout(self):
+        give_up = time.monotonic() + self.lease_timeout
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+            if driver is not None:
+                if self._is_healthy(driver):
+                    return driver
+                self._discard(driver, reset_profile=True)
+                continue
+            with self._changed:
+                # Drivers go idle under the lock, so none can be missed here
+                if not self._idle.empty():
+                    continue
+                if self._has_room():
+                    self._starting += 1
+                    break
+                remaining = give_up - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError('Timed out waiting for a free driver')
+                self._changed.wait(remaining)
+        return self._new_driver()
+
+    def _checkin(self, driver, healthy):
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+        if self._closed or not healthy or uses >= self.max_uses:
+            self._discard(driver, reset_profile=not healthy)
+            return
+        if over_memory(driver):
+            print(f"Recycling driver over the memory limit after {uses} scrapes", file=sys.stderr)
+            current_metrics().count('driver_recycled.memory')
+            self._discard(driver)
+            return
+        try:
+            # Drop page state so the next lease starts from a clean tab. A
+            # driver on a persistent profile keeps its cookies: the consent
+            # cookies are what the profile is for
+            driver.get('about:blank')
+            if id(driver) not in self._profile_leases:
+                driver.delete_all_cookies()
+        except Exception:
+            self._discard(driver, reset_profile=True)
+            return
+        self._put_idle(driver)
+
+    def _is_healthy(self, driver):
+        try:
+            return driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    def _discard(self, driver, reset_profile=False):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._live.pop(id(driver), None)
+            profile = self._profile_leases.pop(id(driver), None)
+            self._changed.notify_all()
+        quit_driver(driver)
+        if profile is not None:
+            profile.release(reset=reset_profile)
+
+
+def handle_request(pool, request, writer):
+    """Serve a decoded request, streaming its records through ``writer``."""
+    op = request.get('op', 'scrape')
+    try:
+        if op == 'ping':
+            writer.summary(pool_size=pool.size, rss_mb=round(pool.rss_bytes() / (1024 * 1024), 1))
+        elif op == 'scrape':
+            location = request.get('location') or 'london'
+            discounts, cache_info = scrape_location(
+                location,
+                pool=pool,
+                stores=request.get('stores'),
+                categories=request.get('categories'),
+                min_price=request.get('min_price'),
+                max_price=request.get('max_price'),
+                cache=None if request.get('no_cache') else DiscountCache(),
+                store=DiscountStore(),
+                on_discount=writer.discount,
+                deadline=request.get('deadline'),
+            )
+            writer.summary(
+                cache=cache_info,
+                partial=any(info.get('partial') for info in cache_info),
+                matches=match_groups(discounts),
+            )
+        elif op == 'query':
+            writer.summary(**query_location(
+                request.get('location') or 'london',
+                writer,
+                stores=request.get('stores'),
+                categories=request.get('categories'),
+                min_price=request.get('min_price'),
+                max_price=request.get('max_price'),
+                max_age=request.get('max_age'),
+                history_days=request.get('history_days'),
+                record=not request.get('no_record'),
+            ))
+        else:
+            writer.summary(ok=False, error=f"Unknown op: {op}")
+    except Exception as e:
+        writer.summary(ok=False, error=str(e))
+
+
+def _decode_request(line, writer_for):
+    """Parse a request line; replies with an error summary if it is invalid."""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        writer_for(None).summary(ok=False, error=f"Invalid request: {str(e)}")
+        return None
+
+
+class ScrapeRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def write_line(line):
+            self.wfile.write((line + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+        def writer_for(request_id):
+            return NdjsonWriter(write_line, id=request_id)
+
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request = _decode_request(line, writer_for)
+            if request is not None:
+                handle_request(self.server.pool, request, writer_for(request.get('id')))
+
+
+class ScrapeServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool):
+        self.pool = pool
+        super().__init__(socket_path, ScrapeRequestHandler)
+
+
+def serve_stdio(pool):
+    """Serve newline-delimited requests from stdin, replying on stdout."""
+    out = sys.stdout
+    # Scrapers print progress; keep it off the response channel
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+    workers = []
+
+    def write_line(line):
+        # Records from concurrent requests interleave, whole lines at a time
+        with write_lock:
+            out.write(line + '\n')
+            out.flush()
+
+    def writer_for(request_id):
+        return NdjsonWriter(write_line, id=request_id)
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = _decode_request(line, writer_for)
+        if request is None:
+            continue
+        worker = threading.Thread(
+            target=handle_request,
+            args=(pool, request, writer_for(request.get('id'))),
+            daemon=True,
+        )
+        worker.start()
+        workers.append(worker)
+
+    # Finish in-flight scrapes once the client closes stdin
+    for worker in workers:
+        worker.join()
+
+
+def _maintain(pool, interval):
+    while True:
+        time.sleep(interval)
+        pool.check_idle()
+        reap_orphans()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the discount scraper as a long-lived service.')
+    parser.add_argument('--socket', default=None, help='unix socket path to listen on')
+    parser.add_argument('--stdio', action='store_true', help='serve requests over stdin/stdout')
+    parser.add_argument('--pool-size', type=int, default=2)
+    parser.add_argument('--max-uses', type=int, default=20, help='scrapes per driver before recycling')
+    parser.add_argument('--health-interval', type=float, default=60, help='seconds between idle health checks')
+    args = parser.parse_args()
+
+    pool = DriverPool(
+        size=args.pool_size,
+        max_uses=args.max_uses,
+        # A profile slot per pooled driver, unless SCRAPE_PROFILE_SLOTS says otherwise
+        profiles=BrowserProfiles(slots=None if 'SCRAPE_PROFILE_SLOTS' in os.environ else args.pool_size),
+    )
+    reap_orphans()
+    pool.warm()
+    threading.Thread(target=_maintain, args=(pool, args.health_interval), daemon=True).start()
+
+    socket_path = None
+    try:
+        if args.stdio:
+            serve_stdio(pool)
+        else:
+            socket_path = args.socket or daemon_socket_path()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            with ScrapeServer(socket_path, pool) as server:
+                print(f"Scraper daemon listening on {socket_path}", file=sys.stderr)
+                server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
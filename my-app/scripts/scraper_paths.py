@@ -0,0 +1,29 @@
+"""Filesystem locations shared by the discount scraper scripts."""
+import os
+import re
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPTS_DIR)
+
+
+def data_dir(*parts):
+    """Return a directory under the scraper data dir, creating it if needed."""
+    base = os.environ.get('SCRAPER_DATA_DIR') or os.path.join(APP_DIR, '.scraper')
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def daemon_socket_path():
+    """Unix socket the scraper daemon listens on."""
+    return os.environ.get('SCRAPER_SOCKET') or os.path.join(data_dir(), 'scraper.sock')
+
+
+def location_slug(location):
+    """Filesystem-safe name for a location, e.g. ``cape-town``."""
+    return re.sub(r'[^a-z0-9]+', '-', location.strip().lower()).strip('-') or 'default'
+
+
+def location_output_path(location):
+    """Where the scraper CLI saves its last result for ``location``."""
+    return os.path.join(data_dir('output'), f"{location_slug(location)}.json")
@@ -0,0 +1,139 @@
+"""In-page card extraction and an adaptive infinite-scroll harvester.
+
+``harvest_cards`` alternates "extract the cards that appeared since the last
+pass" and "scroll to the bottom and wait for the card count to settle",
+until a pass turns up no new cards or a product/time cap is reached. Cards
+are tagged in the DOM once extracted, so each pass only pays for the new
+ones, and duplicates are dropped incrementally with a ``(title, price)`` set.
+
+Caps default to ``SCRAPE_MAX_PRODUCTS`` (1000) products and
+``SCRAPE_MAX_SCROLL_SECONDS`` (60) seconds, the latter cut short by the
+scrape's deadline. Scrolling also stops once the browser outgrows its
+memory limit (see ``driver_governor``), keeping what was found so far.
+Measuring that walks ``/proc``, so it is done at most every
+``SCRAPE_MEMORY_CHECK_SECONDS`` (5) seconds rather than on every pass.
+"""
+import os
+import sys
+import time
+
+from category_classifier import assign_categories
+from driver_governor import over_memory
+from scrape_deadline import current_deadline
+from scrape_metrics import current_metrics
+
+# Runs in the page and returns one compact row per product card. Each field
+# is a CSS selector (text of the first match, or null) or a list of
+# selectors (one text-or-null per selector, for stores with price fallbacks).
+# With ``onlyNew`` set, cards extracted by an earlier call are skipped.
+EXTRACT_CARDS_JS = '''
+    const cardSelector = arguments[0];
+    const fields = arguments[1];
+    const onlyNew = arguments[2];
+    const textOf = (card, selector) => {
+        const el = selector ? card.querySelector(selector) : null;
+        return el ? el.innerText.trim() : null;
+    };
+    let cards = Array.from(document.querySelectorAll(cardSelector));
+    if (onlyNew) {
+        cards = cards.filter(card => !card.hasAttribute('data-scraped'));
+        cards.forEach(card => card.setAttribute('data-scraped', ''));
+    }
+    return cards.map(card =>
+        fields.map(field => Array.isArray(field)
+            ? field.map(selector => textOf(card, selector))
+            : textOf(card, field))
+    );
+'''
+
+SCROLL_JS = "window.scrollTo(0, document.body.scrollHeight);"
+
+MAX_PRODUCTS = int(os.environ.get('SCRAPE_MAX_PRODUCTS', '1000'))
+MAX_SCROLL_SECONDS = float(os.environ.get('SCRAPE_MAX_SCROLL_SECONDS', '60'))
+MEMORY_CHECK_SECONDS = float(os.environ.get('SCRAPE_MEMORY_CHECK_SECONDS', '5'))
+
+
+def extract_cards(driver, card_selector, fields, only_new=False):
+    """Extract field text for every (new) card on the page in one script call."""
+    return driver.execute_script(EXTRACT_CARDS_JS, card_selector, fields, only_new) or []
+
+
+def harvest_cards(driver, ready, card_selector, fields, parse_card, store_name,
+                  on_discount=None, seen=None, max_products=None, max_seconds=None,
+                  idle_passes=2, found=None):
+    """Scroll and extract until the page stops producing new cards.
+
+    ``seen`` is the ``(title, price)`` set used for de-duplication; pass the
+    same set across retries of one scrape. New discounts are appended to
+    ``found`` as they are parsed, so the caller keeps them even if a later
+    pass raises. Returns ``(discounts, stats)`` where ``stats`` has the pass
+    count, cards extracted and stop reason.
+    """
+    max_products = max_products or MAX_PRODUCTS
+    deadline = current_deadline()
+    max_seconds = deadline.cap(max_seconds or MAX_SCROLL_SECONDS)
+    seen = set() if seen is None else seen
+    metrics = current_metrics()
+    discounts = [] if found is None else found
+    stats = {'passes': 0, 'cards': 0, 'stop': 'no_new_cards'}
+    started = time.monotonic()
+    next_memory_check = started + MEMORY_CHECK_SECONDS
+    idle = 0
+
+    while True:
+        with metrics.phase('extract'):
+            rows = extract_cards(driver, card_selector, fields, only_new=True)
+        stats['passes'] += 1
+        stats['cards'] += len(rows)
+        metrics.count('cards_seen', len(rows))
+
+        with metrics.phase('parse'):
+            parsed = []
+            for row in rows:
+                try:
+                    discount = parse_card(row)
+                except Exception as e:
+                    print(f"Error processing {store_name} product: {str(e)}", file=sys.stderr)
+                    metrics.skip('parse_error')
+                    continue
+                if discount:
+                    parsed.append(discount)
+                else:
+                    metrics.skip('missing_title_or_price')
+        with metrics.phase('classify'):
+            assign_categories(parsed)
+
+        with metrics.phase('dedupe'):
+            for discount in parsed:
+                key = discount.dedupe_key
+                if key in seen:
+                    metrics.skip('duplicate')
+                    continue
+                seen.add(key)
+                discounts.append(discount)
+                if on_discount:
+                    on_discount(discount)
+
+        if len(discounts) >= max_products:
+            stats['stop'] = 'product_cap'
+            break
+        if time.monotonic() - started >= max_seconds:
+            stats['stop'] = 'deadline' if deadline.expired else 'time_cap'
+            break
+        if time.monotonic() >= next_memory_check:
+            next_memory_check = time.monotonic() + MEMORY_CHECK_SECONDS
+            if over_memory(driver):
+                stats['stop'] = 'memory'
+                metrics.count('memory_stops')
+                break
+        idle = idle + 1 if not rows else 0
+        if idle >= idle_passes:
+            break
+
+        with metrics.phase('scroll'):
+            driver.execute_script(SCROLL_JS)
+            ready.stable_count(card_selector, timeout=10)
+            ready.jitter()
+
+    metrics.tags['harvest_stop'] = stats['stop']
+    return discounts, stats
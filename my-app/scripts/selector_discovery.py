@@ -0,0 +1,182 @@
+"""Find, remember and re-check the selector that matches a store's product cards.
+
+Each store lists candidate card selectors, best first (e.g.
+``store_parsing.CHECKERS_CARD_CANDIDATES``). ``resolve_card_selector``
+scores every candidate in one in-page script: how many elements it
+matches and what share of the first ``SAMPLE_CARDS`` of them have both a
+title and a price under the store's field selectors. Candidates where at
+least ``MIN_COMPLETE`` of the sampled cards are complete are eligible, and
+the first eligible one wins; the script stops there. Order matters rather
+than match count because the broad fallbacks at the end of each list
+(``[class*='product']``, ``article``) also match wrappers and nested parts
+of cards: they would otherwise outnumber the precise card selector and
+count each card more than once. The script is re-run while the page
+loads, in place of a ``WebDriverWait`` per selector.
+
+The winner is saved per store and fetch mode in
+``.scraper/selectors/<store>-<mode>.json``. Later runs check that selector
+first, and the script stops there while it still finds complete cards.
+The candidates are only raced again once the saved selector stops matching
+while another one does, or when it is no longer a candidate. Pages fetched
+over HTTP go through the same check with ``resolve_card_selector_html``.
+They are kept apart from the browser's winner (mode ``http`` vs
+``browser``): the HTTP fetch sends a desktop user agent while the browser
+is mobile, so the two can be served different markup, and sharing one
+entry would make each path evict the other's selector.
+"""
+import json
+import os
+import sys
+import time
+
+from selenium.common.exceptions import TimeoutException
+
+from discount_cache import write_json_atomic
+from html_cards import select_all, select_one
+from scrape_deadline import current_deadline
+from scrape_metrics import current_metrics
+from scraper_paths import data_dir
+from store_parsing import TITLE, PRICE
+
+# Cards per candidate checked for a title and price
+SAMPLE_CARDS = 20
+# Share of sampled cards that must be complete for a candidate to count
+MIN_COMPLETE = 0.5
+# Seconds between checks while waiting for the cards to render
+POLL_INTERVAL = 0.5
+
+# Scores each candidate selector as [matches, complete share of the sample],
+# stopping after the first eligible one.
+RACE_SELECTORS_JS = '''
+    const candidates = arguments[0];
+    const fields = arguments[1];
+    const required = arguments[2];
+    const sample = arguments[3];
+    const minComplete = arguments[4];
+    const filled = (card, field) => (Array.isArray(field) ? field : [field]).some(selector => {
+        const el = selector ? card.querySelector(selector) : null;
+        return Boolean(el && el.innerText.trim());
+    });
+    const scores = [];
+    for (const selector of candidates) {
+        let cards;
+        try {
+            cards = document.querySelectorAll(selector);
+        } catch (e) {
+            scores.push([0, 0]);
+            continue;
+        }
+        const checked = Array.from(cards).slice(0, sample);
+        const complete = checked.filter(card => required.every(i => filled(card, fields[i]))).length;
+        const share = checked.length ? complete / checked.length : 0;
+        scores.push([cards.length, share]);
+        if (cards.length && share >= minComplete) {
+            break;
+        }
+    }
+    return scores;
+'''
+
+
+class SelectorCache:
+    def __init__(self, directory=None):
+        self.directory = directory or data_dir('selectors')
+
+    def _path(self, store, mode):
+        return os.path.join(self.directory, f"{store}-{mode}.json")
+
+    def get(self, store, mode):
+        try:
+            with open(self._path(store, mode)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, store, mode, selector, cards):
+        write_json_atomic(self._path(store, mode), {'selector': selector, 'cards': cards, 'discovered': time.time()})
+
+
+def _eligible(score):
+    return score[0] > 0 and score[1] >= MIN_COMPLETE
+
+
+def _first_eligible(candidates, scores):
+    """``(selector, complete cards)`` of the first eligible candidate, or ``(None, 0)``."""
+    for selector, score in zip(candidates, scores):
+        if _eligible(score):
+            return selector, round(score[0] * score[1])
+    return None, 0
+
+
+def _ordered(store, mode, candidates, cache):
+    """Candidates with the saved winner (if still a candidate) moved first."""
+    saved = cache.get(store, mode)
+    preferred = saved.get('selector') if saved else None
+    if preferred not in candidates:
+        return None, list(candidates)
+    return preferred, [preferred] + [c for c in candidates if c != preferred]
+
+
+def _choose(store, mode, preferred, order, scores, cache):
+    """Pick from a round of scores, saving a new winner; ``None`` if nothing matched."""
+    metrics = current_metrics()
+    if preferred is not None and _eligible(scores[0]):
+        metrics.count('selector_cache_hits')
+        return preferred
+    selector, cards = _first_eligible(order, scores)
+    if selector is None:
+        return None
+    if preferred is not None:
+        print(f"Saved {store} {mode} card selector {preferred!r} stopped matching, now using {selector!r}",
+              file=sys.stderr)
+    metrics.count('selector_discoveries')
+    cache.put(store, mode, selector, cards)
+    return selector
+
+
+def resolve_card_selector(driver, store, candidates, fields, timeout, cache=None):
+    """Wait up to ``timeout`` seconds for product cards; returns the selector matching them.
+
+    Raises ``TimeoutException`` if no candidate finds complete cards in time.
+    """
+    cache = cache or SelectorCache()
+    preferred, order = _ordered(store, 'browser', candidates, cache)
+    deadline = current_deadline()
+    give_up = time.monotonic() + timeout
+    while True:
+        scores = driver.execute_script(
+            RACE_SELECTORS_JS, order, fields, [TITLE, PRICE], SAMPLE_CARDS, MIN_COMPLETE,
+        ) or []
+        selector = _choose(store, 'browser', preferred, order, scores, cache)
+        if selector is not None:
+            return selector
+        if time.monotonic() >= give_up or deadline.expired:
+            raise TimeoutException(f"No {store} product cards matched any of {len(order)} card selectors")
+        deadline.sleep(min(POLL_INTERVAL, max(give_up - time.monotonic(), 0)))
+
+
+def _filled(card, field):
+    for selector in (field if isinstance(field, list) else [field]):
+        node = select_one(card, selector) if selector else None
+        if node is not None and node.inner_text().strip():
+            return True
+    return False
+
+
+def resolve_card_selector_html(root, store, candidates, fields, cache=None, mode='http'):
+    """``resolve_card_selector`` for a page parsed by ``html_cards``; ``None`` if nothing matched.
+
+    ``mode`` is where the page came from (``http``, or ``browser`` for a
+    saved DOM snapshot) and picks the cache entry to check and update.
+    """
+    cache = cache or SelectorCache()
+    preferred, order = _ordered(store, mode, candidates, cache)
+    scores = []
+    for selector in order:
+        cards = select_all(root, selector)
+        checked = cards[:SAMPLE_CARDS]
+        complete = sum(1 for card in checked if _filled(card, fields[TITLE]) and _filled(card, fields[PRICE]))
+        scores.append((len(cards), complete / len(checked) if checked else 0))
+        if _eligible(scores[-1]):
+            break
+    return _choose(store, mode, preferred, order, scores, cache)
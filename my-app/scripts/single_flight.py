@@ -0,0 +1,82 @@
+"""Coalesce concurrent scrapes of the same thing onto one in-flight scrape.
+
+Two requests for the same location arriving together would otherwise start
+two browsers on the same page. ``SingleFlight.run(key, produce)`` lets the
+first caller for ``key`` (across threads and processes) run ``produce()``
+while holding ``.scraper/flights/<key>.lock``; the result is written
+atomically to ``<key>.json`` before the lock is released. Callers that
+arrive while it runs wait for the lock and then take that result instead
+of producing their own.
+
+A waiter gives up when the active deadline (see ``scrape_deadline``) runs
+out. If the flight it waited on left no result, e.g. because it crashed,
+the waiter now holds the lock and produces the result itself.
+"""
+import fcntl
+import json
+import os
+import time
+
+from discount_cache import write_json_atomic
+from scrape_deadline import current_deadline
+from scraper_paths import data_dir
+
+# How often a waiter checks whether the flight has landed
+POLL_INTERVAL = 0.2
+
+
+class FlightTimeout(Exception):
+    pass
+
+
+class SingleFlight:
+    def __init__(self, directory=None):
+        self.directory = directory or data_dir('flights')
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def _wait_for_lock(self, lock_file):
+        """Take the lock, polling so the wait stays inside the deadline."""
+        deadline = current_deadline()
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if deadline.expired:
+                    raise FlightTimeout('Gave up waiting for an in-flight scrape')
+                deadline.sleep(POLL_INTERVAL)
+
+    def _landed(self, key, since):
+        """The result of a flight that finished after ``since``, if any."""
+        try:
+            with open(self._path(key, '.json')) as f:
+                flight = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if flight.get('finished', 0) < since:
+            return None
+        return flight
+
+    def run(self, key, produce):
+        """``(result, shared)``: ``produce()``'s result, or a concurrent flight's.
+
+        ``shared`` is True when the result came from another caller's
+        flight. Results must be JSON-serialisable.
+        """
+        arrived = time.time()
+        with open(self._path(key, '.lock'), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._wait_for_lock(lock_file)
+                flight = self._landed(key, arrived)
+                if flight is not None:
+                    return flight['result'], True
+            try:
+                result = produce()
+                write_json_atomic(self._path(key, '.json'), {'finished': time.time(), 'result': result})
+                return result, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
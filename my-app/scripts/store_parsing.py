@@ -0,0 +1,183 @@
+"""Store-specific parsing rules shared by the browser and HTTP scrapers.
+
+Both paths first reduce each product card to a compact row (see the
+``TITLE``..``CATEGORY`` layout below) and then turn rows into
+``Discount`` records here, so the rules live in one place and need no
+browser. Records without a category hint are left with ``category=None``
+for ``category_classifier.assign_categories`` to fill in per batch.
+"""
+import os
+
+from discount_record import Discount
+
+# Specials pages; override to point the scrapers at recorded fixtures
+CHECKERS_URL = os.environ.get('CHECKERS_URL', 'https://www.checkers.co.za/m/specials')
+TESCO_URL = os.environ.get('TESCO_URL', 'https://www.tesco.com/groceries/en-GB/promotions')
+
+# Locations each store serves, by store key; the registered adapters use
+# these, and ``stores_for`` answers from them without loading the scrapers
+STORE_LOCATIONS = {
+    'checkers': ['cape town'],
+    'tesco': ['london'],
+}
+
+# Row layout shared by every store: title, price, was price, card/loyalty
+# price, category hint
+TITLE, PRICE, WAS_PRICE, CARD_PRICE, CATEGORY = range(5)
+
+CHECKERS_CARD_SELECTOR = ".product-card, .product-item"
+# Tried, in this order, when the card selector stops matching (see
+# ``selector_discovery``); the first entry is the known-good default
+CHECKERS_CARD_CANDIDATES = [
+    CHECKERS_CARD_SELECTOR,
+    "[data-testid='product-card']",
+    ".product-grid-item",
+    "[class*='product-card']",
+    "[class*='product']",
+    "article",
+]
+CHECKERS_FIELDS = [
+    ".product-card__name, .product-item__name",
+    ".price__current, .product-item__price",
+    ".price__was, .product-item__was-price",
+    None,
+    None,
+]
+
+TESCO_CARD_SELECTOR = ".product-list--list-item"
+TESCO_CARD_CANDIDATES = [
+    TESCO_CARD_SELECTOR,
+    "[data-auto='product-tile']",
+    ".product-details--wrapper",
+    ".styles__StyledVerticalTile-dvv1wj-1",
+    "[class*='StyledTiledContent']",
+    "[class*='product-tile']",
+]
+TESCO_FIELDS = [
+    "[data-auto='product-tile--title']",
+    [
+        ".beans-price__text",
+        ".styled__Text-sc-8qlq5b-1",
+        "[class*='ContentText']",
+        ".styled__StyledHeading-sc-119w3hf-2"
+    ],
+    None,
+    "[class*='ContentText']",
+    "[class*='category']",
+]
+
+def parse_checkers_card(row):
+    """Turn an extracted Checkers card row into a ``Discount`` (or None)."""
+    title = row[TITLE]
+    if not title:  # Skip if no title
+        return None
+    
+    current_price = row[PRICE]
+    if not current_price:
+        return None  # Skip if no price
+    
+    original_price = row[WAS_PRICE] or None
+    
+    # Clean up the price for display
+    if '\n' in current_price:
+        # Handle card member prices
+        prices = current_price.split('\n')
+        current_price = prices[-1].replace('WITH CARD', '').strip()
+        if not original_price and len(prices) > 1:
+            original_price = prices[0].strip()
+    
+    # Category comes from the title; see category_classifier.assign_categories
+    category = None
+    
+    return Discount.from_display(
+        title, current_price, original_price, 'Checkers', 'Cape Town', category, currency='ZAR'
+    )
+
+def parse_tesco_card(row):
+    """Turn an extracted Tesco card row into a ``Discount`` (or None)."""
+    title = row[TITLE]
+    if not title:
+        return None
+    
+    # Walk the price fallbacks in selector order
+    current_price = None
+    original_price = None
+    for price_text in row[PRICE]:
+        if price_text and '£' in price_text:
+            if 'was' in price_text.lower():
+                original_price = price_text.split('was')[-1].strip()
+            else:
+                current_price = price_text
+    
+    if not current_price:
+        return None
+    
+    # Use the clubcard price if available
+    clubcard_text = row[CARD_PRICE]
+    if clubcard_text and 'Clubcard Price' in clubcard_text:
+        current_price = clubcard_text.split(' ')[0]  # Get just the price
+    
+    # Use the page's category hint if present, else classify from the title
+    category = row[CATEGORY].strip().lower() if row[CATEGORY] else None
+    
+    return Discount.from_display(
+        title, current_price, original_price, 'Tesco', 'London', category, currency='GBP'
+    )
+
+def dedupe_discounts(discounts):
+    """Remove duplicates based on title and price, keeping first-seen order."""
+    unique_discounts = []
+    seen = set()
+    for d in discounts:
+        key = d.dedupe_key
+        if key not in seen:
+            seen.add(key)
+            unique_discounts.append(d)
+    return unique_discounts
+
+def stores_for(location, stores=None):
+    """Keys of the stores serving ``location``, narrowed to ``stores`` (substring match).
+
+    Same selection as ``scrape_discounts.select_adapters``.
+    """
+    location = location.strip().lower()
+    return [
+        key for key, locations in STORE_LOCATIONS.items()
+        if location in locations and (not stores or any(s.lower() in key for s in stores))
+    ]
+
+def to_minor_units(amount):
+    """Major-unit filter bound (e.g. 12.5) to integer minor units, or None."""
+    return None if amount is None else round(amount * 100)
+
+def apply_filters(discounts, categories=None, min_price=None, max_price=None):
+    """Apply the API's category and price-range filters to ``Discount`` records.
+
+    Prices are in major units, as the API receives them; the comparison is
+    done on the records' integer minor units.
+    """
+    categories = [c.lower() for c in categories or []]
+    min_minor = to_minor_units(min_price)
+    max_minor = to_minor_units(max_price)
+    filtered = []
+    for d in discounts:
+        if categories and not any(c in (d.category or '') for c in categories):
+            continue
+        if min_minor is not None or max_minor is not None:
+            price = d.price_minor
+            if price is None:
+                continue
+            if min_minor is not None and price < min_minor:
+                continue
+            if max_minor is not None and price > max_minor:
+                continue
+        filtered.append(d)
+    return filtered
+
+def checkers_json_ld_row(name, price):
+    """Card row for a Checkers product found in embedded JSON-LD."""
+    return [name, price, None, None, None]
+
+def tesco_json_ld_row(name, price):
+    """Card row for a Tesco product found in embedded JSON-LD."""
+    return [name, [price], None, None, None]
@@ -0,0 +1,55 @@
+"""Registry of store adapters the discount scraper can fan out over.
+
+An adapter declares everything store-specific: the locations it serves, its
+specials URL, card/field selectors, the row parser from ``store_parsing``
+and the browser scraper used when the HTTP fetch can't get products. Add a
+store by registering another ``StoreAdapter``; ``scrape_discounts.main``
+picks it up for every location it lists.
+"""
+
+
+class StoreAdapter:
+    def __init__(self, key, name, locations, url, card_selector, fields, parse_card,
+                 json_ld_row, scrape, timeout=180, shards=None, card_candidates=None):
+        self.key = key
+        self.name = name
+        self.locations = [location.lower() for location in locations]
+        self.url = url
+        self.card_selector = card_selector
+        # Card selectors to fall back on, best first (see ``selector_discovery``)
+        self.card_candidates = card_candidates or [card_selector]
+        self.fields = fields
+        self.parse_card = parse_card
+        # Builds a card row from a JSON-LD product name and display price
+        self.json_ld_row = json_ld_row
+        # Browser scraper: scrape(driver=None, on_discount=None, url=None) -> discounts
+        self.scrape = scrape
+        # Returns the URLs the specials are split across (see ``store_shards``)
+        self.shards = shards
+        # Seconds the store gets before main() stops waiting for it
+        self.timeout = timeout
+
+    def shard_urls(self):
+        """URLs to scrape in parallel; just ``url`` for an unsharded store."""
+        return (self.shards() if self.shards else None) or [self.url]
+
+    def __repr__(self):
+        return f"StoreAdapter({self.key!r})"
+
+
+STORE_ADAPTERS = {}
+
+
+def register_store(adapter):
+    STORE_ADAPTERS[adapter.key] = adapter
+    return adapter
+
+
+def get_adapter(key):
+    return STORE_ADAPTERS[key.lower()]
+
+
+def adapters_for(location):
+    """Adapters serving ``location``, in registration order."""
+    location = location.strip().lower()
+    return [adapter for adapter in STORE_ADAPTERS.values() if location in adapter.locations]
@@ -0,0 +1,128 @@
+"""Split one store's specials across several URLs scraped in parallel.
+
+A large catalogue behind one infinite-scroll page is limited to what a
+single tab can load. When a store's specials are also reachable as
+separate category or pagination pages, each page is a shard: shards are
+scraped at the same time, each on its own browser (a leased pool driver or
+one on a spare profile slot), and the results are merged through the
+usual ``(title, price)`` dedupe.
+
+Shards are configured per store with ``<STORE>_SHARD_URLS`` (comma-separated
+URLs, e.g. category specials pages) or, for paginated specials, with
+``SCRAPE_SHARD_PAGES`` (``?page=2`` and up are added to the specials URL).
+Without either the store has one shard. At most
+``SCRAPE_SHARD_PARALLELISM`` (default 2) shards of a store run at once.
+
+The merged result lists the shards that failed in ``failed``, so the
+caller can retry them in the browser or flag the scrape as partial instead
+of silently losing those products. A shard failed if it raised, returned
+``None`` (the HTTP path's "blocked or empty"), returned no products (the
+browser scrapers return ``[]`` after giving up on errors) or returned a
+``PartialResult`` (it stopped on an error partway; its products are still
+merged). A shard page with genuinely no products therefore makes every
+scrape of the store partial, so only configure pages that exist.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from discount_cache import PartialResult
+from scrape_deadline import current_deadline
+from scrape_metrics import current_metrics
+from store_parsing import dedupe_discounts
+
+SHARD_PARALLELISM = int(os.environ.get('SCRAPE_SHARD_PARALLELISM', '2'))
+
+
+def page_url(url, page):
+    """``url`` with its ``page`` query parameter set to ``page``."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'page']
+    query.append(('page', str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def shard_urls(url, urls_env):
+    """Shard URLs for a store whose specials live at ``url``."""
+    explicit = [part.strip() for part in os.environ.get(urls_env, '').split(',') if part.strip()]
+    if explicit:
+        return explicit
+    pages = int(os.environ.get('SCRAPE_SHARD_PAGES', '1'))
+    return [url] + [page_url(url, page) for page in range(2, pages + 1)]
+
+
+class ShardResults(list):
+    """Merged discounts of a sharded scrape; ``failed`` lists the shard URLs that produced nothing."""
+
+    def __init__(self, discounts=(), failed=()):
+        super().__init__(discounts)
+        self.failed = list(failed)
+
+
+def _dedupe_sink(on_discount):
+    """Thread-safe ``on_discount`` that passes each ``(title, price)`` on once."""
+    if on_discount is None:
+        return None
+    seen = set()
+    lock = threading.Lock()
+
+    def sink(discount):
+        with lock:
+            if discount.dedupe_key in seen:
+                return
+            seen.add(discount.dedupe_key)
+        on_discount(discount)
+    return sink
+
+
+def scrape_shards(name, urls, scrape_one, on_discount=None, parallelism=None):
+    """Run ``scrape_one(url, on_discount)`` for every shard and merge the results.
+
+    Shards run on worker threads that share the caller's metrics and
+    deadline. A failed shard only loses its own products and is listed in
+    the result's ``failed``; the first error is raised if every shard
+    failed. Returns ``None`` if no shard found anything (for the HTTP path,
+    "escalate to the browser"), otherwise a ``ShardResults``.
+    """
+    metrics = current_metrics()
+    deadline = current_deadline()
+    sink = _dedupe_sink(on_discount)
+
+    def run(url):
+        with metrics.active(), deadline.active():
+            return scrape_one(url, sink)
+
+    found = []
+    errors = []
+    failed = []
+    workers = max(1, min(len(urls), parallelism or SHARD_PARALLELISM))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, url) for url in urls]
+        for url, future in zip(urls, futures):
+            try:
+                discounts = future.result()
+            except Exception as e:
+                print(f"Error scraping {name} shard {url}: {str(e)}", file=sys.stderr)
+                metrics.count('shard_errors')
+                errors.append(e)
+                failed.append(url)
+                continue
+            if discounts:
+                found.append(discounts)
+            if not discounts or isinstance(discounts, PartialResult):
+                print(f"{name} shard {url} came back {'incomplete' if discounts else 'empty'}", file=sys.stderr)
+                metrics.count('shard_failures')
+                failed.append(url)
+    metrics.count('shards', len(urls))
+
+    if errors and len(errors) == len(urls):
+        raise errors[0]
+    if not found:
+        return None
+    merged = [discount for discounts in found for discount in discounts]
+    with metrics.phase('dedupe'):
+        unique = dedupe_discounts(merged)
+    metrics.skip('duplicate', len(merged) - len(unique))
+    return ShardResults(unique, failed)
@@ -5,12 +5,14 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 import json
 import time
 import traceback
 import sys
 
+from driver_binary import chromedriver_path
+from page_archive import PageArchive
+
 def setup_driver():
     print("\n=== Setting up Chrome Driver ===")
     options = Options()
@@ -28,8 +30,8 @@ def setup_driver():
     options.add_argument('--start-maximized')
     options.add_argument('--disable-dev-shm-usage')
     
-    print("Installing Chrome driver...")
-    service = Service(ChromeDriverManager().install())
+    print("Locating Chrome driver...")
+    service = Service(chromedriver_path(options))
     driver = webdriver.Chrome(service=service, options=options)
     
     # Make webdriver less detectable
@@ -98,6 +100,9 @@ def test_checkers_scrape():
             # Take screenshot
             driver.save_screenshot('checkers_test.png')
             print("Screenshot saved as checkers_test.png")
+            # Keep the whole page, so selectors can be tried on it offline
+            digest = PageArchive().save('checkers', driver.current_url, driver.page_source, 'debug')
+            print(f"Page archived as {digest} (python3 scripts/page_archive.py extract --store checkers)")
             return
         
         # 5. Try to extract information from first 5 products
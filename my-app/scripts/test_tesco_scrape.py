@@ -4,11 +4,15 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
 import json
 import time
 import traceback
 import sys
 
+from driver_binary import chromedriver_path
+from page_archive import PageArchive
+
 def setup_driver():
     print("\n=== Setting up Chrome Driver ===")
     options = Options()
@@ -28,7 +32,7 @@ def setup_driver():
     options.add_argument('--disable-gpu')
     
     print("Creating Chrome driver...")
-    driver = webdriver.Chrome(options=options)
+    driver = webdriver.Chrome(service=Service(chromedriver_path(options)), options=options)
     
     # Make webdriver less detectable
     driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
@@ -105,6 +109,9 @@ def test_tesco_scrape():
             # Take screenshot
             driver.save_screenshot('tesco_test.png')
             print("Screenshot saved as tesco_test.png")
+            # Keep the whole page, so selectors can be tried on it offline
+            digest = PageArchive().save('tesco', driver.current_url, driver.page_source, 'debug')
+            print(f"Page archived as {digest} (python3 scripts/page_archive.py extract --store tesco)")
             return
         
         # 5. Try to extract information from first 5 products
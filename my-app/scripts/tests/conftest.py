@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(SCRIPTS_DIR, 'fixtures')
+
+# The scripts import each other as top-level modules
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Keep every test's ``.scraper`` state in its own temp dir."""
+    monkeypatch.setenv('SCRAPER_DATA_DIR', str(tmp_path / 'scraper'))
+    monkeypatch.setenv('SCRAPE_METRICS', 'off')
+    return tmp_path / 'scraper'
+
+
+@pytest.fixture
+def read_fixture():
+    """Contents of a recorded page in ``scripts/fixtures``."""
+    def read(name):
+        with open(os.path.join(FIXTURES_DIR, name)) as f:
+            return f.read()
+    return read
@@ -0,0 +1,67 @@
+import pytest
+
+from category_classifier import CategoryClassifier, assign_categories, default_classifier
+from discount_record import Discount
+
+CATEGORIES = [
+    ('dairy', ['milk', 'cream', 'cheese']),
+    ('frozen', ['ice cream', 'fish fingers']),
+    ('fruits', ['apple', 'berry', 'tomato', 'peach']),
+    ('bakery', ['loaf', 'knife']),
+    ('vegetables', ['beans', 'peas']),
+    ('meat', ['ham']),
+]
+
+
+@pytest.fixture
+def classifier():
+    return CategoryClassifier(CATEGORIES)
+
+
+@pytest.mark.parametrize('title, category', [
+    ('Full Cream Milk 2L', 'dairy'),
+    ('Vanilla Ice Cream 1.5L', 'frozen'),
+    ('Red Apples 1kg', 'fruits'),
+    ('Cherry Tomatoes 250g', 'fruits'),
+    ('Mixed Berries 500g', 'fruits'),
+    ('Peaches in Syrup', 'fruits'),
+    ('White Loaves x2', 'bakery'),
+    ('Bread Knives', 'bakery'),
+    ('Baked Bean 410g', 'vegetables'),
+    ('Garden Pea Shoots', 'vegetables'),
+    ('Crumbed Fish Finger 400g', 'frozen'),
+    ('Anti-dandruff Shampoo', 'other'),
+    ('Smoked Ham', 'meat'),
+    ('', 'other'),
+    (None, 'other'),
+])
+def test_classify(classifier, title, category):
+    assert classifier.classify(title) == category
+
+
+def test_batch_matches_single(classifier):
+    titles = ['Cheddar Cheese', 'Multi-line\nBerries', None, 'Ice Creams']
+    assert classifier.classify_batch(titles) == [classifier.classify(title) for title in titles]
+    assert classifier.classify_batch(titles) == ['dairy', 'fruits', 'other', 'frozen']
+
+
+def test_listed_keyword_beats_inflected_form():
+    # "bus" is listed under transport; "bu" + "s" from bakery must not take it
+    classifier = CategoryClassifier([('bakery', ['bu']), ('transport', ['bus'])])
+    assert classifier.classify('Bus Ticket') == 'transport'
+    assert classifier.classify('Bus') == 'transport'
+
+
+def test_default_taxonomy_plurals():
+    classifier = default_classifier()
+    assert classifier.classify('Fresh Strawberries 400g') == 'fruits'
+    assert classifier.classify('Wholewheat Loaves') == 'bakery'
+    # Plural keyword, singular title
+    assert classifier.classify('Roasted Salted Nut Mix') == 'snacks'
+
+
+def test_assign_categories_keeps_existing():
+    found = Discount.from_display('Milk', 'R1', None, 'Checkers', 'Cape Town', None)
+    hinted = Discount.from_display('Milk', 'R1', None, 'Tesco', 'London', 'fresh food')
+    assign_categories([found, hinted], CategoryClassifier(CATEGORIES))
+    assert (found.category, hinted.category) == ('dairy', 'fresh food')
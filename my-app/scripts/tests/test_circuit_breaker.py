@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from discount_cache import write_json_atomic
+
+
+@pytest.fixture
+def breaker(tmp_path):
+    return CircuitBreaker('checkers', directory=str(tmp_path), failures=3, cooldown=60)
+
+
+def open_breaker(breaker, opened_ago=0):
+    for _ in range(breaker.failures):
+        breaker.record_failure()
+    state = breaker._state()
+    state['opened'] -= opened_ago
+    write_json_atomic(breaker.path, state)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_one_trial_after_the_cooldown(breaker):
+    open_breaker(breaker, opened_ago=61)
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens(breaker):
+    open_breaker(breaker, opened_ago=61)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    assert time.time() - breaker._state()['opened'] < 5
+
+
+def test_lost_trial_lapses(breaker):
+    open_breaker(breaker, opened_ago=200)
+    assert breaker.allow()
+    state = breaker._state()
+    state['trial'] -= 61
+    write_json_atomic(breaker.path, state)
+    assert breaker.allow()
+
+
+def test_concurrent_callers_share_one_trial(breaker):
+    open_breaker(breaker, opened_ago=61)
+    start = threading.Barrier(8)
+    allowed = []
+
+    def call():
+        start.wait()
+        allowed.append(breaker.allow())
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert allowed.count(True) == 1
+
+
+def test_concurrent_failures_are_all_counted(tmp_path):
+    breaker = CircuitBreaker('tesco', directory=str(tmp_path), failures=1000, cooldown=60)
+    threads = [threading.Thread(target=lambda: [breaker.record_failure() for _ in range(25)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert breaker._state()['failures'] == 200
+
+
+@pytest.fixture
+def slow_store(monkeypatch):
+    import scrape_discounts
+    from store_registry import STORE_ADAPTERS, StoreAdapter, register_store
+    adapter = StoreAdapter(
+        key='slowmart', name='Slowmart', locations=['testville'], url='http://127.0.0.1:9/',
+        card_selector='.card', fields=[], parse_card=None, json_ld_row=None, scrape=None, timeout=0.3,
+    )
+    register_store(adapter)
+    finished = threading.Event()
+    outcome = {}
+
+    def scrape_store(adapter, pool=None, mode=None, on_discount=None):
+        try:
+            time.sleep(0.6)
+            if outcome.get('error'):
+                raise RuntimeError(outcome['error'])
+            return outcome.get('discounts', [])
+        finally:
+            finished.set()
+    monkeypatch.setattr(scrape_discounts, '_scrape_store', scrape_store)
+    yield outcome, finished
+    STORE_ADAPTERS.pop('slowmart')
+
+
+def wait_for_worker(finished):
+    assert finished.wait(5)
+    # live() records right after _scrape_store returns
+    time.sleep(0.2)
+
+
+def test_timed_out_scrape_counts_once(slow_store):
+    from scrape_discounts import scrape_location
+    outcome, finished = slow_store
+    outcome['error'] = 'blocked'
+    discounts, info = scrape_location('testville')
+    assert discounts == [] and info[0]['status'] == 'timeout'
+    wait_for_worker(finished)
+    assert CircuitBreaker('slowmart')._state()['failures'] == 1
+
+
+def test_slow_scrape_that_succeeds_is_not_a_failure(slow_store):
+    from discount_record import Discount
+    from scrape_discounts import scrape_location
+    outcome, finished = slow_store
+    outcome['discounts'] = [Discount.from_display('Milk', 'R10', None, 'Slowmart', 'Testville', 'dairy')]
+    CircuitBreaker('slowmart').record_failure()
+    scrape_location('testville')
+    wait_for_worker(finished)
+    assert CircuitBreaker('slowmart')._state()['failures'] == 0
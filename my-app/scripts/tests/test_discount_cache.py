@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+from discount_cache import DiscountCache, PartialResult, REFRESH_CLAIM_TIMEOUT, write_json_atomic
+
+
+def make_cache(tmp_path, ttl=60, max_stale=600):
+    return DiscountCache(directory=str(tmp_path), ttl=ttl, max_stale=max_stale)
+
+
+def age_entry(cache, key, seconds):
+    entry = cache.get(key)
+    entry['created'] -= seconds
+    write_json_atomic(cache._path(key), entry)
+
+
+def never():
+    raise AssertionError('scraped on a cache hit')
+
+
+def test_key_ignores_case_whitespace_and_empty_filters():
+    assert DiscountCache.key(' Cape Town ', 'Checkers', {'categories': [], 'min_price': None}) == \
+        DiscountCache.key('cape town', 'checkers')
+    assert DiscountCache.key('cape town', 'checkers', {'min_price': 10}) != DiscountCache.key('cape town', 'checkers')
+
+
+def test_miss_scrapes_and_caches(tmp_path):
+    cache = make_cache(tmp_path)
+    discounts, info = cache.fetch('k', lambda: [{'title': 'Milk'}])
+    assert discounts == [{'title': 'Milk'}]
+    assert info['status'] == 'miss'
+    discounts, info = cache.fetch('k', lambda: never())
+    assert discounts == [{'title': 'Milk'}]
+    assert info['status'] == 'hit'
+
+
+def test_empty_and_partial_results_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.fetch('empty', lambda: [])
+    assert cache.get('empty') is None
+    discounts, _ = cache.fetch('partial', lambda: PartialResult([{'title': 'Milk'}]))
+    assert discounts == [{'title': 'Milk'}]
+    assert cache.get('partial') is None
+
+
+def test_stale_entry_is_served_while_one_refresh_starts(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.fetch('k', lambda: [{'title': 'Old'}])
+    age_entry(cache, 'k', 120)
+    refreshes = []
+    for _ in range(3):
+        discounts, info = cache.fetch('k', never, refresh=lambda: refreshes.append(1))
+        assert discounts == [{'title': 'Old'}]
+        assert info['status'] == 'stale'
+    assert len(refreshes) == 1
+
+    # The refresh landing releases the claim
+    cache.put('k', [{'title': 'New'}])
+    discounts, info = cache.fetch('k', never)
+    assert (discounts, info['status']) == ([{'title': 'New'}], 'hit')
+
+
+def test_stale_without_refresh_or_too_old_is_a_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.fetch('k', lambda: [{'title': 'Old'}])
+    age_entry(cache, 'k', 120)
+    discounts, info = cache.fetch('k', lambda: [{'title': 'New'}])
+    assert (discounts, info['status']) == ([{'title': 'New'}], 'miss')
+
+    age_entry(cache, 'k', 1000)
+    discounts, info = cache.fetch('k', lambda: [{'title': 'Newer'}], refresh=never)
+    assert (discounts, info['status']) == ([{'title': 'Newer'}], 'miss')
+
+
+def test_failed_refresh_start_releases_the_claim(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.fetch('k', lambda: [{'title': 'Old'}])
+    age_entry(cache, 'k', 120)
+
+    def broken():
+        raise RuntimeError('no daemon')
+    cache.fetch('k', never, refresh=broken)
+    assert cache._claim_refresh('k')
+
+
+def test_dead_refresh_claim_is_retaken(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache._claim_refresh('k')
+    assert not cache._claim_refresh('k')
+    marker = cache._path('k') + '.refreshing'
+    old = time.time() - REFRESH_CLAIM_TIMEOUT - 1
+    os.utime(marker, (old, old))
+    assert cache._claim_refresh('k')
+    assert not cache._claim_refresh('k')
+
+
+def test_concurrent_claims_start_one_refresh(tmp_path):
+    cache = make_cache(tmp_path)
+    start = threading.Barrier(8)
+    claimed = []
+
+    def claim():
+        start.wait()
+        claimed.append(cache._claim_refresh('k'))
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert claimed.count(True) == 1
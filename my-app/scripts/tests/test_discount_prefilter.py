@@ -0,0 +1,87 @@
+import json
+import subprocess
+import sys
+
+import discount_prefilter
+from discount_prefilter import TABLE_HEADER, compact_table, compact_tables, estimate_tokens, prefilter, short_id
+from discount_record import Discount
+
+
+def listing(title, price, was=None, category='dairy'):
+    return Discount.from_display(title, price, was, 'Checkers', 'Cape Town', category, currency='ZAR')
+
+
+DISCOUNTS = [
+    listing('Clover Milk 2L', 'R30.00', 'R40.00'),          # 25%
+    listing('Koo Baked Beans 410g', 'R15.00', 'R16.00', 'pantry'),  # 6.3%
+    listing('Albany Bread', 'R18.00', 'R30.00', 'bakery'),  # 40%
+    listing('Heinz Ketchup 700ml', 'R50.00', None, 'pantry'),
+]
+
+
+def test_short_ids_are_base36():
+    assert [short_id(n) for n in (0, 9, 10, 35, 36, 1295)] == ['0', '9', 'a', 'z', '10', 'zz']
+
+
+def test_prefilter_keeps_input_order():
+    assert prefilter(DISCOUNTS) == [0, 1, 2, 3]
+    assert prefilter(DISCOUNTS, categories=['pantry']) == [1, 3]
+    assert prefilter(DISCOUNTS, max_price=20) == [1, 2]
+    assert prefilter(DISCOUNTS, min_discount=10) == [0, 2]
+
+
+def test_table_is_ranked_by_discount():
+    table, ids, omitted, tokens = compact_table(DISCOUNTS, [0, 1, 2, 3])
+
+    assert table.split('\n') == [
+        TABLE_HEADER,
+        '0|Albany Bread|bakery',
+        '1|Clover Milk 2L|dairy',
+        '2|Koo Baked Beans 410g|pantry',
+        '3|Heinz Ketchup 700ml|pantry',
+    ]
+    assert ids == {'0': 2, '1': 0, '2': 1, '3': 3}
+    assert omitted == []
+    assert tokens >= estimate_tokens(table)
+
+
+def test_budget_overflow_lists_every_row_left_out():
+    budget = estimate_tokens(TABLE_HEADER) + estimate_tokens('0|Albany Bread|bakery') + 1
+    table, ids, omitted, _ = compact_table(DISCOUNTS, [0, 1, 2, 3], budget=budget)
+
+    assert ids == {'0': 2}
+    # Nothing is lost: every kept row is either in the table or omitted
+    assert omitted == [0, 1, 3]
+    assert sorted(list(ids.values()) + omitted) == [0, 1, 2, 3]
+
+
+def test_row_over_budget_still_gets_a_table():
+    table, ids, omitted, _ = compact_table(DISCOUNTS, [0, 1], budget=1)
+
+    assert ids == {'0': 0}
+    assert omitted == [1]
+
+
+def test_overflow_goes_to_further_tables():
+    budget = estimate_tokens(TABLE_HEADER) + 2 * estimate_tokens('0|Koo Baked Beans 410g|pantry') + 2
+    batches = compact_tables(DISCOUNTS, [0, 1, 2, 3], budget=budget)
+
+    assert [list(ids.values()) for _, ids, _ in batches] == [[2, 0], [1, 3]]
+    assert all(tokens <= budget for _, _, tokens in batches)
+    # Each table numbers its rows from 0 under the same header
+    assert batches[1][0].split('\n') == [TABLE_HEADER, '0|Koo Baked Beans 410g|pantry', '1|Heinz Ketchup 700ml|pantry']
+    assert compact_tables(DISCOUNTS, []) == []
+
+
+def test_cli_puts_every_kept_row_in_a_batch():
+    records = [d.to_dict() for d in DISCOUNTS]
+    result = subprocess.run(
+        [sys.executable, discount_prefilter.__file__, '--token-budget', '12'],
+        input=json.dumps(records), capture_output=True, text=True, check=True,
+    )
+    output = json.loads(result.stdout)
+
+    assert output['keep'] == [0, 1, 2, 3]
+    assert len(output['batches']) > 1
+    assert sorted(n for batch in output['batches'] for n in batch['ids'].values()) == output['keep']
+    assert 'split into' in result.stderr
@@ -0,0 +1,100 @@
+import pytest
+
+from discount_record import Discount, parse_price
+from store_parsing import apply_filters, dedupe_discounts, parse_checkers_card, parse_tesco_card
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('R29.99', ('ZAR', 2999)),
+    ('R 12', ('ZAR', 1200)),
+    ('R1,299.99', ('ZAR', 129999)),
+    ('£1,000', ('GBP', 100000)),
+    ('£3.5', ('GBP', 350)),
+    ('2 for R50', ('ZAR', 5000)),
+    ('Was £4.44', ('GBP', 444)),
+    ('75p', ('GBP', 75)),
+    ('1,299.50', ('ZAR', 129950)),
+    ('', ('ZAR', None)),
+    (None, ('ZAR', None)),
+    ('Sold out', ('ZAR', None)),
+])
+def test_parse_price(text, expected):
+    assert parse_price(text, 'ZAR') == expected
+
+
+def test_parse_price_without_default_currency():
+    assert parse_price('12.50') == (None, 1250)
+    assert parse_price(None) == (None, None)
+
+
+def test_discount_in_basis_points():
+    d = Discount.from_display('Milk', 'R70.09', 'R99.87', 'Checkers', 'Cape Town', 'dairy', currency='ZAR')
+    assert (d.price_minor, d.original_price_minor, d.discount_bp) == (7009, 9987, 2982)
+    assert d.discount_percentage == '29.8%'
+
+
+def test_thousands_separators_in_both_prices():
+    d = Discount.from_display('TV', 'R1,999.00', 'R2,499.00', 'Checkers', 'Cape Town', None, currency='ZAR')
+    assert (d.price_minor, d.original_price_minor, d.discount_bp) == (199900, 249900, 2001)
+
+
+def test_missing_was_price():
+    d = Discount.from_display('Tea', '£2.00', None, 'Tesco', 'London', None, currency='GBP')
+    assert (d.currency, d.price_minor, d.original_price_minor) == ('GBP', 200, None)
+    assert d.discount_bp is None
+    assert d.discount_percentage is None
+
+
+def test_original_in_another_currency_is_ignored():
+    d = Discount.from_display('Tea', '£2.00', 'R50.00', 'Tesco', 'London', None, currency='GBP')
+    assert d.original_price_minor is None
+    assert d.discount_bp is None
+
+
+def test_symbol_overrides_store_currency():
+    d = Discount.from_display('Tea', '£2.00', None, 'Checkers', 'Cape Town', None, currency='ZAR')
+    assert d.currency == 'GBP'
+
+
+def test_dict_round_trip():
+    d = Discount.from_display('Milk', 'R70.09', 'R99.87', 'Checkers', 'Cape Town', 'dairy', currency='ZAR')
+    record = d.to_dict()
+    assert record['store_key'] == 'checkers'
+    assert Discount.from_dict(record).to_dict() == record
+
+
+def test_checkers_member_price():
+    d = parse_checkers_card(['Milk', 'R99.87\nR70.09 WITH CARD', None, None, None])
+    assert (d.price, d.original_price, d.discount_bp) == ('R70.09', 'R99.87', 2982)
+    assert parse_checkers_card([None, 'R1', None, None, None]) is None
+    assert parse_checkers_card(['Milk', '', None, None, None]) is None
+
+
+def test_tesco_clubcard_and_was_prices():
+    d = parse_tesco_card(['Tea', ['£3.69', 'Was £4.44', None, None], None, '£3.00 Clubcard Price', 'Drinks '])
+    assert (d.price, d.original_price, d.price_minor, d.original_price_minor) == ('£3.00', 'Was £4.44', 300, 444)
+    assert d.category == 'drinks'
+    assert parse_tesco_card(['Tea', [None, 'Was £4.44', None, None], None, None, None]) is None
+
+
+def test_apply_filters_on_minor_units():
+    discounts = [
+        Discount.from_display(title, price, None, 'Checkers', 'Cape Town', category, currency='ZAR')
+        for title, price, category in [
+            ('Milk', 'R10.00', 'dairy'),
+            ('Cheese', 'R12.50', 'dairy'),
+            ('Steak', 'R99.99', 'meat'),
+            ('Mystery', 'TBC', 'dairy'),
+        ]
+    ]
+    titles = lambda found: [d.title for d in found]
+    assert titles(apply_filters(discounts, categories=['Dairy'])) == ['Milk', 'Cheese', 'Mystery']
+    assert titles(apply_filters(discounts, min_price=10, max_price=12.5)) == ['Milk', 'Cheese']
+    assert titles(apply_filters(discounts, categories=['meat'], max_price=50)) == []
+
+
+def test_dedupe_keeps_first_seen():
+    a = Discount.from_display('Milk', 'R10', None, 'Checkers', 'Cape Town', 'dairy', currency='ZAR')
+    b = Discount.from_display('Milk', 'R10', None, 'Checkers', 'Cape Town', None, currency='ZAR')
+    c = Discount.from_display('Milk', 'R11', None, 'Checkers', 'Cape Town', None, currency='ZAR')
+    assert dedupe_discounts([a, b, c]) == [a, c]
@@ -0,0 +1,113 @@
+import json
+import os
+
+import pytest
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.selenium_manager import SeleniumManager
+
+import driver_binary
+import scrape_discounts
+from driver_binary import chromedriver_path, forget_chromedriver
+
+
+def executable(path, body='exit 0'):
+    path.write_text(f"#!/bin/sh\n{body}\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def installed(tmp_path, monkeypatch):
+    """A fake chromedriver and browser, and a Selenium Manager that finds them."""
+    monkeypatch.delenv('CHROMEDRIVER_PATH', raising=False)
+    monkeypatch.setattr(driver_binary, '_resolved', None)
+    version = tmp_path / 'version'
+    version.write_text('Google Chrome 120.0.6099.109')
+    state = {
+        'driver': executable(tmp_path / 'chromedriver'),
+        'browser': executable(tmp_path / 'chrome', f"cat {version}"),
+        'version': version,
+        'resolves': 0,
+    }
+
+    def driver_location(self, options):
+        state['resolves'] += 1
+        options.binary_location = state['browser']
+        return state['driver']
+
+    monkeypatch.setattr(SeleniumManager, 'driver_location', driver_location)
+    return state
+
+
+def new_process(monkeypatch):
+    """Forget the in-process result, as a new scraper process would."""
+    monkeypatch.setattr(driver_binary, '_resolved', None)
+
+
+def test_cached_entry_keeps_the_browser(installed, monkeypatch):
+    assert chromedriver_path(Options()) == installed['driver']
+    with open(driver_binary._cache_file()) as f:
+        cached = json.load(f)
+    assert cached['browser_path'] == installed['browser']
+    assert cached['browser_version'] == 'Google Chrome 120.0.6099.109'
+
+    new_process(monkeypatch)
+    options = Options()
+    assert chromedriver_path(options) == installed['driver']
+    assert installed['resolves'] == 1
+    # The browser Selenium Manager picked is used on a cache hit too
+    assert options.binary_location == installed['browser']
+
+
+def test_browser_update_resolves_again(installed, monkeypatch):
+    chromedriver_path(Options())
+    installed['version'].write_text('Google Chrome 121.0.6167.85')
+
+    new_process(monkeypatch)
+    chromedriver_path(Options())
+
+    assert installed['resolves'] == 2
+    with open(driver_binary._cache_file()) as f:
+        assert json.load(f)['browser_version'] == 'Google Chrome 121.0.6167.85'
+
+
+def test_forget_drops_the_cache(installed):
+    chromedriver_path(Options())
+    assert forget_chromedriver()
+    assert not os.path.exists(driver_binary._cache_file())
+    chromedriver_path(Options())
+    assert installed['resolves'] == 2
+
+
+def test_pinned_driver_is_never_resolved(installed, monkeypatch):
+    monkeypatch.setenv('CHROMEDRIVER_PATH', '/opt/chromedriver')
+    assert chromedriver_path(Options()) == '/opt/chromedriver'
+    assert not forget_chromedriver()
+    assert installed['resolves'] == 0
+
+
+class FakeChrome:
+    def __init__(self, service, options):
+        self.service = service
+
+    def execute_cdp_cmd(self, command, params):
+        pass
+
+
+def test_setup_driver_resolves_again_when_the_session_fails(installed, monkeypatch):
+    chromedriver_path(Options())
+    attempts = []
+
+    def chrome(service, options):
+        attempts.append(service.path)
+        if len(attempts) == 1:
+            raise SessionNotCreatedException('This version of ChromeDriver only supports Chrome version 120')
+        return FakeChrome(service, options)
+
+    monkeypatch.setattr(scrape_discounts.webdriver, 'Chrome', chrome)
+    driver = scrape_discounts.setup_driver(profile='full')
+
+    assert isinstance(driver, FakeChrome)
+    assert attempts == [installed['driver'], installed['driver']]
+    assert installed['resolves'] == 2
@@ -0,0 +1,81 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from driver_governor import OWNER_ENV, owner_env, owner_flag, reap_orphans
+
+pytestmark = pytest.mark.skipif(not os.path.isdir('/proc'), reason='needs /proc')
+
+
+def dead_pid():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+
+def detached(args, env=None):
+    """Start ``args`` as an orphan (its shell parent exits at once); returns its PID."""
+    command = ' '.join(f"'{arg}'" for arg in args) + ' >/dev/null 2>&1 & echo $!'
+    return int(subprocess.check_output(['sh', '-c', command], env=env).decode())
+
+
+def running(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return False
+    return stat[stat.rfind(')') + 2:].split()[0] not in ('Z', 'X')
+
+
+@pytest.fixture
+def fake_chromedriver(tmp_path):
+    path = tmp_path / 'chromedriver'
+    shutil.copy(shutil.which('sleep'), path)
+    return str(path)
+
+
+@pytest.fixture
+def processes():
+    started = []
+    yield started
+    for pid in started:
+        try:
+            os.kill(pid, 9)
+        except OSError:
+            pass
+
+
+def settle(pids):
+    # Give the detached processes time to exec
+    time.sleep(0.2)
+    return [pid for pid in pids if running(pid)]
+
+
+def test_reaps_only_processes_whose_owner_is_gone(fake_chromedriver, processes):
+    gone = dead_pid()
+    orphan_driver = detached([fake_chromedriver, '30'], env=dict(os.environ, **{OWNER_ENV: str(gone)}))
+    orphan_browser = detached([sys.executable, '-c', 'import time; time.sleep(30)', f'--scraper-owner-pid={gone}'])
+    foreign_driver = detached([fake_chromedriver, '30'], env={k: v for k, v in os.environ.items() if k != OWNER_ENV})
+    live_driver = detached([fake_chromedriver, '30'], env=owner_env())
+    live_browser = detached([sys.executable, '-c', 'import time; time.sleep(30)', owner_flag()])
+    processes.extend([orphan_driver, orphan_browser, foreign_driver, live_driver, live_browser])
+    assert len(settle(processes)) == 5
+
+    assert reap_orphans() == 2
+    time.sleep(0.1)
+    assert not running(orphan_driver) and not running(orphan_browser)
+    assert running(foreign_driver) and running(live_driver) and running(live_browser)
+
+
+def test_never_reaps_our_own_children(fake_chromedriver, processes):
+    # Even with a dead owner recorded, a process we started is ours
+    child = subprocess.Popen([fake_chromedriver, '30'], env=dict(os.environ, **{OWNER_ENV: str(dead_pid())}))
+    processes.append(child.pid)
+    settle([child.pid])
+    reap_orphans()
+    assert child.poll() is None
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from browser_profiles import BrowserProfiles
+from scraper_daemon import DriverPool
+
+
+class FakeDriver:
+    def __init__(self, user_data_dir=None):
+        self.user_data_dir = user_data_dir
+        self.cookies_cleared = 0
+        self.pages = []
+        self.quit_called = False
+
+    def get(self, url):
+        self.pages.append(url)
+
+    def delete_all_cookies(self):
+        self.cookies_cleared += 1
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    return BrowserProfiles(directory=str(tmp_path), slots=2)
+
+
+def test_profile_backed_drivers_keep_cookies(profiles):
+    pool = DriverPool(size=1, factory=FakeDriver, profiles=profiles)
+    with pool.lease() as driver:
+        pass
+    assert driver.user_data_dir.endswith('pool-0')
+    assert driver.pages == ['about:blank']
+    assert driver.cookies_cleared == 0
+    with pool.lease() as again:
+        pass
+    assert again is driver
+
+
+def test_drivers_without_a_profile_are_wiped():
+    pool = DriverPool(size=1, factory=FakeDriver)
+    with pool.lease() as driver:
+        pass
+    assert driver.cookies_cleared == 1
+
+
+def test_failed_lease_discards_the_driver(profiles):
+    pool = DriverPool(size=1, factory=FakeDriver, profiles=profiles)
+    with pytest.raises(RuntimeError):
+        with pool.lease() as driver:
+            raise RuntimeError('page crashed')
+    assert driver.quit_called
+    with pool.lease() as replacement:
+        pass
+    assert replacement is not driver
+
+
+class SlowCheckDriver(FakeDriver):
+    """Health checks block until ``checked`` is set."""
+
+    checked = None
+
+    def execute_script(self, script):
+        self.checked.wait(5)
+        return 1
+
+
+def test_lease_waits_for_drivers_being_checked_instead_of_starting_more():
+    SlowCheckDriver.checked = threading.Event()
+    started = []
+
+    def factory():
+        started.append(SlowCheckDriver())
+        return started[-1]
+
+    pool = DriverPool(size=1, lease_timeout=5, factory=factory)
+    pool.warm()
+    # check_idle takes the only driver off the idle queue while it checks it
+    checker = threading.Thread(target=pool.check_idle)
+    checker.start()
+    while not pool._idle.empty():
+        time.sleep(0.01)
+
+    leased = []
+
+    def lease():
+        with pool.lease() as driver:
+            leased.append(driver)
+
+    leaser = threading.Thread(target=lease)
+    leaser.start()
+    time.sleep(0.2)
+    assert leased == []
+    assert len(started) == 1
+
+    SlowCheckDriver.checked.set()
+    checker.join(5)
+    leaser.join(5)
+    assert leased == started
+    assert len(pool._live) == 1
+
+
+def test_lease_times_out_when_every_driver_is_busy():
+    pool = DriverPool(size=1, lease_timeout=0.2, factory=FakeDriver)
+    pool.warm()
+    # Simulate a driver held outside the lease slots (e.g. mid health check)
+    held = pool._idle.get_nowait()
+    with pytest.raises(TimeoutError):
+        with pool.lease():
+            pass
+    assert list(pool._live.values()) == [held]
@@ -0,0 +1,67 @@
+from html_cards import extract_cards_from_html, json_ld_products, parse_html, select_all, select_one
+from store_parsing import CHECKERS_CARD_SELECTOR, CHECKERS_FIELDS, TESCO_CARD_SELECTOR, TESCO_FIELDS, TITLE, PRICE
+
+PAGE = '''
+<html><body>
+  <div id="main" class="grid products">
+    <article class="product-card sale" data-sku="A-1" data-testid="product-card">
+      <h3 class="name">Milk <b>2L</b></h3>
+      <span class="price">R29.99</span><br>
+      <img src="milk.png"><p>Was R35.99</p>
+    </article>
+    <article class="product-card" data-sku="B-2">
+      <h3 class="name">Bread</h3>
+      <script>var ignored = 1;</script>
+    </article>
+  </div>
+  <script type="application/ld+json">
+    {"@graph": [{"@type": "Product", "name": "Eggs", "offers": {"price": "45.00"}},
+                {"@type": "Organization", "name": "Shop"}]}
+  </script>
+</body></html>
+'''
+
+
+def test_selector_forms():
+    root = parse_html(PAGE)
+    assert len(select_all(root, 'article')) == 2
+    assert len(select_all(root, '.product-card.sale')) == 1
+    assert select_one(root, '#main').tag == 'div'
+    assert len(select_all(root, '[data-sku]')) == 2
+    assert len(select_all(root, "[data-sku='B-2']")) == 1
+    assert len(select_all(root, "[data-sku^='A']")) == 1
+    assert len(select_all(root, "[data-sku$='-2']")) == 1
+    assert len(select_all(root, "[class*='card']")) == 2
+    assert len(select_all(root, ".price, h3")) == 3
+    assert select_all(root, '.missing') == []
+
+
+def test_inner_text_breaks_blocks_and_skips_scripts():
+    root = parse_html(PAGE)
+    first, second = select_all(root, 'article')
+    assert select_one(first, '.name').inner_text() == 'Milk 2L'
+    assert first.inner_text() == 'Milk 2L\nR29.99\nWas R35.99'
+    assert second.inner_text() == 'Bread'
+
+
+def test_extract_rows_with_fallback_fields():
+    rows = extract_cards_from_html(PAGE, 'article', ['.name', ['.missing', '.price'], None])
+    assert rows == [
+        ['Milk 2L', [None, 'R29.99'], None],
+        ['Bread', [None, None], None],
+    ]
+
+
+def test_json_ld_products():
+    products = list(json_ld_products(parse_html(PAGE)))
+    assert [p['name'] for p in products] == ['Eggs']
+
+
+def test_fixture_pages(read_fixture):
+    checkers = extract_cards_from_html(read_fixture('checkers_specials.html'), CHECKERS_CARD_SELECTOR, CHECKERS_FIELDS)
+    tesco = extract_cards_from_html(read_fixture('tesco_promotions.html'), TESCO_CARD_SELECTOR, TESCO_FIELDS)
+    assert len(checkers) == len(tesco) == 40
+    assert checkers[0][TITLE] == 'Clover Full Cream Milk 2L #1'
+    assert checkers[0][PRICE] == 'R99.87\nR70.09 WITH CARD'
+    assert tesco[0][TITLE] == 'Tesco British Semi Skimmed Milk 2.272L #1'
+    assert tesco[0][PRICE] == ['£9.75', None, '£7.78 Clubcard Price', None]
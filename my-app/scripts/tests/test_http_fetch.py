@@ -0,0 +1,31 @@
+import scrape_discounts  # noqa: F401  registers the built-in store adapters
+from http_fetch import discounts_from_html
+from store_registry import get_adapter
+
+
+def test_checkers_fixture(read_fixture):
+    discounts = discounts_from_html(get_adapter('checkers'), read_fixture('checkers_specials.html'))
+    assert len(discounts) == 40
+    milk = discounts[0]
+    # Card member price wins; the struck-through price is the original
+    assert (milk.price, milk.original_price) == ('R70.09', 'R99.87')
+    assert (milk.currency, milk.price_minor, milk.original_price_minor, milk.discount_bp) == ('ZAR', 7009, 9987, 2982)
+    assert milk.category == 'dairy'
+
+
+def test_tesco_fixture(read_fixture):
+    discounts = discounts_from_html(get_adapter('tesco'), read_fixture('tesco_promotions.html'))
+    assert len(discounts) == 40
+    assert discounts[0].original_price is None
+    assert discounts[0].discount_bp is None
+    bread = discounts[1]
+    assert (bread.currency, bread.price_minor, bread.original_price_minor) == ('GBP', 369, 444)
+
+
+def test_json_ld_fallback():
+    html = '''<script type="application/ld+json">
+        [{"@type": "Product", "name": " Koo Baked Beans 410g ", "offers": {"price": "18.99", "priceCurrency": "ZAR"}},
+         {"@type": "Product", "name": "No Price", "offers": {}}]
+    </script>'''
+    discounts = discounts_from_html(get_adapter('checkers'), html)
+    assert [(d.title, d.price, d.price_minor) for d in discounts] == [('Koo Baked Beans 410g', 'R18.99', 1899)]
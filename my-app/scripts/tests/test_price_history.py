@@ -0,0 +1,179 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import price_history
+from discount_record import Discount
+from price_history import DAY, PriceHistory, product_key
+
+NOW = 1_760_000_000 - 1_760_000_000 % DAY + 12 * 60 * 60  # midday
+
+
+def checkers(title, price):
+    return Discount.from_display(title, price, None, 'Checkers', 'Cape Town', None, currency='ZAR')
+
+
+def products_file(history):
+    with open(os.path.join(history._generation(), 'products.jsonl')) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_stats_over_window():
+    history = PriceHistory(max_segments=100)
+    for days_ago, price in [(40, 'R5.00'), (3, 'R12.00'), (2, 'R10.00'), (1, 'R14.00')]:
+        history.append([checkers('Milk 1L', price)], at=NOW - days_ago * DAY)
+    key = product_key(checkers('Milk 1L', 'R1'))
+
+    assert history.stats([key], days=30, now=NOW) == {key: {
+        'lowest': 1000, 'median': 1200.0, 'last': 1400, 'points': 3, 'last_seen': NOW - DAY,
+    }}
+    assert history.stats([key], days=0.5, now=NOW) == {}
+    assert history.stats(['cape town|checkers|unknown'], now=NOW) == {}
+
+
+def test_stats_for_aligns_with_discounts():
+    history = PriceHistory(max_segments=100)
+    history.append([checkers('Milk 1L', 'R10.00'), checkers('Bread', None)], at=NOW)
+
+    milk, bread = history.stats_for([checkers('Milk 1L', 'R9'), checkers('Bread', 'R5')], now=NOW)
+    assert milk['last'] == 1000
+    assert bread is None
+
+
+def test_compact_keeps_daily_lowest_and_drops_expired():
+    history = PriceHistory(retention_days=30, max_segments=100)
+    yesterday = NOW - DAY
+    history.append([checkers('Milk 1L', 'R12.00')], at=yesterday - 60)
+    history.append([checkers('Milk 1L', 'R11.00')], at=yesterday)
+    history.append([checkers('Milk 1L', 'R13.00')], at=NOW - 60)
+    history.append([checkers('Milk 1L', 'R15.00')], at=NOW)
+    history.append([checkers('Eggs', 'R30.00')], at=NOW - 60 * DAY)
+
+    history.compact(now=NOW)
+
+    assert len(history._segments()) == 1
+    milk = product_key(checkers('Milk 1L', 'R1'))
+    # Yesterday collapses to its lowest price; today's points are kept as is
+    assert history.stats([milk], days=30, now=NOW)[milk] == {
+        'lowest': 1100, 'median': 1300.0, 'last': 1500, 'points': 3, 'last_seen': NOW,
+    }
+
+
+def test_compact_prunes_and_renumbers_products():
+    history = PriceHistory(retention_days=30, max_segments=100)
+    history.append([checkers('Eggs', 'R30.00'), checkers('Jam', 'R20.00')], at=NOW - 60 * DAY)
+    history.append([checkers('Milk 1L', 'R10.00'), checkers('Jam', 'R25.00')], at=NOW - DAY)
+    reader = PriceHistory()
+    jam = product_key(checkers('Jam', 'R1'))
+    assert reader.stats([jam], days=30, now=NOW)[jam]['last'] == 2500
+
+    history.compact(now=NOW)
+
+    milk = product_key(checkers('Milk 1L', 'R1'))
+    assert products_file(history) == [jam, milk]
+    assert history.stats([milk, jam], days=30, now=NOW) == {
+        jam: {'lowest': 2500, 'median': 2500.0, 'last': 2500, 'points': 1, 'last_seen': NOW - DAY},
+        milk: {'lowest': 1000, 'median': 1000.0, 'last': 1000, 'points': 1, 'last_seen': NOW - DAY},
+    }
+    # A reader that cached the old numbering picks up the new one
+    assert reader.stats([milk], days=30, now=NOW)[milk]['last'] == 1000
+
+    # New products are numbered after the survivors
+    history.append([checkers('Eggs', 'R31.00')], at=NOW)
+    eggs = product_key(checkers('Eggs', 'R1'))
+    assert products_file(history) == [jam, milk, eggs]
+    assert reader.stats([eggs, jam], days=30, now=NOW)[eggs]['last'] == 3100
+
+
+def test_compact_with_nothing_left_empties_the_index():
+    history = PriceHistory(retention_days=30, max_segments=100)
+    history.append([checkers('Eggs', 'R30.00')], at=NOW - 60 * DAY)
+
+    history.compact(now=NOW)
+
+    assert history._segments() == []
+    assert products_file(history) == []
+
+
+def test_append_compacts_past_max_segments():
+    history = PriceHistory(max_segments=3)
+    for days_ago in range(4, 0, -1):
+        history.append([checkers('Milk 1L', f'R{10 + days_ago}.00')], at=NOW - days_ago * DAY)
+
+    assert len(history._segments()) == 1
+    milk = product_key(checkers('Milk 1L', 'R1'))
+    assert history.stats([milk], days=30, now=NOW)[milk]['points'] == 4
+
+
+def test_interrupted_compaction_leaves_the_old_generation_in_use(monkeypatch):
+    history = PriceHistory(retention_days=30, max_segments=100)
+    history.append([checkers('Eggs', 'R30.00')], at=NOW - 60 * DAY)
+    history.append([checkers('Milk 1L', 'R10.00')], at=NOW - DAY)
+    milk = product_key(checkers('Milk 1L', 'R1'))
+    before = history.stats([milk], days=30, now=NOW)
+
+    def crash(name):
+        raise OSError('disk full')
+    # The renumbered index and merged segment are written, but never published
+    monkeypatch.setattr(history, '_publish', crash)
+    with pytest.raises(OSError):
+        history.compact(now=NOW)
+
+    reader = PriceHistory()
+    assert reader.stats([milk], days=30, now=NOW) == before
+    assert products_file(reader) == [product_key(checkers('Eggs', 'R1')), milk]
+
+    # The next compaction publishes and clears the leftovers
+    monkeypatch.undo()
+    history.append([checkers('Milk 1L', 'R11.00')], at=NOW)
+    history.compact(now=NOW)
+    assert products_file(history) == [milk]
+    assert history.stats([milk], days=30, now=NOW)[milk]['points'] == 2
+    assert sorted(name for name in os.listdir(history.directory) if name != '.lock') == [
+        'CURRENT', os.path.basename(history._generation()),
+    ]
+
+
+def test_reader_never_mixes_generations(monkeypatch):
+    history = PriceHistory(retention_days=30, max_segments=100)
+    history.append([checkers('Eggs', 'R30.00')], at=NOW - 60 * DAY)
+    history.append([checkers('Milk 1L', 'R10.00'), checkers('Jam', 'R20.00')], at=NOW - DAY)
+    milk, jam = product_key(checkers('Milk 1L', 'R1')), product_key(checkers('Jam', 'R1'))
+    reader = PriceHistory()
+    read = reader._read
+
+    def compact_midway(generation, since=None):
+        # Another process compacts after the reader loaded the old index
+        if not hasattr(compact_midway, 'done'):
+            compact_midway.done = True
+            history.compact(now=NOW)
+        return read(generation, since)
+    monkeypatch.setattr(reader, '_read', compact_midway)
+
+    found = reader.stats([milk, jam], days=30, now=NOW)
+
+    assert found[milk]['last'] == 1000
+    assert found[jam]['last'] == 2000
+
+
+def test_history_without_generations_is_migrated(tmp_path):
+    # Layout written before generations: index and segments at the top level
+    directory = tmp_path / 'legacy'
+    directory.mkdir()
+    milk = product_key(checkers('Milk 1L', 'R1'))
+    (directory / 'products.jsonl').write_text(json.dumps(milk) + '\n')
+    segment = directory / f"seg-{NOW - DAY}-legacy00"
+    segment.mkdir()
+    for name, values in (('product', [0]), ('time', [NOW - DAY]), ('price', [1000])):
+        np.save(segment / f"{name}.npy", np.array(values, dtype=dict(price_history.COLUMNS)[name]))
+    history = PriceHistory(directory=str(directory), max_segments=100)
+    assert history.stats([milk], now=NOW)[milk]['last'] == 1000
+
+    history.compact(now=NOW)
+
+    assert history.stats([milk], now=NOW)[milk]['last'] == 1000
+    assert sorted(name for name in os.listdir(directory) if name != '.lock') == [
+        'CURRENT', os.path.basename(history._generation()),
+    ]
@@ -0,0 +1,81 @@
+import numpy as np
+
+from discount_record import Discount
+from product_matching import NUM_PERM, ProductMatcher, match_groups, normalise, parse_size
+
+
+def listing(title, price, store='Checkers', currency='ZAR'):
+    return Discount.from_display(title, price, None, store, 'Cape Town', None, currency=currency)
+
+
+def test_parse_size_converts_units_and_multipacks():
+    assert parse_size('Clover Milk 2 Litre') == (2000.0, 'ml')
+    assert parse_size('Coke 6 x 330ml') == (1980.0, 'ml')
+    assert parse_size('Rice 0.5kg') == (500.0, 'g')
+    assert parse_size('Eggs pack of 6') == (6.0, 'each')
+    assert parse_size('Loose bananas') == (None, None)
+
+
+def test_normalise_splits_brand_from_name_tokens():
+    quantity, unit, brand, tokens = normalise('Clover Full Cream Milk 1L')
+    assert (quantity, unit, brand) == (1000.0, 'ml', 'clover')
+    assert {'full', 'cream', 'milk', ' mi'} <= tokens
+    assert ' cl' not in tokens
+
+
+def test_match_groups_joins_rewordings_and_picks_cheapest():
+    discounts = [
+        listing('Clover Full Cream Milk 1L', 'R21.99'),
+        listing('Clover Full Cream Milk 1000ml', 'R19.99', store='Pick n Pay'),
+        listing('Clover Full Cream Milk 2L', 'R38.99'),
+        listing('Albany Full Cream Milk 1L', 'R18.99'),
+    ]
+
+    [group] = match_groups(discounts, ProductMatcher())
+
+    assert group['size'] == '1000ml'
+    assert group['stores'] == ['checkers', 'pick n pay']
+    assert [member['price_minor'] for member in group['members']] == [2199, 1999]
+    assert group['cheapest'] == 1
+
+
+def test_match_groups_leaves_cheapest_out_across_currencies():
+    discounts = [
+        listing('Heinz Baked Beans 400g', 'R19.99'),
+        listing('Heinz Baked Beans 400g', '£1.20', store='Tesco', currency='GBP'),
+    ]
+
+    [group] = match_groups(discounts, ProductMatcher())
+    assert group['cheapest'] is None
+
+
+def test_match_groups_keeps_different_products_apart():
+    discounts = [
+        listing('Clover Unsalted Milk 750ml', 'R20.00'),
+        listing('Clover Unsalted Tea 750ml', 'R30.00'),
+    ]
+    assert match_groups(discounts, ProductMatcher()) == []
+
+
+def test_members_must_match_the_seed_not_just_a_neighbour():
+    # b is similar to a and to c, but a and c are not similar to each other
+    a = np.zeros(NUM_PERM, dtype=np.uint64)
+    b = a.copy()
+    b[45:] = 1
+    c = b.copy()
+    c[26:45] = 2
+    d = c.copy()
+    signatures = np.stack([a, b, c, d])
+    matcher = ProductMatcher(threshold=0.7)
+    assert (signatures[0] == signatures[1]).mean() >= 0.7
+    assert (signatures[1] == signatures[2]).mean() >= 0.7
+    assert (signatures[0] == signatures[2]).mean() < 0.7
+
+    labels = matcher._seeded_components(signatures, np.array([0, 1, 2]), np.array([1, 2, 3]))
+
+    # c fails against a, so c and d (matched through c) form their own group
+    assert labels.tolist() == [0, 0, 2, 2]
+
+
+def test_group_ids_without_tokens_are_unmatched():
+    assert ProductMatcher().group_ids(['', '1kg', 'Rice 1kg']).tolist() == [0, 1, 2]
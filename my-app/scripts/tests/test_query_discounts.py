@@ -0,0 +1,64 @@
+import json
+import time
+
+import pytest
+
+from discount_record import Discount
+from discount_store import DiscountStore
+from ndjson_stream import NdjsonWriter
+from query_discounts import query_location
+
+
+def record(title, price, category, store='Tesco', original=None):
+    return Discount.from_display(title, price, original, store, 'London', category, currency='GBP')
+
+
+@pytest.fixture
+def stored():
+    store = DiscountStore()
+    store.replace_store('London', 'tesco', [
+        record('Semi Skimmed Milk 2L', '£1.50', 'dairy', original='£2.00'),
+        record('Semi-Skimmed Milk 2 Litre', '£1.45', 'dairy'),
+        record('Sirloin Steak 225g', '£5.00', 'meat'),
+    ])
+    return store
+
+
+def collect(**kwargs):
+    lines = []
+    writer = NdjsonWriter(lines.append)
+    summary = query_location('london', writer, **kwargs)
+    return [json.loads(line)['discount'] for line in lines], summary
+
+
+def test_fresh_rows_are_served(stored):
+    discounts, summary = collect(categories=['dairy'], max_price=1.49)
+    assert [d['title'] for d in discounts] == ['Semi-Skimmed Milk 2 Litre']
+    assert summary['stale'] == []
+    assert summary['stores'][0]['store'] == 'tesco'
+
+
+def test_old_or_missing_stores_are_stale(stored):
+    _, summary = collect(max_age=0)
+    assert summary['stale'] == ['tesco']
+    stored.replace_store('London', 'tesco', [], scraped_at=time.time())
+    _, summary = collect(stores=['checkers'])
+    assert summary['stores'] == [] and summary['stale'] == []
+
+
+def test_matches_and_request_log(stored):
+    discounts, summary = collect(categories=['dairy'])
+    assert len(discounts) == 2
+    assert [len(group['members']) for group in summary['matches']] == [2]
+    collect(record=False)
+    assert stored.popular_locations(since=0) == [('london', 1)]
+
+
+def test_daemon_answers_queries_without_a_pool(stored):
+    from scraper_daemon import handle_request
+    lines = []
+    handle_request(None, {'op': 'query', 'location': 'London', 'max_price': 2}, NdjsonWriter(lines.append, id=7))
+    records = [json.loads(line) for line in lines]
+    assert [r['type'] for r in records] == ['discount', 'discount', 'summary']
+    assert all(r['id'] == 7 for r in records)
+    assert records[-1]['ok'] and records[-1]['stale'] == []
@@ -0,0 +1,52 @@
+import threading
+
+import scrape_metrics
+from scrape_metrics import ScrapeMetrics, current_metrics, profile_thread, profiling
+
+
+def busy():
+    return sum(i * i for i in range(20000))
+
+
+def test_metrics_are_per_thread():
+    metrics = ScrapeMetrics('checkers')
+    with metrics.active():
+        current_metrics().count('cards_seen', 3)
+        with current_metrics().phase('parse'):
+            busy()
+    assert metrics.counters['cards_seen'] == 3
+    assert metrics.phases['parse'][1] == 1
+
+
+def test_concurrent_workers_take_turns_under_cprofile(capsys):
+    inside = threading.Barrier(4)
+    errors = []
+
+    def worker():
+        try:
+            with profile_thread():
+                # All four are inside profile_thread at once
+                inside.wait(timeout=5)
+                busy()
+        except Exception as e:
+            errors.append(e)
+
+    with profiling('cprofile'):
+        run = scrape_metrics._cprofile_run
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (len(run.profiles), run.skipped) == (1, 3)
+    assert errors == []
+    assert scrape_metrics._cprofile_run is None
+    err = capsys.readouterr().err
+    assert 'cProfile covered 1 of 4 store workers' in err
+    assert 'busy' in err
+
+
+def test_cprofile_with_no_workers(capsys):
+    with profiling('cprofile'):
+        pass
+    assert capsys.readouterr().err == ''
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+
+import pytest
+
+import scraper_daemon
+from discount_record import Discount
+from scraper_daemon import DriverPool, ScrapeServer, serve_stdio
+
+
+class FakeDriver:
+    def __init__(self):
+        self.pages = []
+
+    def get(self, url):
+        self.pages.append(url)
+
+    def delete_all_cookies(self):
+        pass
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A pool of fake drivers, with scrapes that lease one and yield a product."""
+    def scrape_location(location, pool, on_discount, **kwargs):
+        with pool.lease() as driver:
+            driver.get(f"https://example.test/{location}")
+            discount = Discount.from_display('Milk 1L', 'R20.00', None, 'Checkers', location, 'dairy',
+                                             currency='ZAR')
+            on_discount(discount)
+        return [discount], [{'store': 'checkers', 'cache': 'miss'}]
+
+    monkeypatch.setattr(scraper_daemon, 'scrape_location', scrape_location)
+    pool = DriverPool(size=1, factory=FakeDriver)
+    yield pool
+    pool.close()
+
+
+def records(lines):
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def test_socket_server_streams_records_per_request(pool):
+    directory = tempfile.mkdtemp(prefix='daemon-')  # unix socket paths must be short
+    socket_path = os.path.join(directory, 's.sock')
+    server = ScrapeServer(socket_path, pool)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(socket_path)
+            stream = client.makefile('rw')
+            stream.write(json.dumps({'id': 7, 'op': 'scrape', 'location': 'cape town'}) + '\n')
+            stream.flush()
+            reply = [json.loads(stream.readline()) for _ in range(2)]
+            stream.write('not json\n')
+            stream.flush()
+            invalid = json.loads(stream.readline())
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(directory)
+
+    discount, summary = reply
+    assert discount['id'] == 7 and discount['type'] == 'discount'
+    assert discount['discount']['title'] == 'Milk 1L'
+    assert summary == dict(summary, id=7, type='summary', ok=True, count=1, partial=False,
+                           cache=[{'store': 'checkers', 'cache': 'miss'}])
+    assert invalid['ok'] is False and invalid['id'] is None
+    # The scrape ran on a pooled driver, returned clean
+    [driver] = pool._live.values()
+    assert driver.pages == ['https://example.test/cape town', 'about:blank']
+
+
+def test_stdio_answers_each_request(pool, monkeypatch):
+    out = io.StringIO()
+    requests = [
+        {'id': 1, 'op': 'ping'},
+        {'id': 2, 'op': 'scrape', 'location': 'london'},
+        {'id': 3, 'op': 'unknown'},
+    ]
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''.join(json.dumps(r) + '\n' for r in requests)))
+    monkeypatch.setattr(sys, 'stdout', out)
+
+    serve_stdio(pool)
+
+    by_id = {}
+    for record in records(out.getvalue().splitlines()):
+        by_id.setdefault(record['id'], []).append(record)
+    assert by_id[1][0]['pool_size'] == 1
+    assert [r['type'] for r in by_id[2]] == ['discount', 'summary']
+    assert by_id[2][1]['count'] == 1
+    assert by_id[3] == [dict(by_id[3][0], ok=False, error='Unknown op: unknown')]
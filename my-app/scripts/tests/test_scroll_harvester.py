@@ -0,0 +1,69 @@
+import pytest
+
+import scroll_harvester
+from discount_record import Discount
+from scroll_harvester import harvest_cards
+
+
+class FakePage:
+    """A page that reveals one new card per scroll, ``cards`` in total."""
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.revealed = 1
+        self.extracted = 0
+
+    def execute_script(self, script, *args):
+        if script == scroll_harvester.SCROLL_JS:
+            self.revealed = min(self.revealed + 1, self.cards)
+            return None
+        rows = [[f"Product {n}", f"R{n + 1}"] for n in range(self.extracted, self.revealed)]
+        self.extracted = self.revealed
+        return rows
+
+
+class FakeReadiness:
+    def stable_count(self, selector, timeout):
+        pass
+
+    def jitter(self):
+        pass
+
+
+def parse_card(row):
+    return Discount.from_display(row[0], row[1], None, 'Checkers', 'Cape Town', 'dairy', currency='ZAR')
+
+
+@pytest.fixture
+def memory_checks(monkeypatch):
+    checks = []
+
+    def over_memory(driver):
+        checks.append(driver)
+        return len(checks) >= 3
+    monkeypatch.setattr(scroll_harvester, 'over_memory', over_memory)
+    return checks
+
+
+def harvest(page):
+    return harvest_cards(page, FakeReadiness(), '.card', ['.name', '.price'], parse_card, 'Checkers')
+
+
+def test_memory_is_not_measured_on_every_pass(memory_checks, monkeypatch):
+    monkeypatch.setattr(scroll_harvester, 'MEMORY_CHECK_SECONDS', 60)
+
+    discounts, stats = harvest(FakePage(cards=8))
+
+    assert len(discounts) == 8
+    assert stats['stop'] == 'no_new_cards'
+    assert memory_checks == []
+
+
+def test_memory_limit_still_stops_scrolling(memory_checks, monkeypatch):
+    monkeypatch.setattr(scroll_harvester, 'MEMORY_CHECK_SECONDS', 0)
+
+    discounts, stats = harvest(FakePage(cards=8))
+
+    assert stats['stop'] == 'memory'
+    assert len(memory_checks) == 3
+    assert [d.title for d in discounts] == ['Product 0', 'Product 1', 'Product 2']
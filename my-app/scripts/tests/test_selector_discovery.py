@@ -0,0 +1,89 @@
+import os
+
+from html_cards import parse_html, select_all
+from selector_discovery import SelectorCache, resolve_card_selector, resolve_card_selector_html
+from store_parsing import CHECKERS_CARD_CANDIDATES, CHECKERS_CARD_SELECTOR, CHECKERS_FIELDS
+
+CANDIDATES = ['.desktop-card', '.mobile-card']
+FIELDS = ['.name', '.price', None, None, None]
+DESKTOP_PAGE = '''<html><body>
+    <div class="desktop-card"><span class="name">Milk</span><span class="price">R20</span></div>
+    <div class="desktop-card"><span class="name">Bread</span><span class="price">R15</span></div>
+</body></html>'''
+
+
+class FakeDriver:
+    """Answers the selector race as a mobile page where only ``.mobile-card`` matches."""
+
+    def __init__(self):
+        self.races = []
+
+    def execute_script(self, script, order, *args):
+        self.races.append(list(order))
+        return [[12, 1.0] if selector == '.mobile-card' else [0, 0] for selector in order]
+
+
+def test_http_and_browser_winners_are_cached_apart(data_dir):
+    cache = SelectorCache()
+    driver = FakeDriver()
+
+    assert resolve_card_selector(driver, 'checkers', CANDIDATES, FIELDS, timeout=1, cache=cache) == '.mobile-card'
+    assert resolve_card_selector_html(parse_html(DESKTOP_PAGE), 'checkers', CANDIDATES, FIELDS, cache=cache) \
+        == '.desktop-card'
+
+    assert cache.get('checkers', 'browser')['selector'] == '.mobile-card'
+    assert cache.get('checkers', 'http')['selector'] == '.desktop-card'
+    assert cache.get('checkers', 'http')['cards'] == 2
+    assert sorted(os.listdir(data_dir / 'selectors')) == ['checkers-browser.json', 'checkers-http.json']
+
+    # The HTTP run did not evict the browser's winner: it is still tried first
+    resolve_card_selector(driver, 'checkers', CANDIDATES, FIELDS, timeout=1, cache=cache)
+    assert driver.races[-1][0] == '.mobile-card'
+
+
+def test_html_mode_follows_the_page_source():
+    cache = SelectorCache()
+    cache.put('checkers', 'browser', '.mobile-card', 12)
+
+    selector = resolve_card_selector_html(parse_html(DESKTOP_PAGE), 'checkers', CANDIDATES, FIELDS,
+                                          cache=cache, mode='browser')
+
+    assert selector == '.desktop-card'
+    assert cache.get('checkers', 'browser')['selector'] == '.desktop-card'
+    assert cache.get('checkers', 'http') is None
+
+
+NESTED_PAGE = '''<html><body><div class="product-grid">''' + ''.join(f'''
+    <div class="product-card"><div class="product-card__inner">
+        <span class="product-card__name">Item {n}</span><span class="price__current">R{n}</span>
+    </div></div>''' for n in range(1, 4)) + '''
+</div></body></html>'''
+
+
+def test_precise_selector_beats_broad_fallback_on_nested_markup():
+    root = parse_html(NESTED_PAGE)
+    # The fallback matches the grid, every card and every card's inner
+    # wrapper: more complete "cards" than there are products
+    assert len(select_all(root, "[class*='product']")) > 3 * 2
+
+    selector = resolve_card_selector_html(root, 'checkers', CHECKERS_CARD_CANDIDATES, CHECKERS_FIELDS)
+
+    assert selector == CHECKERS_CARD_SELECTOR
+    assert SelectorCache().get('checkers', 'http')['cards'] == 3
+
+
+class WrapperDriver(FakeDriver):
+    """A page where the broad fallback also matches every card's wrappers."""
+
+    def execute_script(self, script, order, *args):
+        self.races.append(list(order))
+        counts = {'.mobile-card': [12, 1.0], "[class*='card']": [40, 0.9]}
+        return [counts.get(selector, [0, 0]) for selector in order]
+
+
+def test_race_stops_at_the_first_eligible_candidate():
+    driver = WrapperDriver()
+    resolve_card_selector(driver, 'checkers', ['.missing', '.mobile-card', "[class*='card']"], FIELDS, timeout=1)
+    # The in-page script is told to stop there too, via the candidate order
+    assert driver.races == [['.missing', '.mobile-card', "[class*='card']"]]
+    assert SelectorCache().get('checkers', 'browser')['selector'] == '.mobile-card'
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from scrape_deadline import Deadline
+from single_flight import FlightTimeout, SingleFlight
+
+
+def test_single_caller_produces():
+    assert SingleFlight().run('k', lambda: {'n': 1}) == ({'n': 1}, False)
+    # A later caller doesn't reuse a flight that landed before it arrived
+    assert SingleFlight().run('k', lambda: {'n': 2}) == ({'n': 2}, False)
+
+
+def test_concurrent_callers_share_one_flight():
+    produced = []
+    results = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def produce():
+        produced.append(1)
+        started.set()
+        release.wait(5)
+        return {'n': len(produced)}
+
+    def call():
+        results.append(SingleFlight().run('k', produce))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    # Let the followers queue up on the flight's lock
+    time.sleep(0.2)
+    release.set()
+    leader.join()
+    for follower in followers:
+        follower.join()
+
+    assert len(produced) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == {'n': 1} for result, _ in results)
+
+
+def test_waiter_takes_over_a_crashed_flight():
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = []
+
+    def crash():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('browser died')
+
+    def leader():
+        with pytest.raises(RuntimeError):
+            SingleFlight().run('k', crash)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: outcomes.append(SingleFlight().run('k', lambda: 'mine')))
+    waiter.start()
+    release.set()
+    thread.join()
+    waiter.join()
+    assert outcomes == [('mine', False)]
+
+
+def test_waiter_gives_up_at_its_deadline():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'late'
+
+    thread = threading.Thread(target=lambda: SingleFlight().run('k', slow))
+    thread.start()
+    started.wait(5)
+    try:
+        with Deadline(0.3).active():
+            with pytest.raises(FlightTimeout):
+                SingleFlight().run('k', lambda: 'mine')
+    finally:
+        release.set()
+        thread.join()
@@ -0,0 +1,131 @@
+import pytest
+
+import scrape_discounts
+from discount_cache import DiscountCache, PartialResult
+from discount_record import Discount
+from discount_store import DiscountStore
+from store_registry import STORE_ADAPTERS, StoreAdapter, register_store
+from store_shards import ShardResults, page_url, scrape_shards, shard_urls
+
+URLS = ['http://shop.test/specials', 'http://shop.test/specials?page=2', 'http://shop.test/specials?page=3']
+
+
+def discount(title):
+    return Discount.from_display(title, 'R10', None, 'Shardmart', 'Testville', 'dairy', currency='ZAR')
+
+
+def test_shard_urls(monkeypatch):
+    monkeypatch.setenv('SCRAPE_SHARD_PAGES', '3')
+    assert shard_urls('http://shop.test/specials?sort=price&page=1', 'X_SHARD_URLS') == [
+        'http://shop.test/specials?sort=price&page=1',
+        'http://shop.test/specials?sort=price&page=2',
+        'http://shop.test/specials?sort=price&page=3',
+    ]
+    monkeypatch.setenv('X_SHARD_URLS', 'http://a.test, http://b.test')
+    assert shard_urls('http://shop.test/specials', 'X_SHARD_URLS') == ['http://a.test', 'http://b.test']
+    assert page_url('http://shop.test/?q=milk', 2) == 'http://shop.test/?q=milk&page=2'
+
+
+def test_failed_shards_are_listed():
+    def scrape_one(url, sink):
+        if url.endswith('2'):
+            return None
+        if url.endswith('3'):
+            raise RuntimeError('blocked')
+        return [discount('Milk'), discount('Milk')]
+    found = scrape_shards('Shardmart', URLS, scrape_one)
+    assert isinstance(found, ShardResults)
+    assert [d.title for d in found] == ['Milk']
+    assert found.failed == URLS[1:]
+
+
+def test_empty_and_incomplete_shards_count_as_failed():
+    def scrape_one(url, sink):
+        if url.endswith('2'):
+            return []
+        if url.endswith('3'):
+            return PartialResult([discount('Bread')])
+        return [discount('Milk')]
+    found = scrape_shards('Shardmart', URLS, scrape_one)
+    assert [d.title for d in found] == ['Milk', 'Bread']
+    assert found.failed == URLS[1:]
+
+
+def test_all_none_escalates_and_all_errors_raise():
+    assert scrape_shards('Shardmart', URLS, lambda url, sink: None) is None
+
+    def fail(url, sink):
+        raise RuntimeError('down')
+    with pytest.raises(RuntimeError):
+        scrape_shards('Shardmart', URLS, fail)
+
+
+@pytest.fixture
+def sharded_store(monkeypatch):
+    adapter = register_store(StoreAdapter(
+        key='shardmart', name='Shardmart', locations=['testville'], url=URLS[0],
+        card_selector='.card', fields=[], parse_card=None, json_ld_row=None, scrape=None,
+        shards=lambda: URLS,
+    ))
+    http = {URLS[0]: [discount('Milk')], URLS[1]: None, URLS[2]: [discount('Bread')]}
+    browser = {URLS[1]: [discount('Eggs')]}
+    monkeypatch.setattr(scrape_discounts, 'fetch_discounts_http', lambda adapter, url=None, timeout=10: http[url])
+
+    def run_shard(adapter, url, pool=None, on_discount=None):
+        if url not in browser:
+            raise RuntimeError('browser blocked too')
+        for found in browser[url]:
+            if on_discount:
+                on_discount(found)
+        return browser[url]
+    monkeypatch.setattr(scrape_discounts, '_run_shard', run_shard)
+    yield adapter, browser
+    STORE_ADAPTERS.pop('shardmart')
+
+
+def test_http_shard_failures_are_retried_in_the_browser(sharded_store):
+    adapter, _ = sharded_store
+    streamed = []
+    discounts = scrape_discounts._scrape_store(adapter, on_discount=lambda d: streamed.append(d.title))
+    assert not isinstance(discounts, PartialResult)
+    assert sorted(d.title for d in discounts) == ['Bread', 'Eggs', 'Milk']
+    assert sorted(streamed) == ['Bread', 'Eggs', 'Milk']
+
+
+def test_shards_still_missing_make_the_result_partial(sharded_store):
+    adapter, browser = sharded_store
+    browser.clear()
+    discounts = scrape_discounts._scrape_store(adapter)
+    assert isinstance(discounts, PartialResult)
+    assert sorted(d.title for d in discounts) == ['Bread', 'Milk']
+
+
+def test_http_only_mode_flags_partial_and_skips_the_cache(sharded_store):
+    discounts, info = scrape_discounts.scrape_location('testville', mode='http', cache=DiscountCache())
+    assert sorted(d.title for d in discounts) == ['Bread', 'Milk']
+    assert info[0]['partial'] is True
+    assert DiscountCache().get(DiscountCache.key('testville', 'shardmart')) is None
+
+
+def test_empty_browser_shard_keeps_stored_rows(sharded_store):
+    adapter, browser = sharded_store
+    browser.update({url: [discount(f"Product {n}")] for n, url in enumerate(URLS)})
+    store = DiscountStore()
+    scrape_discounts.scrape_location('testville', mode='browser', store=store)
+    assert len(store.query('testville')) == 3
+
+    # The browser scrapers answer a crashed or blocked page with []
+    browser[URLS[1]] = []
+    discounts, info = scrape_discounts.scrape_location('testville', mode='browser', cache=DiscountCache(),
+                                                       store=store)
+
+    assert sorted(d.title for d in discounts) == ['Product 0', 'Product 2']
+    assert info[0]['partial'] is True
+    assert DiscountCache().get(DiscountCache.key('testville', 'shardmart')) is None
+    assert sorted(row.title for row in store.query('testville')) == ['Product 0', 'Product 1', 'Product 2']
+
+
+def test_every_browser_shard_empty_is_a_failed_scrape(sharded_store):
+    adapter, browser = sharded_store
+    browser.update({url: [] for url in URLS})
+    assert scrape_discounts._run_scraper(adapter) == []